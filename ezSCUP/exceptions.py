@@ -59,9 +59,15 @@ class InvalidLabelList(Error):
    """Raised when an invalid label list is provided."""
    pass
 
+class InvalidCompressionCodec(Error):
+   """Raised when an unknown compression codec is requested."""
+   pass
+
 
 
 #####################################################################
 #####################################################################
 
-
+class MissingForces(Error):
+   """Raised when the forces (or stress) of a single point run are needed but were not found, or are malformed, in its output."""
+   pass
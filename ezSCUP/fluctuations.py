@@ -0,0 +1,273 @@
+"""
+Functions to analyze the thermal fluctuations of Monte Carlo
+time series, such as the polarization of each configuration.
+"""
+
+# third party imports
+import numpy as np
+
+# package imports
+from ezSCUP.polarization import stepped_polarization
+
+import ezSCUP.settings as cfg
+import ezSCUP.exceptions
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# MODULE STRUCTURE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+#
+# + func autocorrelation(series)
+# + func autocorrelation_time(series, window)
+# + func susceptibility(series, volume, temperature, window)
+# + func lattice_polarization(lattice_data, min_step)
+# + func polarization_fluctuations(parser, t, p, s, f, source, window)
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+EPS0 = 8.8541878128e-12     # vacuum permittivity, in F/m
+KB = 1.380649e-23           # Boltzmann constant, in J/K
+BOHR = 5.29177e-11          # bohrs to meters
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def autocorrelation(series):
+
+    """
+
+    Normalized autocorrelation function of a time series,
+
+        rho(t) = < dA(t') dA(t' + t) > / < dA^2 >,  dA = A - <A>
+
+    computed through FFTs (zero-padded, so there is no wrap-around).
+
+    Parameters:
+    ----------
+
+    - series (array): (nsteps,) time series, or (nsteps, ...) to
+    treat each column (ie. each polarization component) separately.
+
+    Return:
+    ----------
+        - an array the shape of the series with the autocorrelation
+        at each time lag, in samples. rho(0) is always one.
+
+    """
+
+    series = np.asarray(series, dtype=np.float64)
+    nsteps = series.shape[0]
+
+    if nsteps == 0:
+        raise ezSCUP.exceptions.NotEnoughPartials()
+
+    delta = series - series.mean(axis=0)
+
+    # next power of two, twice as long as the series
+    nfft = 1 << int(2*nsteps - 1).bit_length()
+
+    spectrum = np.fft.rfft(delta, n=nfft, axis=0)
+    acf = np.fft.irfft(spectrum.real**2 + spectrum.imag**2, n=nfft, axis=0)[:nsteps]
+
+    # unbiased estimate at each lag
+    acf /= (nsteps - np.arange(nsteps)).reshape((-1,) + (1,)*(series.ndim - 1))
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return acf/acf[0]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def autocorrelation_time(series, window=5.):
+
+    """
+
+    Integrated autocorrelation time of a time series,
+
+        tau = 1/2 + sum_{t=1}^{M} rho(t)
+
+    with Sokal's self-consistent window: M is the smallest lag such
+    that M >= window*tau(M). The number of independent samples in
+    the series is then about nsteps/(2*tau).
+
+    Parameters:
+    ----------
+
+    - series (array): (nsteps,) time series, or (nsteps, ...) to
+    treat each column separately.
+    - window (float): window factor, 5 is usually enough for
+    exponential-like decays.
+
+    Return:
+    ----------
+        - the autocorrelation time of the series (or of each column),
+        in samples. Multiply by the sampling interval to get MC steps.
+
+    """
+
+    acf = autocorrelation(series)
+    acf = np.nan_to_num(acf.reshape(acf.shape[0], -1))
+
+    # running estimate of tau up to each lag
+    taus = np.cumsum(acf, axis=0) - 0.5
+
+    tau = np.empty(acf.shape[1])
+    lags = np.arange(acf.shape[0])
+    for col in range(acf.shape[1]):
+        within = lags >= window*taus[:,col]
+        cut = np.argmax(within) if np.any(within) else acf.shape[0] - 1
+        tau[col] = max(taus[cut,col], 0.5)
+
+    shape = np.shape(series)[1:]
+    return tau.reshape(shape) if shape else tau[0]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def susceptibility(series, volume=None, temperature=None, window=5.):
+
+    """
+
+    Fluctuation-based susceptibility of a polarization time series,
+
+        chi = V/(eps0 kB T) * (<P^2> - <P>^2)
+
+    or just the variance <P^2> - <P>^2 if no volume and temperature
+    are given. The error bar accounts for the autocorrelation of the
+    series: it is the standard error of the mean of (P - <P>)^2,
+    corrected with the integrated autocorrelation time of that series.
+
+    Parameters:
+    ----------
+
+    - series (array): (nsteps,) polarization time series (in C/m2),
+    or (nsteps, 3) to get each component separately.
+    - volume (float): supercell volume (in bohr^3)
+    - temperature (float): temperature (in K)
+    - window (float): window factor, see autocorrelation_time().
+
+    Return:
+    ----------
+        - the susceptibility (dimensionless), or the variance
+        (in (C/m2)^2), of the series or of each of its columns.
+        - its statistical error.
+
+    """
+
+    series = np.asarray(series, dtype=np.float64)
+    nsteps = series.shape[0]
+
+    if nsteps < 2:
+        raise ezSCUP.exceptions.NotEnoughPartials()
+
+    sq = (series - series.mean(axis=0))**2
+    variance = sq.mean(axis=0)
+
+    tau = autocorrelation_time(sq, window=window)
+    error = np.sqrt(2.*tau*sq.var(axis=0)/nsteps)
+
+    if volume is not None and temperature is not None:
+        factor = volume*BOHR**3/(EPS0*KB*temperature)
+        return factor*variance, factor*error
+
+    return variance, error
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def lattice_polarization(lattice_data, min_step=0):
+
+    """
+
+    Polarization time series within the lattice output of a
+    configuration (see MCSimulationParser.access_lattice_output).
+
+    Parameters:
+    ----------
+
+    - lattice_data (DataFrame): lattice output of the configuration.
+    - min_step (int): steps up to this one (ie. equilibration) are left out.
+
+    Return:
+    ----------
+        - an array with the MC step of each entry.
+        - a (nsteps, 3) array with the polarization (in C/m2).
+
+    """
+
+    data = lattice_data[lattice_data.index > min_step]
+    pols = data[["Pol_x(C/m2)", "Pol_y(C/m2)", "Pol_z(C/m2)"]].to_numpy(dtype=np.float64)
+
+    return data.index.to_numpy(), pols
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def polarization_fluctuations(parser, t, p=None, s=None, f=None, source="lattice", window=5.):
+
+    """
+
+    Analyzes the polarization fluctuations of a given configuration
+    after equilibration, see autocorrelation_time() and susceptibility().
+
+    Parameters:
+    ----------
+
+    - parser (MCSimulationParser): parser of the simulation.
+    - t (float): Temperature (compulsory)
+    - p (array): Pressure (optional)
+    - s (array): Strain (optional)
+    - f (array): Electric Field (optional)
+
+    - source (string): where to get the polarization from, either
+    "lattice" (Pol_* columns of the lattice output) or "partials"
+    (Born-charge polarization of each partial .restart file).
+    - window (float): window factor, see autocorrelation_time().
+
+    The supercell volume entering the susceptibility is the mean strained
+    volume over the analyzed steps, using the diagonal strains (Strn_xx,
+    Strn_yy, Strn_zz columns of the lattice output, or the strains of each 
+    partial) as in stepped_polarization(). Shear strains only change the 
+    volume to second order and are left out, and so are the correlations 
+    between volume and polarization fluctuations.
+
+    Return:
+    ----------
+        - a dictionary with the MC steps ("steps") and polarization
+        ("pol") series, the autocorrelation function ("acf") and time
+        ("tau", in MC steps) of each component, and the susceptibility
+        ("chi") of each component with its statistical error ("chi_error").
+
+    raises: ValueError if the source is unknown.
+
+    """
+
+    model = parser.model
+    lat_vectors = np.array(model["lat_vectors"])
+
+    if source == "lattice":
+        lattice_data = parser.access_lattice_output(t, p, s, f)
+        steps, pols = lattice_polarization(lattice_data, min_step=parser.mc_equilibration_steps)
+        data = lattice_data[lattice_data.index > parser.mc_equilibration_steps]
+        strains = data[["Strn_xx", "Strn_yy", "Strn_zz"]].to_numpy(dtype=np.float64)
+    elif source == "partials":
+        traj = parser.access_trajectory(t, p, s, f, min_step=parser.mc_equilibration_steps)
+        steps, strains = traj.steps, traj.strains[:,:3]
+        pols = stepped_polarization(parser.supercell, model["species"], model["nats"],
+            np.diag(lat_vectors), traj, model["born_charges"])
+    else:
+        raise ValueError(f"unknown polarization source {source!r}; expected 'lattice' or 'partials'")
+
+    # mean strained supercell volume, in bohr^3
+    strained = np.mean(np.prod(1. + strains, axis=1)) if len(strains) else 1.
+    volume = np.prod(parser.supercell)*abs(np.linalg.det(lat_vectors))*strained
+
+    # sampling interval, in MC steps
+    interval = steps[1] - steps[0] if len(steps) > 1 else 1
+
+    chi, chi_error = susceptibility(pols, volume=volume, temperature=t, window=window)
+
+    results = {
+        "steps": steps,
+        "pol": pols,
+        "acf": autocorrelation(pols),
+        "tau": interval*autocorrelation_time(pols, window=window),
+        "chi": chi,
+        "chi_error": chi_error
+    }
+
+    return results
@@ -6,6 +6,13 @@ Class that provides a data structure to handle SCALE-UP geometry files.
 import numpy as np
 import csv
 
+# standard library imports
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import shutil
+import gzip, bz2, lzma
+import os
+
 # package imports
 import ezSCUP.settings as cfg
 import ezSCUP.exceptions
@@ -15,14 +22,23 @@ import ezSCUP.exceptions
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 #
 # + class Geometry()
-#   - __init__(supercell, species, nats)
+#   - __init__(supercell, species, nats, dtype)
 #   - load_reference(reference_file)
 #   - load_restart(restart_file)
-#   - load_equilibrium_displacements(partials)
+#   - load_reference_region(reference_file, x, y, z)
+#   - load_restart_region(restart_file, x, y, z)
+#   - load_equilibrium_displacements(partials, nthreads)
 #   - write_restart(restart_file)
 #   - write_reference(reference_file)
 #   - write_xyz(xyz_file)
 #
+# + func probe(geometry_file)
+# + func cache_file(geometry_file)
+# + func compress_file(geometry_file, codec)
+# + func strip_codec(fname)
+# + func index_file(geometry_file)
+# + func load_index(geometry_file)
+#
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
 class Geometry():
@@ -53,6 +69,24 @@ class Geometry():
         geo.positions[x,y,z,j,:]                        # position vector of atom j in cell (x,y,z)
         geo.displacements[x,y,z,j,:]                    # displacement vector of atom j in cell (x,y,z)
 
+    Every reader and writer transparently handles compressed files, 
+    picking the codec from the file extension (".gz", ".bz2", ".xz" or
+    ".lzma"), so that "geo.load_restart('file.restart.gz')" just works.
+    Files are (de)compressed on the fly, never through temporary copies.
+
+    Both loaders accept a "lazy" flag, which reads the header right away
+    but defers parsing the atomic block until the first access to the
+    corresponding attribute. To just peek at a file's header, without 
+    creating any arrays, use the probe() function in this module.
+
+    # COMPACT STORAGE #
+
+    Positions and displacements are stored as float64 by default. Passing
+    "dtype=np.float32" to the constructor halves the memory of both arrays,
+    which helps when many geometries are kept at once. Files are still 
+    parsed in double precision and averages are accumulated as float64,
+    so only the final values are rounded (relative error ~1e-7).
+
     Attributes:
     ----------
 
@@ -61,11 +95,16 @@ class Geometry():
      - nats (int): number of atoms per unit cell
      - nels (int): number of distinct atomic species
      - species (list): atomic species within the supercell
+     - dtype (numpy.dtype): floating point type of positions and displacements
      - strains (array): supercell strains, in Voigt notation
      - lat_vectors (1x9 array): lattice vectors, in Bohrs 
      - lat_constants (array): xx, yy, zz lattice constants, in Bohrs
      - positions (array): positions of the atoms in the supercell, in Bohrs
      - displacements (array): displacements of the atoms in the supercell, in Bohrs
+     - strain_variance (array): variance of the strains, only after 
+     averaging several .restart files (see load_equilibrium_displacements)
+     - disp_variance (array): variance of each atomic displacement, only after
+     averaging several .restart files (see load_equilibrium_displacements)
 
     """
 
@@ -73,7 +112,7 @@ class Geometry():
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    def __init__(self, supercell, species, nats):
+    def __init__(self, supercell, species, nats, dtype=np.float64):
 
         
         """
@@ -87,6 +126,8 @@ class Geometry():
         - species (list): atomic species within the supercell in order
         (ie. ["Sr", "Ti", "O"])
         - nats (int): number of atoms per unit cell (ie. 5)
+        - dtype (numpy.dtype): floating point type used to store positions
+        and displacements (ie. np.float32 to halve their memory footprint)
 
         """
 
@@ -95,15 +136,75 @@ class Geometry():
         self.species = species
         self.nels = len(self.species)
         self.nats = nats
+        self.dtype = np.dtype(dtype)
 
         self.strains = np.zeros(6)
 
         self.lat_vectors = None
         self.lat_constants = None
 
+        # atomic blocks waiting to be loaded (lazy mode)
+        self._pending = {}
+
         self.positions = None
         sc = self.supercell
-        self.displacements = np.zeros([sc[0], sc[1], sc[2], self.nats, 3])
+        self.displacements = np.zeros([sc[0], sc[1], sc[2], self.nats, 3], dtype=self.dtype)
+
+        self.strain_variance = None
+        self.disp_variance = None
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    @property
+    def displacements(self):
+
+        """ Atomic displacements, loaded on first access in lazy mode. """
+
+        if "displacements" in self._pending:
+            self._displacements = self._load_pending("displacements")
+        return self._displacements
+
+    @displacements.setter
+    def displacements(self, value):
+        self._pending.pop("displacements", None)
+        self._displacements = value
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    @property
+    def positions(self):
+
+        """ Atomic reference positions, loaded on first access in lazy mode. """
+
+        if "positions" in self._pending:
+            self._positions = self._load_pending("positions")
+        return self._positions
+
+    @positions.setter
+    def positions(self, value):
+        self._pending.pop("positions", None)
+        self._positions = value
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _load_pending(self, name):
+
+        """ 
+        
+        Parses the atomic block of a file whose loading was deferred 
+        (lazy mode). The header is checked again in case the file changed.
+        
+        """
+
+        fname, cache = self._pending.pop(name)
+
+        f = _open_text(fname)
+        self._check_header(f)
+        f.readline() # strains or lattice vectors, already loaded
+        atoms = self._load_atoms(f, fname, cache)
+        f.close()
+
+        return atoms
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
@@ -115,31 +216,30 @@ class Geometry():
 
         self.strains = np.zeros(6)
         sc = self.supercell
-        self.displacements = np.zeros([sc[0], sc[1], sc[2], self.nats, 3])
+        self.displacements = np.zeros([sc[0], sc[1], sc[2], self.nats, 3], dtype=self.dtype)
+
+        self.strain_variance = None
+        self.disp_variance = None
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    def load_restart(self, restart_file):
+    def _check_header(self, f):
 
         """
         
-        Loads the given .restart file's information.
+        Reads the first three lines (supercell, atom count and species)
+        of an open geometry file and checks them against the current geometry.
 
         Parameters:
         ----------
 
-        - restart_file (string): name of the .restart file
+        - f (file): geometry file, opened at its first line.
 
         raises: ezSCUP.exceptions.GeometryNotMatching if the geometry contained
-        in the .restart file does not match the one loaded from the reference file.
+        in the file does not match the current one.
 
         """
 
-        self.reset_geom()
-
-        f = open(restart_file)
-        
-        # checks restart file matches loaded geometry
         rsupercell = np.array(list(map(int, f.readline().split())))
         if not np.all(self.supercell == rsupercell): 
             raise ezSCUP.exceptions.GeometryNotMatching()
@@ -152,23 +252,128 @@ class Geometry():
         if not (set(rspecies) == set(self.species)):
             raise ezSCUP.exceptions.GeometryNotMatching()
 
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _read_atoms(self, f):
+
+        """
+        
+        Reads the whole atomic block of an open geometry file in a single
+        call, instead of parsing it line by line.
+
+        Each line of the block holds eight columns (x, y, z, atom, species
+        and three coordinates), in the same x-y-z-atom order used by the
+        arrays of this class, so the block is just reshaped into place.
+
+        Parameters:
+        ----------
+
+        - f (file): geometry file, opened right after its four-line header.
+
+        Return:
+        ----------
+            - a (sx, sy, sz, nats, 3) array with the coordinates in the file.
+
+        raises: ezSCUP.exceptions.GeometryNotMatching if the block is not
+        the size of the current geometry.
+
+        """
+
+        sc = self.supercell
+        nlines = self.ncells*self.nats
+
+        block = np.loadtxt(f, max_rows=nlines, ndmin=2)
+        if block.shape != (nlines, 8):
+            raise ezSCUP.exceptions.GeometryNotMatching()
+
+        block = block.reshape(sc[0], sc[1], sc[2], self.nats, 8)
+
+        return np.ascontiguousarray(block[:,:,:,:,5:])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _load_atoms(self, f, fname, cache=None):
+
+        """
+        
+        Same as _read_atoms(), but going through the binary copy of 
+        the file when caching is enabled (see cache_file()). Stale or
+        missing copies are (re)written after parsing the text.
+
+        Parameters:
+        ----------
+
+        - f (file): geometry file, opened right after its four-line header.
+        - fname (string): name of the geometry file.
+        - cache (bool): whether to use the binary copy.
+        Defaults to ezSCUP.settings.GEOMETRY_CACHE.
+
+        Return:
+        ----------
+            - a (sx, sy, sz, nats, 3) array with the coordinates in 
+            the file, of the dtype of this geometry.
+
+        """
+
+        if cache is None:
+            cache = cfg.GEOMETRY_CACHE
+
+        if not cache:
+            return self._read_atoms(f).astype(self.dtype, copy=False)
+
+        sc = self.supercell
+        shape = (sc[0], sc[1], sc[2], self.nats, 3)
+
+        atoms = _read_cache(fname, shape)
+        if atoms is None:
+            atoms = self._read_atoms(f)
+            _write_cache(fname, atoms)
+
+        return np.asarray(atoms, dtype=self.dtype)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def load_restart(self, restart_file, cache=None, lazy=False):
+
+        """
+        
+        Loads the given .restart file's information.
+
+        Parameters:
+        ----------
+
+        - restart_file (string): name of the .restart file
+        - cache (bool): whether to use the binary copy of the file,
+        see cache_file(). Defaults to ezSCUP.settings.GEOMETRY_CACHE.
+        - lazy (bool): if True, only the header and strains are read now,
+        and the displacements are parsed on their first access.
+
+        raises: ezSCUP.exceptions.GeometryNotMatching if the geometry contained
+        in the .restart file does not match the one loaded from the reference file.
+
+        """
+
+        self.reset_geom()
+
+        f = _open_text(restart_file)
+        
+        # checks restart file matches loaded geometry
+        self._check_header(f)
+
         # read strains 
         self.strains = np.array(list(map(float, f.readline().split())))
 
-        #read displacements
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-                    # read all atoms within the cell
-                    for j in range(self.nats): 
-                        line = f.readline().split()
-                        self.displacements[x,y,z,j,:] = np.array(list(map(float, line[5:])))
+        # read displacements
+        if lazy:
+            self._pending["displacements"] = (restart_file, cache)
+        else:
+            self.displacements = self._load_atoms(f, restart_file, cache)
 
         f.close()
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    def load_reference(self, reference_file):
+    def load_reference(self, reference_file, cache=None, lazy=False):
 
         """
         
@@ -178,60 +383,171 @@ class Geometry():
         ----------
 
         - reference_file (string): name of the .REF file
+        - cache (bool): whether to use the binary copy of the file,
+        see cache_file(). Defaults to ezSCUP.settings.GEOMETRY_CACHE.
+        - lazy (bool): if True, only the header and lattice vectors are read 
+        now, and the positions are parsed on their first access.
 
         raises: ezSCUP.exceptions.GeometryNotMatching if the geometry contained
         in the .restart file does not match the one loaded from the reference file.
 
         """
 
-        f = open(reference_file)
+        f = _open_text(reference_file)
 
-        # checks restart file matches loaded geometry
-        rsupercell = np.array(list(map(int, f.readline().split())))
-        if not np.all(self.supercell == rsupercell): 
-            raise ezSCUP.exceptions.GeometryNotMatching()
+        # checks reference file matches loaded geometry
+        self._check_header(f)
 
-        rnats, rnels = list(map(int, f.readline().split()))
-        if (rnats != self.nats) or (rnels != self.nels):
-            raise ezSCUP.exceptions.GeometryNotMatching()
+        # read lattice vectors
+        self._read_lattice(f)
 
-        rspecies = f.readline().split()
-        if not (set(rspecies) == set(self.species)):
-            raise ezSCUP.exceptions.GeometryNotMatching()
+        # read reference atomic positions
+        if lazy:
+            self._pending["positions"] = (reference_file, cache)
+        else:
+            self.positions = self._load_atoms(f, reference_file, cache)
+
+        f.close()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _read_lattice(self, f):
+
+        """ Reads the lattice vectors line of an open .REF file. """
 
-        # read lattice vectors
         self.lat_vectors = np.array(list(map(float, f.readline().split())))
         self.lat_constants = np.array([self.lat_vectors[0],self.lat_vectors[4], self.lat_vectors[8]])
         for i in range(self.lat_constants.size): # normalize with supercell size
             self.lat_constants[i] = self.lat_constants[i]/self.supercell[i]
         self.lat_vectors = np.reshape(self.lat_vectors, (3,3))
 
-        # generate positions array
-        sc = self.supercell
-        self.positions = np.zeros([sc[0], sc[1], sc[2], self.nats, 3])
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def load_restart_region(self, restart_file, x=None, y=None, z=None):
+
+        """
         
-        #read reference atomic positions
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-                    # read all atoms within the cell
-                    for j in range(self.nats): 
-                        line = f.readline().split()
-                        self.positions[x,y,z,j,:] = np.array(list(map(float, line[5:])))
+        Loads the strains and the displacements of the atoms within a 
+        region of the given .restart file, reading only that part of the
+        file through its byte-offset index (see index_file()). Displacements
+        outside the region are set to zero.
+
+        Parameters:
+        ----------
+
+        - restart_file (string): name of the .restart file
+        - x, y, z (int or tuple): cells to load along each direction, 
+        either a single index or a (start, stop) range. Defaults to all.
+
+        raises: ezSCUP.exceptions.GeometryNotMatching if the geometry contained
+        in the .restart file does not match the one loaded from the reference file.
+
+        """
+
+        self.reset_geom()
+
+        f = _open_text(restart_file)
+        self._check_header(f)
+        self.strains = np.array(list(map(float, f.readline().split())))
+        f.close()
+
+        self.displacements = self._load_region(restart_file, x, y, z)
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    def load_equilibrium_displacements(self, partials):
+    def load_reference_region(self, reference_file, x=None, y=None, z=None):
+
+        """
+        
+        Loads the lattice vectors and the positions of the atoms within a 
+        region of the given .REF file, reading only that part of the file 
+        through its byte-offset index (see index_file()). Positions 
+        outside the region are set to zero.
+
+        Parameters:
+        ----------
+
+        - reference_file (string): name of the .REF file
+        - x, y, z (int or tuple): cells to load along each direction, 
+        either a single index or a (start, stop) range. Defaults to all.
+
+        raises: ezSCUP.exceptions.GeometryNotMatching if the geometry contained
+        in the .REF file does not match the current one.
+
+        """
+
+        f = _open_text(reference_file)
+        self._check_header(f)
+        self._read_lattice(f)
+        f.close()
+
+        self.positions = self._load_region(reference_file, x, y, z)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _load_region(self, fname, x, y, z):
+
+        """
+
+        Reads the atomic block of the given cells of a geometry file. 
+        The cells of each (x,y) column are contiguous in the file, so
+        every column (or group of adjacent columns) is a single read.
+
+        """
+
+        sc = self.supercell
+        (x0, x1), (y0, y1), (z0, z1) = [_as_range(r, n) for r, n in zip((x, y, z), sc)]
+
+        offsets = load_index(fname)
+        if offsets.size != self.ncells + 1:
+            raise ezSCUP.exceptions.GeometryNotMatching()
+
+        # contiguous runs of cells, merging adjacent columns
+        runs = []
+        for i in range(x0, x1):
+            for j in range(y0, y1):
+                start = (i*sc[1] + j)*sc[2] + z0
+                stop = start + (z1 - z0)
+                if runs and runs[-1][1] == start:
+                    runs[-1][1] = stop
+                else:
+                    runs.append([start, stop])
+
+        atoms = np.zeros([sc[0], sc[1], sc[2], self.nats, 3], dtype=self.dtype)
+        cells = np.reshape(atoms, (self.ncells, self.nats, 3))
+
+        f = _open_text(fname, "rb")
+        for start, stop in runs:
+            f.seek(offsets[start])
+            block = f.read(offsets[stop] - offsets[start])
+            values = np.array(block.split(), dtype=float)
+            if values.size != (stop - start)*self.nats*8:
+                raise ezSCUP.exceptions.GeometryNotMatching()
+            cells[start:stop] = values.reshape(stop - start, self.nats, 8)[...,5:]
+        f.close()
+
+        return atoms
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def load_equilibrium_displacements(self, partials, nthreads=1):
 
         """
         
         Obtains the equilibrium geometry out of several .restart files
         by averaging out their strains and atomic displacements.
 
+        The average is computed in a single streaming pass (Welford's
+        algorithm), which also yields the thermal fluctuations of every
+        strain component and atomic displacement. These are stored in 
+        the "strain_variance" and "disp_variance" attributes.
+
         Parameters:
         ----------
 
         - partials (list): names of the .restart files.
+        - nthreads (int): number of threads used to read the files.
+        Reading ahead is mostly useful on slow or shared storage.
 
         raises: ezSCUP.exceptions.RestartNotMatching if the geometry contained in any
         of the .restart file does not match the one loaded from the reference file.
@@ -245,36 +561,82 @@ class Geometry():
         if npartials == 0:
             raise ezSCUP.exceptions.NotEnoughPartials()
 
-        for p in partials: # iterate over all partial .restarts
+        # always accumulate in double precision
+        strains_m2 = np.zeros(6)
+        disps_mean = np.zeros(self.displacements.shape)
+        disps_m2 = np.zeros(self.displacements.shape)
 
-            f = open(p)
-        
-            # checks restart file matches loaded geometry
-            rsupercell = np.array(list(map(int, f.readline().split())))
-            if not np.all(self.supercell == rsupercell): 
-                raise ezSCUP.exceptions.GeometryNotMatching()
+        # iterate over all partial .restarts
+        for n, (strains, disps) in enumerate(self._iter_partials(partials, nthreads), start=1):
 
-            rnats, rnels = list(map(int, f.readline().split()))
-            if (rnats != self.nats) or (rnels != self.nels):
-                raise ezSCUP.exceptions.GeometryNotMatching()
+            # strain contributions
+            delta = strains - self.strains
+            self.strains += delta/n
+            strains_m2 += delta*(strains - self.strains)
 
-            rspecies = f.readline().split()
-            if not (set(rspecies) == set(self.species)):
-                raise ezSCUP.exceptions.GeometryNotMatching()
+            # displacement contributions, in place
+            delta = disps - disps_mean
+            disps_mean += delta/n
+            disps -= disps_mean
+            disps *= delta
+            disps_m2 += disps
 
-            # add strain contributions
-            self.strains += np.array(list(map(float, f.readline().split())))/npartials
-
-            #read displacements
-            for x in range(self.supercell[0]):
-                for y in range(self.supercell[1]):
-                    for z in range(self.supercell[2]):
-                        # read all atoms within the cell
-                        for j in range(self.nats): 
-                            line = f.readline().split()
-                            self.displacements[x,y,z,j,:] += np.array(list(map(float, line[5:])))/npartials
-    
-            f.close()
+        self.displacements = disps_mean.astype(self.dtype, copy=False)
+        self.strain_variance = strains_m2/npartials
+        self.disp_variance = (disps_m2/npartials).astype(self.dtype, copy=False)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _read_partial(self, restart_file):
+
+        """ Reads the strains and displacements of a .restart file, without storing them. """
+
+        f = _open_text(restart_file)
+
+        # checks restart file matches loaded geometry
+        self._check_header(f)
+
+        strains = np.array(list(map(float, f.readline().split())))
+        disps = self._read_atoms(f)
+
+        f.close()
+
+        return strains, disps
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _iter_partials(self, partials, nthreads=1):
+
+        """
+
+        Yields the strains and displacements of several .restart files, in order.
+
+        With more than one thread, files are read ahead by a thread pool,
+        keeping at most two files per thread in memory at any time.
+
+        Parameters:
+        ----------
+
+        - partials (list): names of the .restart files.
+        - nthreads (int): number of threads used to read the files.
+
+        """
+
+        if nthreads <= 1:
+            for p in partials:
+                yield self._read_partial(p)
+            return
+
+        with ThreadPoolExecutor(max_workers=nthreads) as pool:
+
+            pending = deque()
+            for p in partials:
+                pending.append(pool.submit(self._read_partial, p))
+                if len(pending) >= 2*nthreads:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
@@ -292,7 +654,7 @@ class Geometry():
 
         """
 
-        f = open(restart_file, 'wt')
+        f = _open_text(restart_file, 'wt')
         tsv = csv.writer(f, delimiter="\t")
 
         # write header
@@ -306,26 +668,8 @@ class Geometry():
         tsv.writerow(pstrains)
 
         # write displacements
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-                    for j in range(self.nats):
-                        
-                        line = [x, y ,z, j+1]
-
-                        if j+1 > self.nels:
-                            species = self.nels
-                        else:
-                            species = j+1
-                        
-                        line.append(species)
-
-                        disps = list(self.displacements[x,y,z,j,:])
-                        disps = ["{:.8E}".format(d) for d in disps]
-
-                        line = line + disps
-                    
-                        tsv.writerow(line)
+        _write_table(f, "%d\t%d\t%d\t%d\t%d\t%.8E\t%.8E\t%.8E",
+            self._atom_table(), np.reshape(self.displacements, (-1, 3)))
         
         f.close()
 
@@ -346,7 +690,7 @@ class Geometry():
         if self.positions is None: 
             raise ezSCUP.exceptions.PositionsNotLoaded()
 
-        f = open(reference_file, 'wt')
+        f = _open_text(reference_file, 'wt')
         tsv = csv.writer(f, delimiter="\t")
 
         # write header
@@ -355,32 +699,13 @@ class Geometry():
         tsv.writerow(self.species)      
         
         # write lattice vectors
-        pvectors = list(self.lat_vectors)
+        pvectors = list(np.ravel(self.lat_vectors))
         pvectors = ["{:.8E}".format(s) for s in pvectors]
         tsv.writerow(pvectors) 
 
         # write positions
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-    
-                    for j in range(self.nats):
-                        
-                        line = [x, y ,z, j+1]
-
-                        if j+1 > self.nels:
-                            species = self.nels
-                        else:
-                            species = j+1
-                        
-                        line.append(species)
-
-                        disps = list(self.positions[x,y,z,j,:])
-                        disps = ["{:.8E}".format(d) for d in disps]
-
-                        line = line + disps
-                    
-                        tsv.writerow(line)
+        _write_table(f, "%d\t%d\t%d\t%d\t%d\t%.8E\t%.8E\t%.8E",
+            self._atom_table(), np.reshape(self.positions, (-1, 3)))
         
         f.close()
 
@@ -392,17 +717,9 @@ class Geometry():
 
         natoms = self.nats*self.ncells
 
-        strain=np.zeros((3,3))
-        for i in range(3):
-            strain[i,i]=1+self.strains[i]
-        strain[1,2]=self.strains[3]        
-        strain[2,1]=self.strains[3]        
-        strain[0,2]=self.strains[4]        
-        strain[2,0]=self.strains[4]
-        strain[0,1]=self.strains[5]        
-        strain[1,0]=self.strains[5]
+        strain = self._strain_matrix()
 
-        f = open(xyz_file, 'wt')
+        f = _open_text(xyz_file, 'wt')
         tsv = csv.writer(f, delimiter="\t")
 
         # write number of atoms and comment
@@ -410,27 +727,8 @@ class Geometry():
         tsv.writerow([comment])   
         
         # write position of each atom
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-    
-                    for j in range(self.nats):
-                        
-                        line = [x, y ,z, j+1]
-
-                        if j+1 > self.nels:
-                            species = self.nels
-                        else:
-                            species = j+1
-                        
-                        line = [self.species[species-1]]
-
-                        disps = list(np.dot(strain, self.B2A*(self.positions[x,y,z,j,:] + self.displacements[x,y,z,j,:])))
-                        disps = ["{:.8E}".format(d) for d in disps]
-
-                        line = line + disps
-                    
-                        tsv.writerow(line)
+        positions = self._strained_positions(strain, factor=self.B2A)
+        _write_table(f, "%s\t%.8E\t%.8E\t%.8E", self._species_labels(), positions)
         
         f.close()
 
@@ -441,20 +739,12 @@ class Geometry():
 
         natoms = self.nats*self.ncells
 
-        strain=np.zeros((3,3))
-        for i in range(3):
-            strain[i,i]=1+self.strains[i]
-        strain[1,2]=self.strains[3]        
-        strain[2,1]=self.strains[3]        
-        strain[0,2]=self.strains[4]        
-        strain[2,0]=self.strains[4]
-        strain[0,1]=self.strains[5]        
-        strain[1,0]=self.strains[5]
+        strain = self._strain_matrix()
 
         # Get the global cell vectors
         slat_vec = np.dot(strain, self.lat_vectors)
 
-        f = open(xsf_file, 'wt')
+        f = _open_text(xsf_file, 'wt')
         tsv = csv.writer(f, delimiter="\t")
 
         # initial comment
@@ -472,31 +762,13 @@ class Geometry():
         tsv.writerow([natoms,1])
 
         # write position of each atom
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-    
-                    for j in range(self.nats):
-                        
-                        line = [x, y ,z, j+1]
-
-                        if j+1 > self.nels:
-                            species = self.nels
-                        else:
-                            species = j+1
-                        
-                        line = [self.species[species-1]]
-                        positions = list(np.dot(strain, self.B2A*(self.positions[x,y,z,j,:] + self.displacements[x,y,z,j,:])))
-                        positions = ["{:8.4F}".format(d) for d in positions]
-
-                        line = line + positions
-
-                        if vector_field is not None:
-                            vecs = list(vector_field[x,y,z,j,:])
-                            vecs = ["{:8.4F}".format(d) for d in vecs]
-                            line = line + vecs
+        positions = self._strained_positions(strain, factor=self.B2A)
 
-                        tsv.writerow(line)
+        if vector_field is None:
+            _write_table(f, "%s\t%8.4F\t%8.4F\t%8.4F", self._species_labels(), positions)
+        else:
+            _write_table(f, "%s\t%8.4F\t%8.4F\t%8.4F\t%8.4F\t%8.4F\t%8.4F", 
+                self._species_labels(), positions, np.reshape(vector_field, (-1, 3)))
 
         f.close()
 
@@ -513,9 +785,38 @@ class Geometry():
 
         """
 
-        f = open(siesta_file, 'wt')
+        f = _open_text(siesta_file, 'wt')
         tsv = csv.writer(f, delimiter="\t")
 
+        strain = self._strain_matrix()
+
+        lat_vec = np.dot(strain, self.lat_vectors)
+        lat_vec = np.array([lat_vec[0,0], lat_vec[1,1], lat_vec[2,2]])*self.supercell
+
+        # block header
+        #tsv.writerow(["AtomicCoordinatesFormat	    Fractional"])
+        #tsv.writerow(["AtomCoorFormatOut            Fractional"])
+        tsv.writerow([r"%block AtomicCoordinatesAndAtomicSpecies"])
+
+        # write block: fractional positions, species number, 
+        # atom number and species label
+        positions = self._strained_positions(strain)/lat_vec
+        species = self._atom_table()[:,4:]
+        numbers = np.arange(1, self.ncells*self.nats + 1)[:,None]
+
+        _write_table(f, "%.8F\t%.8F\t%.8F\t%d\t%d\t%s", 
+            positions, species, numbers, self._species_labels())
+
+        tsv.writerow([r"%endblock AtomicCoordinatesAndAtomicSpecies"])
+        
+        f.close()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _strain_matrix(self):
+
+        """ Deformation matrix (identity plus strain tensor) of the current strains. """
+
         strain=np.zeros((3,3))
         for i in range(3):
             strain[i,i]=1+self.strains[i]
@@ -526,48 +827,392 @@ class Geometry():
         strain[0,1]=self.strains[5]        
         strain[1,0]=self.strains[5]
 
-        lat_vec = np.dot(strain, self.lat_vectors)
-        lat_vec = np.array([lat_vec[0,0], lat_vec[1,1], lat_vec[2,2]])*self.supercell
+        return strain
 
-        # block header
-        #tsv.writerow(["AtomicCoordinatesFormat	    Fractional"])
-        #tsv.writerow(["AtomCoorFormatOut            Fractional"])
-        tsv.writerow([r"%block AtomicCoordinatesAndAtomicSpecies"])
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-        # write block
-        at = 0
-        for x in range(self.supercell[0]):
-            for y in range(self.supercell[1]):
-                for z in range(self.supercell[2]):
-                    for j in range(self.nats):
-
-                        # fractional positions
-                        pos = np.dot(strain, self.positions[x,y,z,j,:] + self.displacements[x,y,z,j,:])
-                        pos = pos/lat_vec
-                        pos = ["{:.8F}".format(p) for p in pos]
-                        line = pos
-
-                        if j+1 > self.nels:
-                            species = self.nels
-                        else:
-                            species = j+1
-                        
-                        # species number
-                        line.append(species)
-
-                        # atom number
-                        at += 1
-                        line.append(str(at))
-
-                        # species label
-                        line.append(self.species[species-1])
-                    
-                        tsv.writerow(line)
+    def _strained_positions(self, strain, factor=1.):
 
-        tsv.writerow([r"%endblock AtomicCoordinatesAndAtomicSpecies"])
+        """ 
         
-        f.close()
+        Strained positions (reference positions plus displacements) of
+        every atom as a (ncells*nats, 3) array, in file order, obtained 
+        through a single matrix product.
+        
+        """
+
+        positions = factor*(self.positions + self.displacements)
+        return np.reshape(positions, (-1, 3)) @ strain.T
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _atom_table(self):
+
+        """ 
+        
+        Integer columns of the geometry files as a (ncells*nats, 5) array,
+        in file order: cell indices (x, y, z), atom number and species number.
+        Atoms beyond the number of species are assigned the last species.
+        
+        """
+
+        sc = self.supercell
+        table = np.zeros((sc[0], sc[1], sc[2], self.nats, 5), dtype=np.int64)
+
+        table[:,:,:,:,0] = np.arange(sc[0])[:,None,None,None]
+        table[:,:,:,:,1] = np.arange(sc[1])[None,:,None,None]
+        table[:,:,:,:,2] = np.arange(sc[2])[None,None,:,None]
+        table[:,:,:,:,3] = np.arange(1, self.nats + 1)
+        table[:,:,:,:,4] = np.minimum(np.arange(1, self.nats + 1), self.nels)
+
+        return np.reshape(table, (-1, 5))
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _species_labels(self):
+
+        """ Species label of every atom as a (ncells*nats, 1) array, in file order. """
+
+        species = np.minimum(np.arange(1, self.nats + 1), self.nels)
+        labels = np.array(self.species, dtype=object)[species - 1]
+
+        return np.reshape(np.tile(labels, self.ncells), (-1, 1))
 
 # ================================================================= #
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
-# ================================================================= #
\ No newline at end of file
+# ================================================================= #
+
+def probe(geometry_file):
+
+    """
+
+    Reads the header of a .restart/.REF file, without parsing its 
+    atomic block. Useful to scan large numbers of files.
+
+    Parameters:
+    ----------
+
+    - geometry_file (string): name of the .restart/.REF file
+
+    Return:
+    ----------
+        - a dictionary with the supercell shape ("supercell"), number of 
+        atoms per cell ("nats"), number of species ("nels") and species 
+        ("species") of the file, plus either its strains ("strains", .restart 
+        files) or its lattice vectors ("lat_vectors", .REF files).
+
+    """
+
+    f = _open_text(geometry_file)
+
+    header = {}
+    header["supercell"] = np.array(list(map(int, f.readline().split())))
+    header["nats"], header["nels"] = list(map(int, f.readline().split()))
+    header["species"] = f.readline().split()
+
+    values = np.array(list(map(float, f.readline().split())))
+    if values.size == 9:
+        header["lat_vectors"] = np.reshape(values, (3,3))
+    else:
+        header["strains"] = values
+
+    f.close()
+
+    return header
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def cache_file(geometry_file):
+
+    """
+
+    Name of the binary copy of a .restart/.REF file, stored next to it.
+
+    # CACHE FORMAT #
+
+    The copy is a plain .npy file holding a (ncells*nats + 1, 3) float
+    array. The first row stores the size and modification time of the 
+    text file at the time it was parsed, and the rest are the atomic 
+    coordinates in the file. The copy is only used while that first row
+    still matches the text file, and it is loaded as a copy-on-write
+    memory map, so modifying the loaded arrays never touches the disk.
+
+    The header of the text file is always read, so geometry checks
+    are carried out exactly as without the cache.
+
+    Parameters:
+    ----------
+
+    - geometry_file (string): name of the .restart/.REF file
+
+    Return:
+    ----------
+        - name of the corresponding binary copy.
+
+    """
+
+    return geometry_file + ".npy"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# compression codecs supported for geometry files, by extension
+CODECS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open, ".lzma": lzma.open}
+
+def compress_file(geometry_file, codec="gz"):
+
+    """
+
+    Compresses a .restart/.REF file, streaming it into 
+    "[geometry_file].[codec]" and then removing the original, along
+    with its binary copy and index (see cache_file() and index_file()),
+    if any. The compressed file can be loaded as usual with Geometry.
+
+    Parameters:
+    ----------
+
+    - geometry_file (string): name of the .restart/.REF file
+    - codec (string): codec to use, any extension in ezSCUP.geometry.CODECS
+    without the dot (ie. "gz" or "xz")
+
+    Return:
+    ----------
+        - name of the compressed file.
+
+    raises: ezSCUP.exceptions.InvalidCompressionCodec if the codec is unknown.
+
+    """
+
+    ext = "." + codec.lstrip(".")
+    if ext not in CODECS:
+        raise ezSCUP.exceptions.InvalidCompressionCodec(codec)
+
+    compressed = geometry_file + ext
+    temp = compressed + ".{:d}.tmp".format(os.getpid())
+
+    with open(geometry_file, "rb") as src, CODECS[ext](temp, "wb") as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+
+    os.replace(temp, compressed)
+    os.remove(geometry_file)
+
+    # side files of the original, they would only be left stale
+    for side in (cache_file(geometry_file), index_file(geometry_file)):
+        if os.path.exists(side):
+            os.remove(side)
+
+    return compressed
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def strip_codec(fname):
+
+    """ File name without its compression extension, if it has one. """
+
+    root, ext = os.path.splitext(fname)
+    return root if ext in CODECS else fname
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _open_text(fname, mode="rt"):
+
+    """ Opens a text file, (de)compressing it on the fly if needed. """
+
+    ext = os.path.splitext(fname)[1]
+    if ext in CODECS:
+        return CODECS[ext](fname, mode)
+
+    return open(fname, mode)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _file_stamp(fname):
+
+    """ Size and modification time of a file, as a cache key row. """
+
+    stat = os.stat(fname)
+    return np.array([stat.st_size, stat.st_mtime, 0.])
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _read_cache(fname, shape):
+
+    """ 
+    
+    Memory-maps the binary copy of the given file, if there is a valid one.
+    Returns None if the copy is missing, stale or of the wrong shape.
+    
+    """
+
+    try:
+        cached = np.load(cache_file(fname), mmap_mode="c")
+    except (OSError, ValueError):
+        return None
+
+    if cached.ndim != 2 or cached.shape[0] != int(np.prod(shape[:-1])) + 1:
+        return None
+
+    if not np.array_equal(cached[0], _file_stamp(fname)):
+        return None
+
+    return cached[1:].reshape(shape)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _write_cache(fname, atoms):
+
+    """ 
+    
+    Stores the binary copy of the given file. The copy is written to a 
+    temporary file first, so concurrent readers never see a partial copy.
+    Unwritable locations are silently skipped.
+    
+    """
+
+    cfile = cache_file(fname)
+    temp = cfile + ".{:d}.tmp".format(os.getpid())
+
+    data = np.concatenate([_file_stamp(fname)[None,:], np.reshape(atoms, (-1, 3))])
+
+    try:
+        with open(temp, "wb") as f:
+            np.save(f, data)
+        os.replace(temp, cfile)
+    except OSError:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def index_file(geometry_file):
+
+    """
+
+    Name of the byte-offset index of a .restart/.REF file, stored next to it.
+
+    # INDEX FORMAT #
+
+    The index is a plain .npy file holding an int64 array. The first two
+    values store the size and modification time (in ns) of the text file
+    when it was indexed, and the remaining ncells + 1 values are the 
+    byte offsets where the atomic block of each unit cell starts, in
+    file order, followed by the offset of the end of the last one.
+    The index is rebuilt whenever the first two values are outdated.
+
+    Parameters:
+    ----------
+
+    - geometry_file (string): name of the .restart/.REF file
+
+    Return:
+    ----------
+        - name of the corresponding index file.
+
+    """
+
+    return geometry_file + ".idx.npy"
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def load_index(geometry_file):
+
+    """
+
+    Byte offset of the atomic block of each unit cell of a .restart/.REF 
+    file, read from its index (see index_file()) or built and stored 
+    if there is no valid one. Compressed files can be indexed too, but
+    seeking within them requires decompressing everything before the
+    requested offset, so they gain little from it.
+
+    Parameters:
+    ----------
+
+    - geometry_file (string): name of the .restart/.REF file
+
+    Return:
+    ----------
+        - (ncells + 1) array of byte offsets, the last one 
+        being the end of the atomic block.
+
+    """
+
+    stat = os.stat(geometry_file)
+    stamp = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+    try:
+        index = np.load(index_file(geometry_file))
+        if index.ndim == 1 and index.size > 2 and np.array_equal(index[:2], stamp):
+            return index[2:]
+    except (OSError, ValueError):
+        pass
+
+    header = probe(geometry_file)
+    ncells = int(np.prod(header["supercell"]))
+    nlines = ncells*header["nats"]
+
+    f = _open_text(geometry_file, "rb")
+    data = f.read()
+    f.close()
+
+    # start of every line after the header
+    newlines = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+    starts = np.concatenate([newlines[3:] + 1, [len(data)]])
+    if starts.size < nlines + 1:
+        raise ezSCUP.exceptions.GeometryNotMatching()
+
+    offsets = starts[0:nlines+1:header["nats"]].astype(np.int64)
+
+    # same temporary file scheme as _write_cache()
+    ifile = index_file(geometry_file)
+    temp = ifile + ".{:d}.tmp".format(os.getpid())
+    try:
+        with open(temp, "wb") as f:
+            np.save(f, np.concatenate([stamp, offsets]))
+        os.replace(temp, ifile)
+    except OSError:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    return offsets
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _as_range(cells, n):
+
+    """ (start, stop) range of cells out of an index, a range or None. """
+
+    if cells is None:
+        return 0, int(n)
+    if np.isscalar(cells):
+        return int(cells), int(cells) + 1
+
+    start, stop = cells
+    return int(start), int(stop)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _write_table(f, row_format, *columns):
+
+    """
+
+    Writes a whole table of rows in a single formatting call, instead
+    of going through csv.writer row by row. Rows are tab-separated and
+    end in "\\r\\n", exactly as the csv.writer rows in the rest of the file.
+
+    Parameters:
+    ----------
+
+    - f (file): open file where to write the table.
+    - row_format (string): %-style format of a single row, without terminator.
+    - columns (arrays): (nrows, ncols) blocks of columns, in order.
+
+    """
+
+    table = np.empty((len(columns[0]), sum(np.shape(c)[1] for c in columns)), dtype=object)
+
+    col = 0
+    for c in columns:
+        table[:, col:col + np.shape(c)[1]] = c
+        col += np.shape(c)[1]
+
+    f.write(((row_format + "\r\n")*table.shape[0]) % tuple(table.ravel().tolist()))
+
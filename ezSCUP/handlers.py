@@ -9,6 +9,8 @@ import numpy as np
 # standard library imports
 from copy import deepcopy   # proper array copy
 from pathlib import Path
+import subprocess
+import shutil
 import os, sys
 
 # package imports
@@ -245,10 +247,12 @@ class SCUPHandler():
                 f.write(string)
                 f.write(r"%endblock " + k + "\n")
 
+        f.close()
+
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    def launch(self, output_file=None):
+    def launch(self, output_file=None, folder=None):
 
         """
         Execute a SCALE-UP simulation with the current FDF settings.
@@ -256,28 +260,40 @@ class SCUPHandler():
         Parameters:
         ----------
         - output_file: human output filename. Defaults to [system_name].out.
+        - folder (string): directory to run the simulation in, where the input
+        and output files live. Defaults to the current working directory.
+        Several simulations may run at once in different folders.
 
         """
 
-        if not os.path.exists(self.scup_exec):
+        # executable, either a path or a command on the PATH
+        if os.sep in str(self.scup_exec):
+            scup_exec = os.path.abspath(self.scup_exec)
+        else:
+            scup_exec = shutil.which(str(self.scup_exec)) or os.path.abspath(self.scup_exec)
+
+        if not os.path.exists(scup_exec):
             print("WARNING: SCUP executable provided does not exist.")
             raise ezSCUP.exceptions.NoSCUPExecutableDetected
 
 
         if output_file == None:
             # set default value after we know settings are loaded
-            output_file = self.settings["System_name"] + ".out"
+            output_file = str(self.settings["system_name"]) + ".out"
 
-        # create temporary input
-        self.save_as("_ezSCUPmoddedinput.fdf")
+        if folder == None:
+            folder = os.getcwd()
 
-        command = self.scup_exec + " < _ezSCUPmoddedinput.fdf > " + output_file
+        # create temporary input
+        input_file = os.path.join(folder, "_ezSCUPmoddedinput.fdf")
+        self.save_as(input_file)
 
         # execute simulation
-        os.system(command)
+        with open(input_file, "r") as fin, open(os.path.join(folder, output_file), "w") as fout:
+            subprocess.run([scup_exec], stdin=fin, stdout=fout, cwd=folder)
 
         # remove temporary input
-        os.remove("_ezSCUPmoddedinput.fdf")
+        os.remove(input_file)
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
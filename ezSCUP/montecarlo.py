@@ -18,7 +18,8 @@ import re                           # regular expressions
 
 # package imports
 from ezSCUP.handlers import MC_SCUPHandler, FDFSetting
-from ezSCUP.geometry import Geometry
+from ezSCUP.geometry import Geometry, compress_file, strip_codec
+from ezSCUP.trajectory import pack_trajectory, load_trajectory, trajectory_is_current, export_archive
 
 from ezSCUP.srtio3.models import STO_JPCM2013
 
@@ -32,6 +33,9 @@ import ezSCUP.exceptions
 # + class MCSimulationParser() 
 #   - __init__()
 #   - access()
+#   - find_partials()
+#   - access_trajectory()
+#   - export_archive()
 #   - print_simulation_setup()
 #
 # + class MCSimulation():
@@ -195,7 +199,8 @@ class MCSimulationParser:
 
         """
 
-        Return the partial .restart files for a given configuration
+        Return the partial .restart files for a given configuration,
+        compressed (ie. ".restart.gz") or not.
 
         Parameters:
         ----------
@@ -217,22 +222,122 @@ class MCSimulationParser:
         folder, sim_name = self.get_location(t, p, s, f)
 
         partials = [k for k in os.listdir(folder) if 'partial' in k]
-        partials = sorted([k for k in partials if '.restart' in k])
+        partials = sorted([k for k in partials if strip_codec(k).endswith('.restart')])
         #partials = [os.path.join(folder, p) for p in partials]
 
-        low_filter = [int(p[len(sim_name)+10:-8]) > min_step for p in partials]
+        low_filter = [self._partial_step(sim_name, p) > min_step for p in partials]
         partials = [p for i, p in enumerate(partials) if low_filter[i]]
 
-        high_filter = [int(p[len(sim_name)+10:-8]) < max_step for p in partials]
+        high_filter = [self._partial_step(sim_name, p) < max_step for p in partials]
         partials = [p for i, p in enumerate(partials) if high_filter[i]]
 
         partials = [os.path.join(folder, p) for p in partials]
         return partials
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def _partial_step(self, sim_name, partial):
+
+        """ MC step of a given partial .restart file. """
+
+        partial = strip_codec(os.path.basename(partial))
+        return int(partial[len(sim_name)+10:-8])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def access_trajectory(self, t, p=None, s=None, f=None, min_step=0, max_step=np.inf):
+
+        """
+
+        Access the partial .restart files of the corresponding configuration
+        as a single memory-mapped trajectory (see ezSCUP.trajectory).
+
+        The first call packs every partial of the configuration into the 
+        "[sim_name]_TRAJECTORY.npy/.npz" files within its folder. Later calls 
+        just map those files, unless any partial has been added, removed or
+        rewritten (different size or modification time) since.
+
+        Parameters:
+        ----------
+
+        - t (float): Temperature (compulsory)
+        - p (array): Pressure (optional)
+        - s (array): Strain (optional)
+        - f (array): Electric Field (optional)
+
+        - min_step (int): minimum step of the requested snapshots.
+        - max_step (int): maximum step of the requested snapshots.
+
+        Return:
+        ----------
+            - A Trajectory object with the requested snapshots.
+
+        """
+
+        folder, sim_name = self.get_location(t, p, s, f)
+        trajectory_file = os.path.join(folder, sim_name + "_TRAJECTORY")
+
+        partials = self.find_partials(t, p, s, f, min_step=-np.inf)
+        steps = np.array([self._partial_step(sim_name, k) for k in partials], dtype=np.int64)
+
+        traj = None
+        if trajectory_is_current(trajectory_file, partials, steps):
+            try:
+                traj = load_trajectory(trajectory_file)
+            except (OSError, ValueError, KeyError, ezSCUP.exceptions.GeometryNotMatching):
+                traj = None
+
+        # (re)pack the partials if needed
+        if traj is None:
+            traj = pack_trajectory(partials, steps, trajectory_file, 
+                self.supercell, self.model["species"], self.model["nats"])
+
+        return traj.window(min_step, max_step)
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def export_archive(self, t, p=None, s=None, f=None, archive_file=None):
+
+        """
+
+        Stores every partial .restart file of the corresponding configuration
+        as a compact, lossy archive (see ezSCUP.trajectory.export_archive()),
+        which can be read back with ezSCUP.trajectory.load_archive().
+
+        Parameters:
+        ----------
+
+        - t (float): Temperature (compulsory)
+        - p (array): Pressure (optional)
+        - s (array): Strain (optional)
+        - f (array): Electric Field (optional)
+
+        - archive_file (string): base name of the archive file, defaults
+        to "[sim_name]_ARCHIVE" within the configuration folder.
+
+        Return:
+        ----------
+            - the name of the archive file.
+            - the maximum quantization error of the archive, in Bohrs.
+
+        """
+
+        folder, sim_name = self.get_location(t, p, s, f)
+        if archive_file is None:
+            archive_file = os.path.join(folder, sim_name + "_ARCHIVE")
+
+        partials = self.find_partials(t, p, s, f, min_step=-np.inf)
+        steps = [self._partial_step(sim_name, k) for k in partials]
+
+        max_error = export_archive(partials, steps, archive_file,
+            self.supercell, self.model["species"], self.model["nats"])
+
+        return archive_file + ".npz", max_error
     
 
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    def access_geometry(self, t, p=None, s=None, f=None):
+    def access_geometry(self, t, p=None, s=None, f=None, lazy=False):
 
         """
 
@@ -246,6 +351,9 @@ class MCSimulationParser:
         - s (array): Strain (optional)
         - f (array): Electric Field (optional)
 
+        - lazy (bool): defer parsing positions and displacements until
+        they are first accessed (see Geometry.load_restart).
+
         Return:
         ----------
             - A Geometry object for the corresponding configuration.
@@ -259,8 +367,8 @@ class MCSimulationParser:
         restart_file = os.path.join(folder, sim_name + "_EQUILIBRIUM.restart")
 
         geo = Geometry(self.supercell, self.model["species"], self.model["nats"])
-        geo.load_reference(reference_file)
-        geo.load_restart(restart_file)
+        geo.load_reference(reference_file, lazy=lazy)
+        geo.load_restart(restart_file, lazy=lazy)
         
         return geo
 
@@ -772,6 +880,12 @@ class MCSimulation:
                         aux_geo.load_equilibrium_displacements(partials)
                         aux_geo.write_restart(os.path.join(configuration_folder, sim_name + "_EQUILIBRIUM.restart"))
 
+                        # compress the partials, if requested
+                        if cfg.COMPRESS_PARTIALS is not None:
+                            print("Compressing partial .restart files...")
+                            for partial in parser.find_partials(t, p=p, s=s, f=f, min_step=-np.inf):
+                                compress_file(partial, cfg.COMPRESS_PARTIALS)
+
                         print("All files stored in output/" + subfolder_name + " succesfully.\n")
 
         self.generator.reset_geom()
@@ -938,6 +1052,12 @@ class MCSimulation:
                         aux_geo.load_equilibrium_displacements(partials)
                         aux_geo.write_restart(os.path.join(configuration_folder, sim_name + "_EQUILIBRIUM.restart"))
 
+                        # compress the partials, if requested
+                        if cfg.COMPRESS_PARTIALS is not None:
+                            print("Compressing partial .restart files...")
+                            for partial in parser.find_partials(t, p=p, s=s, f=f, min_step=-np.inf):
+                                compress_file(partial, cfg.COMPRESS_PARTIALS)
+
                         # grab final geometry for next run if needed
                         if tcount < len(temp_sequence): 
                             geo = parser.access_geometry(t, p=p, s=s, f=f)
@@ -5,6 +5,14 @@ Several functions regarding the obtention of normal vibrational modes.
 # third party imports
 import numpy as np
 
+# standard library imports
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy   # proper array copy
+import itertools
+import threading
+import tempfile
+import shutil
+
 # package imports
 from ezSCUP.singlepoint import SPRun
 from ezSCUP.geometry import Geometry
@@ -16,71 +24,659 @@ import ezSCUP.exceptions
 # MODULE STRUCTURE
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 #
-# + func finite_hessian()
+# + func finite_hessian(geo, parameter_file, disp, nworkers, model, cache, method)
+# + func hessian_plan(nats, disp, ops)
+# + func displacement_key(displacement)
+# + func point_group(model, geo, tol)
+# + func run_displaced(geo, parameter_file, displacements, nworkers)
+# + func supercell_force_constants(geo, parameter_file, supercell, disp, nworkers, cache)
+# + func dynamical_matrices(fc, masses, qpoints, lat_vectors, positions, tol)
+# + func phonons(fc, masses, qpoints, lat_vectors, positions)
+# + func q_path(path, npoints)
+# + func get_normal_modes(masses, hessian)
 #
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def finite_hessian(geo, parameter_file, disp=0.001):
+# high-symmetry points of the simple cubic Brillouin zone, in reduced units
+CUBIC_POINTS = {
+    "G": (0.0, 0.0, 0.0),
+    "X": (0.5, 0.0, 0.0),
+    "M": (0.5, 0.5, 0.0),
+    "R": (0.5, 0.5, 0.5)
+}
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def finite_hessian(geo, parameter_file, disp=0.001, nworkers=1, model=None, cache=None, method="energy"):
+
+    """
+
+    Calculates the Hessian of a single unit cell through finite
+    differences, with one single point SCALE-UP run per distinct 
+    displaced geometry. Two methods are available:
+
+    - "energy": second differences of the energy (see hessian_plan()),
+
+        H[p,p] = (E(+p) + E(-p) - 2 E0) / disp^2
+        H[p1,p2] = (E(+p1,+p2) - E(+p1,-p2) - E(-p1,+p2) + E(-p1,-p2)) / (4 disp^2)
+
+    evaluating only the upper triangle, so about 2*(3*nats)^2 runs.
+
+    - "forces": central differences of the atomic forces,
+
+        H[p,:] = -(F(+p) - F(-p)) / (2 disp)
+
+    symmetrized afterwards, so just 2*(3*nats) runs. Needs the forces
+    in the single point output (see cfg.SP_FORCES_SEARCH_WORD).
+
+    Runs are independent, so they are spread over a pool of workers 
+    (see run_displaced()).
+
+    Parameters:
+    ----------
+
+    - geo (Geometry): reference geometry, its supercell is set to [1,1,1].
+    - parameter_file (string): model parameter file (.xml).
+    - disp (float): displacement of each finite difference (in bohr).
+    - nworkers (int): number of single point runs at once.
+    - model (dict): model of the system (ie. STO_JPCM2013). If given,
+    entries (or force rows) related by its point group (see point_group()) 
+    are only evaluated once.
+    - cache (dict): memo of SPRun() outputs, keyed by displacement (see 
+    displacement_key()). Runs already in it are skipped, and new ones 
+    are added. Only valid for the same geometry and parameter file.
+    - method (string): either "energy" (default) or "forces".
+
+    Return:
+    ----------
+        - the (3*nats, 3*nats) Hessian, in eV/bohr2.
+
+    raises: ValueError if method is neither "energy" nor "forces".
+    raises: ezSCUP.exceptions.MissingForces if the "forces" method is
+    used and the forces are not found in the single point output.
+
+    """
+
+    if method != "energy" and method != "forces":
+        raise ValueError(f"unknown Hessian method {method!r}; expected 'energy' or 'forces'")
 
-    pf = parameter_file
     geo.supercell = np.array([1,1,1])
     hessian = np.zeros([(3*geo.nats), (3*geo.nats)])
 
-    for a1 in range(geo.nats):
-        for c1 in range(3):
-            p1 = 3*a1 + c1
-            for a2 in range(geo.nats):
-                for c2 in range(3):
-                    p2 = 3*a2 + c2
-
-                    if p1 == p2:
-                        d0 = geo.displacements[0,0,0,a1,c1] 
-                        geo.displacements[0,0,0,a1,c1] = d0 + disp
-                        energy_f = SPRun(pf,geo)["total_delta"]
-                        geo.displacements[0,0,0,a1,c1] = d0 - disp
-                        energy_b = SPRun(pf,geo)["total_delta"]
-                        hessian[p1,p2] = (energy_f+energy_b)/(disp**2)
-                        geo.displacements[0,0,0,a1,c1] = d0
-                    else:
-                        d01 = geo.displacements[0,0,0,a1,c1] 
-                        d02 = geo.displacements[0,0,0,a2,c2]
-
-                        geo.displacements[0,0,0,a1,c1] = d01 + disp
-                        geo.displacements[0,0,0,a2,c2] = d02 + disp
-                        energy_pp = SPRun(pf,geo)["total_delta"]
-
-                        geo.displacements[0,0,0,a1,c1] = d01 + disp
-                        geo.displacements[0,0,0,a2,c2] = d02 - disp
-                        energy_pm = SPRun(pf,geo)["total_delta"]
-
-                        geo.displacements[0,0,0,a1,c1] = d01 - disp
-                        geo.displacements[0,0,0,a2,c2] = d02 + disp
-                        energy_mp = SPRun(pf,geo)["total_delta"]
-
-                        geo.displacements[0,0,0,a1,c1] = d01 - disp
-                        geo.displacements[0,0,0,a2,c2] = d02 - disp
-                        energy_mm = SPRun(pf,geo)["total_delta"]
-
-                        hessian[p1,p2]=(energy_pp-energy_pm-energy_mp+energy_mm)/(4*disp**2)
-
-                        geo.displacements[0,0,0,a1,c1] = d01
-                        geo.displacements[0,0,0,a2,c2] = d02
+    ops = point_group(model, geo) if model is not None else None
+    memo = {} if cache is None else cache
+
+    if method == "forces":
+
+        operators = _operators(geo.nats, ops)
+        reps = _coordinate_representatives(operators)
+
+        displacements = [((p, disp),) for p in reps] + [((p, -disp),) for p in reps]
+        _run_memo(geo, parameter_file, displacements, memo, nworkers)
+
+        for p in reps:
+
+            forces_f = _forces(memo[displacement_key(((p, disp),))])
+            forces_b = _forces(memo[displacement_key(((p, -disp),))])
+            row = -(forces_f - forces_b)/(2*disp)
+
+            for O in operators:
+                q = int(np.flatnonzero(O[:,p])[0])
+                hessian[q,:] = O[q,p]*(O @ row)
+
+        return (hessian + hessian.T)/2.
+
+    plan = hessian_plan(geo.nats, disp, ops=ops)
+
+    displacements = [d for _, _, ds, _ in plan for d in ds]
+    _run_memo(geo, parameter_file, displacements, memo, nworkers)
+
+    def energy(d):
+        return memo[displacement_key(d)]["total_delta"]
+
+    for p1, p2, ds, images in plan:
+
+        if not ds:
+            value = 0.
+        elif p1 == p2:
+            energy_f, energy_b, energy_0 = [energy(d) for d in ds]
+            value = (energy_f+energy_b-2*energy_0)/(disp**2)
+        else:
+            energy_pp, energy_pm, energy_mp, energy_mm = [energy(d) for d in ds]
+            value = (energy_pp-energy_pm-energy_mp+energy_mm)/(4*disp**2)
+
+        for q1, q2, sign in images:
+            hessian[q1,q2] = sign*value
+            hessian[q2,q1] = sign*value
 
     return hessian
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def hessian_plan(nats, disp, ops=None):
+
+    """
+
+    Plans the displaced geometries needed for the finite difference
+    Hessian of a unit cell, where p = 3*atom + component:
+
+    - diagonal entries (p, p): +disp and -disp along p, and the 
+    undisplaced geometry.
+    - off-diagonal entries (p1, p2): (+,+), (+,-), (-,+) and (-,-) 
+    displacements along p1 and p2.
+
+    Only entries in the upper triangle (p1 <= p2) are planned. If 
+    symmetry operations are given (see point_group()), entries related
+    by them are grouped together and only the first one is planned, 
+    while entries that symmetry forces to zero need no runs at all.
+
+    Parameters:
+    ----------
+
+    - nats (int): number of atoms in the unit cell.
+    - disp (float): displacement of each finite difference (in bohr).
+    - ops (list): symmetry operations, see point_group().
+
+    Return:
+    ----------
+        - a list with a (p1, p2, displacements, images) tuple per entry to
+        evaluate, where each displacement is a tuple of (p, delta) pairs and 
+        images is a list of (q1, q2, sign) tuples such that H[q1,q2] = sign*H[p1,p2].
+
+    """
+
+    ndim = 3*nats
+
+    # action of each operation on the coordinates: p -> (q, sign)
+    actions = [[] for p in range(ndim)]
+    for O in _operators(nats, ops):
+        for p in range(ndim):
+            q = int(np.flatnonzero(O[:,p])[0])
+            actions[p].append((q, float(O[q,p])))
+
+    done = np.zeros((ndim, ndim), dtype=bool)
+
+    plan = []
+    for p1 in range(ndim):
+        for p2 in range(p1, ndim):
+
+            if done[p1,p2]:
+                continue
+
+            images = {}
+            vanishes = False
+            for (q1, s1), (q2, s2) in zip(actions[p1], actions[p2]):
+                q1, q2 = min(q1, q2), max(q1, q2)
+                if images.get((q1, q2), s1*s2) != s1*s2:
+                    vanishes = True
+                images[(q1, q2)] = s1*s2
+                done[q1,q2] = True
+
+            if vanishes:
+                ds = []
+            elif p1 == p2:
+                ds = [((p1, disp),), ((p1, -disp),), ()]
+            else:
+                ds = [((p1, disp), (p2, disp)), ((p1, disp), (p2, -disp)),
+                    ((p1, -disp), (p2, disp)), ((p1, -disp), (p2, -disp))]
+
+            plan.append((p1, p2, ds, [(q1, q2, s) for (q1, q2), s in images.items()]))
+
+    return plan
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def displacement_key(displacement):
+
+    """ 
+    
+    Memo key of a displacement, a tuple of (p, delta) pairs: pairs
+    are sorted by coordinate and null deltas are dropped, so that 
+    identical displaced geometries share the same key.
+    
+    """
+
+    return tuple(sorted((int(p), float(delta)) for p, delta in displacement if delta != 0.))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def point_group(model, geo=None, tol=1e-4):
+
+    """
+
+    Finds the point group operations of the unit cell of a model, 
+    among the 48 signed permutations of the cartesian axes (the full
+    cubic group). An operation R belongs to the group if it maps the 
+    lattice onto itself and every atom of the reference structure 
+    ("ref_struct") onto an atom with the same mass, up to a lattice 
+    vector. If a geometry is given, operations must also leave its 
+    displacements and strains unchanged, so that the energy around 
+    that geometry keeps the symmetry.
+
+    Parameters:
+    ----------
+
+    - model (dict): model of the system (ie. STO_JPCM2013).
+    - geo (Geometry): geometry around which the symmetry is needed.
+    - tol (float): tolerance of the comparisons (in bohr / lattice units).
+
+    Return:
+    ----------
+        - a list of (R, perm) tuples, where R is the (3,3) matrix of the
+        operation and perm[a] is the atom that atom a is mapped onto.
+
+    """
+
+    nats = len(model["ref_struct"])
+    lat = np.array(model["lat_vectors"], dtype=np.float64)       # rows
+    positions = np.array([model["ref_struct"][a] for a in range(nats)], dtype=np.float64)
+    masses = np.array(model["masses"], dtype=np.float64)
+
+    frac = positions @ np.linalg.inv(lat)
+
+    if geo is not None:
+        disps = np.array(geo.displacements[0,0,0], dtype=np.float64)
+        s = geo.strains
+        strain = np.array([
+            [s[0], s[5]/2., s[4]/2.],
+            [s[5]/2., s[1], s[3]/2.],
+            [s[4]/2., s[3]/2., s[2]]
+        ])
+
+    ops = []
+    for axes in itertools.permutations(range(3)):
+        for signs in itertools.product([1., -1.], repeat=3):
+
+            R = np.zeros((3,3))
+            R[range(3), axes] = signs
+
+            # operation on fractional coordinates, must be integer
+            M = lat @ R.T @ np.linalg.inv(lat)
+            if not np.allclose(M, np.round(M), atol=tol):
+                continue
+
+            mapped = frac @ M
+            perm = []
+            for a in range(nats):
+                diff = mapped[a] - frac
+                match = np.all(np.abs(diff - np.round(diff)) < tol, axis=1)
+                match &= np.abs(masses - masses[a]) < tol
+                if not np.any(match):
+                    break
+                perm.append(int(np.argmax(match)))
+
+            if len(perm) != nats or len(set(perm)) != nats:
+                continue
+
+            if geo is not None:
+                if not np.allclose(disps @ R.T, disps[perm], atol=tol):
+                    continue
+                if not np.allclose(R @ strain @ R.T, strain, atol=tol):
+                    continue
+
+            ops.append((R, perm))
+
+    return ops
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def run_displaced(geo, parameter_file, displacements, nworkers=1):
+
+    """
+
+    Runs a single point SCALE-UP simulation for each of the given
+    displacements of a unit cell geometry. Runs are spread over a
+    pool of workers, each of them working within its own scratch 
+    directory (see cfg.SCRATCH_DIR), which is removed afterwards.
+
+    Parameters:
+    ----------
+
+    - geo (Geometry): reference geometry of the unit cell.
+    - parameter_file (string): model parameter file (.xml).
+    - displacements (list): displacements to run, each a tuple of 
+    (p, delta) pairs, which add delta to the displacement of atom p//3 
+    along component p%3 (see hessian_plan()).
+    - nworkers (int): number of single point runs at once.
+
+    Return:
+    ----------
+        - a list with the output of SPRun() for each displacement.
+
+    """
+
+    local = threading.local()
+    folders = []
+
+    geo.displacements # loads them now, if pending
+
+    def work(job):
+
+        i, steps = job
+
+        if not hasattr(local, "folder"):
+            local.folder = tempfile.mkdtemp(prefix="ezSCUP_", dir=cfg.SCRATCH_DIR)
+            folders.append(local.folder)
+
+        displaced = deepcopy(geo)
+        disps = displaced.displacements[0,0,0]
+        for p, delta in steps:
+            disps[p//3,p%3] = disps[p//3,p%3] + delta
+
+        return SPRun(parameter_file, displaced, name="SPDisplaced{:d}".format(i), 
+            folder=local.folder)
+
+    try:
+        with ThreadPoolExecutor(max_workers=nworkers) as executor:
+            results = list(executor.map(work, enumerate(displacements)))
+    finally:
+        for folder in folders:
+            shutil.rmtree(folder, ignore_errors=True)
+
+    return results
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _operators(nats, ops):
+
+    """ 
+    
+    Matrices of the given symmetry operations (see point_group()) on 
+    the (3*nats,) displacement vector of the unit cell, starting with 
+    the identity, each of them only once (point groups already contain
+    the identity). An operation maps the displacement of atom a, u_a, 
+    onto R u_a at atom perm[a].
+    
+    """
+
+    operators = [np.identity(3*nats)]
+    for R, perm in (ops or []):
+        O = np.zeros((3*nats, 3*nats))
+        for a in range(nats):
+            O[3*perm[a]:3*perm[a]+3, 3*a:3*a+3] = R
+        if not any(np.array_equal(O, P) for P in operators):
+            operators.append(O)
+
+    return operators
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _coordinate_representatives(operators):
+
+    """ First coordinate of each set of coordinates related by the operators. """
+
+    ndim = operators[0].shape[0]
+    done = np.zeros(ndim, dtype=bool)
+
+    reps = []
+    for p in range(ndim):
+        if done[p]:
+            continue
+        reps.append(p)
+        for O in operators:
+            done[np.flatnonzero(O[:,p])] = True
+
+    return reps
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _run_memo(geo, parameter_file, displacements, memo, nworkers):
+
+    """ Runs the displacements that are not in the memo yet, adding them to it. """
+
+    # ordered and without repetitions, in linear time
+    keys = list(dict.fromkeys(
+        key for key in map(displacement_key, displacements) if key not in memo))
+
+    results = run_displaced(geo, parameter_file, keys, nworkers=nworkers)
+    memo.update(zip(keys, results))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _forces(output):
+
+    """ Flat (3*nats,) forces of a single point output, see SPRun(). """
+
+    if "forces" not in output:
+        raise ezSCUP.exceptions.MissingForces(
+            "no forces found in the single point output, see cfg.SP_FORCES_SEARCH_WORD")
+
+    return np.ravel(output["forces"])
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def supercell_force_constants(geo, parameter_file, supercell=(2, 2, 2), disp=0.001, nworkers=1, cache=None):
+
+    """
+
+    Calculates the force constants of a unit cell geometry repeated
+    over a supercell, through central differences of the forces when 
+    displacing the atoms of the first cell only (translational symmetry
+    gives the rest), so just 2*(3*nats) single point runs:
+
+        fc[R,a,i,b,j] = -(F_Rbj(+ai) - F_Rbj(-ai)) / (2 disp)
+
+    the coupling between atom a of cell (0,0,0) along i and atom b of 
+    cell R along j. Force constants are symmetrized afterwards, so that 
+    fc[R,a,i,b,j] = fc[-R,b,j,a,i]. The supercell must be larger than
+    the interaction range to resolve the q-points of interest, ie. 2x2x2 
+    resolves the X, M and R points of a cubic perovskite exactly.
+
+    Parameters:
+    ----------
+
+    - geo (Geometry): reference geometry, only its first cell is used.
+    - parameter_file (string): model parameter file (.xml).
+    - supercell (tuple): supercell shape (ie. (2, 2, 2)).
+    - disp (float): displacement of each finite difference (in bohr).
+    - nworkers (int): number of single point runs at once (see run_displaced()).
+    - cache (dict): memo of SPRun() outputs, see finite_hessian(). Only 
+    valid for the same geometry, supercell and parameter file.
+
+    Return:
+    ----------
+        - a (sx, sy, sz, nats, 3, nats, 3) array with the force 
+        constants, in eV/bohr2.
+
+    raises: ezSCUP.exceptions.MissingForces if the forces are not 
+    found in the single point output.
+
+    """
+
+    sc = tuple(int(n) for n in supercell)
+    nats = geo.nats
+
+    sgeo = Geometry(sc, geo.species, nats, dtype=geo.dtype)
+    sgeo.strains = np.array(geo.strains)
+    sgeo.displacements = np.tile(geo.displacements[0,0,0], sc + (1,1))
+
+    memo = {} if cache is None else cache
+
+    displacements = [((p, disp),) for p in range(3*nats)] + [((p, -disp),) for p in range(3*nats)]
+    _run_memo(sgeo, parameter_file, displacements, memo, nworkers)
+
+    fc = np.zeros(sc + (nats, 3, nats, 3))
+    for p in range(3*nats):
+
+        forces_f = _forces(memo[displacement_key(((p, disp),))]).reshape(sc + (nats, 3))
+        forces_b = _forces(memo[displacement_key(((p, -disp),))]).reshape(sc + (nats, 3))
+
+        fc[:,:,:,p//3,p%3,:,:] = -(forces_f - forces_b)/(2*disp)
+
+    # fc at -R (mod supercell) with the atom pairs swapped
+    transposed = np.roll(np.flip(fc, axis=(0,1,2)), 1, axis=(0,1,2))
+    transposed = np.transpose(transposed, (0,1,2,5,6,3,4))
+
+    return (fc + transposed)/2.
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def dynamical_matrices(fc, masses, qpoints, lat_vectors=None, positions=None, tol=1e-5):
+
+    """
+
+    Fourier-interpolates the mass-weighted dynamical matrices of a set 
+    of supercell force constants at arbitrary q-points,
+
+        D(q)[ai,bj] = sum_R fc[R,a,i,b,j] exp(2pi i q.R) / sqrt(m_a m_b)
+
+    where each coupling is assigned to the periodic image of R within 
+    the supercell that is closest to it (minimum image convention, 
+    with the distance between atoms a and b), and split evenly among 
+    images at the same distance, ie. at the supercell boundary. Exact 
+    at the q-points commensurate with the supercell.
+
+    Parameters:
+    ----------
+
+    - fc (array): force constants, see supercell_force_constants().
+    - masses (list): mass of each atom in the unit cell.
+    - qpoints (array): (nq, 3) q-points, in reduced units of the unit 
+    cell reciprocal lattice (ie. [0.5,0.5,0.5] for the R point).
+    - lat_vectors (array): (3,3) unit cell lattice vectors, as rows. 
+    Defaults to a cubic lattice.
+    - positions (array): (nats, 3) positions of the atoms in the unit 
+    cell (ie. the "ref_struct" of a model), in the units of the lattice
+    vectors. Defaults to every atom at the origin.
+    - tol (float): tolerance when comparing image distances.
+
+    Return:
+    ----------
+        - a (nq, 3*nats, 3*nats) array with the hermitian dynamical 
+        matrix of each q-point, in eV/(bohr2 amu).
+
+    """
+
+    fc = np.asarray(fc, dtype=np.float64)
+    sc = np.array(fc.shape[:3])
+    nats = fc.shape[3]
+    ncells = int(np.prod(sc))
+
+    lat = np.identity(3) if lat_vectors is None else np.array(lat_vectors, dtype=np.float64)
+    if positions is None:
+        frac = np.zeros((nats, 3))
+    else:
+        frac = np.array(positions, dtype=np.float64) @ np.linalg.inv(lat)
+
+    # periodic images of every cell vector of the supercell
+    cells = np.indices(sc).reshape(3, -1).T                         # (ncells, 3)
+    shifts = np.indices((3,3,3)).reshape(3, -1).T - 1               # (27, 3)
+    images = cells[:,None,:] + shifts[None,:,:]*sc                  # (ncells, 27, 3)
+
+    # distance between atom a in the origin and atom b in each image
+    vectors = images[:,:,None,None,:] + frac[None,None,None,:,:] - frac[None,None,:,None,:]
+    dists = np.linalg.norm(vectors @ lat, axis=-1)                  # (ncells, 27, nats, nats)
+
+    nearest = dists <= dists.min(axis=1, keepdims=True) + tol
+    weights = nearest/np.sum(nearest, axis=1, keepdims=True)
+
+    qpoints = np.atleast_2d(np.asarray(qpoints, dtype=np.float64))
+    phases = np.exp(2j*np.pi*np.einsum("qk,rnk->qrn", qpoints, images))
+
+    fc = fc.reshape((ncells, nats, 3, nats, 3))
+    dyn = np.einsum("qrn,rnab,raibj->qaibj", phases, weights, fc)
+    dyn = dyn.reshape((len(qpoints), 3*nats, 3*nats))
+
+    weight = 1./np.sqrt(np.repeat(np.asarray(masses, dtype=np.float64), 3))
+    dyn = dyn*weight[:,None]*weight[None,:]
+
+    return (dyn + np.conj(np.swapaxes(dyn, -1, -2)))/2.
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def phonons(fc, masses, qpoints, lat_vectors=None, positions=None):
+
+    """
+
+    Phonon eigenpairs of a set of supercell force constants at 
+    arbitrary q-points, see dynamical_matrices() and q_path().
+
+    Parameters:
+    ----------
+
+    - fc (array): force constants, see supercell_force_constants().
+    - masses (list): mass of each atom in the unit cell.
+    - qpoints (array): (nq, 3) q-points, in reduced units.
+    - lat_vectors (array): (3,3) unit cell lattice vectors, as rows. 
+    - positions (array): (nats, 3) positions of the atoms in the unit cell.
+
+    Return:
+    ----------
+        - a (nq, 3*nats) array with the eigenvalues (squared frequencies,
+        negative for unstable modes) of each q-point, in ascending order.
+        - a (nq, 3*nats, 3*nats) array with the mass-weighted eigenvectors,
+        as columns.
+
+    """
+
+    dyn = dynamical_matrices(fc, masses, qpoints, lat_vectors=lat_vectors, positions=positions)
+
+    return np.linalg.eigh(dyn)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def q_path(path, npoints=50):
+
+    """
+
+    Evenly spaced q-points along a path through reciprocal space,
+    ie. ["G", "X", "M", "G", "R", "X"] for a cubic perovskite.
+
+    Parameters:
+    ----------
+
+    - path (list): corners of the path, either labels of the cubic 
+    high-symmetry points (see CUBIC_POINTS) or reduced q-points.
+    - npoints (int): number of q-points in each segment.
+
+    Return:
+    ----------
+        - a (nq, 3) array with the q-points, in reduced units.
+        - a (nq,) array with the distance along the path of each q-point.
+        - a (len(path),) array with the distance of each corner.
+
+    """
+
+    corners = np.array([CUBIC_POINTS[c] if isinstance(c, str) else c for c in path], dtype=np.float64)
+
+    qpoints = [corners[:1]]
+    for start, end in zip(corners[:-1], corners[1:]):
+        steps = np.linspace(0., 1., npoints + 1)[1:,None]
+        qpoints.append(start + steps*(end - start))
+    qpoints = np.concatenate(qpoints)
+
+    lengths = np.linalg.norm(np.diff(qpoints, axis=0), axis=1)
+    distance = np.concatenate([[0.], np.cumsum(lengths)])
+
+    return qpoints, distance, distance[::npoints]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
 def get_normal_modes(masses, hessian):
 
-    M = []
-    for m in masses:
-        for _ in range(3):    
-            M.append(m)
-    M = np.diagflat(M)
-    Mi = np.linalg.inv(M)
+    """
+
+    Normal modes of a Hessian, through the eigenpairs of its symmetric
+    mass-weighted form M^(-1/2) H M^(-1/2), which has the same eigenvalues
+    as M^(-1) H. A stack of Hessians (..., 3*nats, 3*nats) is 
+    diagonalized at once.
+
+    Parameters:
+    ----------
+
+    - masses (list): mass of each atom.
+    - hessian (array): (..., 3*nats, 3*nats) Hessian.
+
+    Return:
+    ----------
+        - the eigenvalues (squared frequencies), in ascending order.
+        - the orthonormal mass-weighted eigenvectors, as columns. Divide 
+        them by the square root of the masses to get atomic displacements.
 
-    normHessian = np.matmul(Mi, hessian)
-    w, v = np.linalg.eigh(normHessian)
+    """
 
-    return w, v
+    weight = 1./np.sqrt(np.repeat(np.asarray(masses, dtype=np.float64), 3))
+    hessian = np.asarray(hessian)*weight[:,None]*weight[None,:]
 
+    return np.linalg.eigh(hessian)
 
@@ -5,6 +5,10 @@ Several functions to calculate supercell polarization.
 # third party imports
 import numpy as np
 
+# standard library imports
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 # package imports
 from ezSCUP.geometry import Geometry
 
@@ -16,9 +20,12 @@ import ezSCUP.exceptions
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 #
 # + func unit_conversion(scup_polarization)
+# + func born_tensors(born_charges)
 # + func polarization(config, born_charges)
-# + func stepped_polarization(config, born_charges)
-# + func layered_polarization(config, born_charges)
+# + func stepped_polarization(supercell, species, nats, lat_cts, partials, born_charges)
+# + func block_polarization(geom, born_charges, block)
+# + func layered_polarization(geom, born_charges, axis)
+# + func column_polarization(geom, born_charges, axis)
 #
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
@@ -44,17 +51,55 @@ def unit_conversion(scup_polarization):
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
+def born_tensors(born_charges):
+
+    """
+
+    Stacks the given Born effective charges as 3x3 tensors, so that
+    the dipole of an atom with displacement u is sum_j Z[i,j]*u[j].
+    Charges given as 3D vectors are taken as the diagonal of the tensor.
+
+    Parameters:
+    ----------
+    - born_charges (dict): dictionary with element labels as keys
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
+
+    Return:
+    ----------
+    - a list with the atomic labels.
+    - a (nlabels, 3, 3) array with the Born charge tensor of each label.
+
+    """
+
+    labels = list(born_charges.keys())
+
+    tensors = np.zeros((len(labels), 3, 3))
+    for n, l in enumerate(labels):
+        charges = np.array(born_charges[l], dtype=np.float64)
+        if charges.shape == (3,):
+            tensors[n] = np.diag(charges)
+        elif charges.shape == (3,3):
+            tensors[n] = charges
+        else:
+            raise ezSCUP.exceptions.InvalidLabelList
+
+    return labels, tensors
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
 def polarization(geom, born_charges):
 
     """
 
     Calculates supercell polarization in the current configuration
-    using the given effective charge vector.
+    using the given Born effective charges.
 
     Parameters:
     ----------
     - born_charges (dict): dictionary with element labels as keys
-    and effective charge 3D vectors as values. (in elemental charge units)
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
 
     Return:
     ----------
@@ -65,7 +110,7 @@ def polarization(geom, born_charges):
     if not isinstance(geom, Geometry):
         raise ezSCUP.exceptions.InvalidGeometryObject
 
-    labels = list(born_charges.keys())
+    labels, tensors = born_tensors(born_charges)
 
     if len(labels) != 5:
         raise ezSCUP.exceptions.InvalidLabelList
@@ -81,18 +126,9 @@ def polarization(geom, born_charges):
     ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
     volume = geom.ncells*ucell_volume
 
-    pol = np.zeros(3)
-    for x in range(geom.supercell[0]):
-        for y in range(geom.supercell[1]):
-            for z in range(geom.supercell[2]):
-
-                for l in labels:
-
-                    tau = geom.displacements[x,y,z,l,:]
-                    charges = born_charges[l]
-                    
-                    for i in range(3):
-                        pol[i] += charges[i]*tau[i]
+    # accumulate in double precision, even for float32 geometries
+    taus = geom.displacements[:,:,:,labels,:].astype(np.float64)
+    pol = np.einsum("xyzlj,lij->i", taus, tensors)
 
     pol = pol/volume # in e/bohr2
 
@@ -100,173 +136,220 @@ def polarization(geom, born_charges):
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def stepped_polarization(supercell, species, nats, lat_cts, partials, born_charges):
+def stepped_polarization(supercell, species, nats, lat_cts, partials, born_charges, 
+    nthreads=1, chunk_size=64, nprocs=1):
 
     """
 
     Calculates supercell polarization in the current configuration
     for every single .partial file using the given Born effective charges.
 
+    The partials can be given either as a list of .restart files, which
+    are streamed one at a time (see Geometry.load_equilibrium_displacements),
+    or as an already loaded Trajectory (see ezSCUP.trajectory), which is
+    processed chunk_size snapshots at a time.
+
+    With more than one process, the list of .restart files is split into 
+    chunks (a few per process), which are parsed in parallel by a process
+    pool. The polarization history is returned in the original order.
+
     Parameters:
     ----------
+    - supercell (array): supercell shape (ie. [4,4,4])
+    - species (list): atomic species within the supercell in order
+    - nats (int): number of atoms per unit cell (ie. 5)
+    - lat_cts (array): xx, yy, zz lattice constants, in Bohrs
+    - partials (list or Trajectory): snapshots to calculate the polarization of.
     - born_charges (dict): dictionary with element labels as keys
-    and effective charge 3D vectors as values. (in elemental charge units)
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
+    - nthreads (int): number of threads used to read .restart files.
+    - chunk_size (int): number of Trajectory snapshots processed at once.
+    - nprocs (int): number of processes used to read .restart files.
 
     Return:
     ----------
-    - a list of 3D vectors with the macroscopic polarization (in C/m2)
+    - a (nsteps, 3) array with the macroscopic polarization 
+    of each snapshot (in C/m2)
 
     """
 
-    labels = list(born_charges.keys())
+    labels, tensors = born_tensors(born_charges)
 
     for l in labels:
         if l >= nats:
             raise ezSCUP.exceptions.AtomicIndexOutOfBounds
     
+    if nprocs > 1 and not hasattr(partials, "displacements"):
+        return _parallel_stepped_polarization(supercell, species, nats, lat_cts, 
+            list(partials), born_charges, nprocs)
+
     cnts = lat_cts
-    geom = Geometry(supercell, species, nats)
+    ncells = int(np.prod(supercell))
+
+    if hasattr(partials, "displacements"):
+        # trajectory stack, in chunks of snapshots
+        stack = partials
+        chunks = ((stack.strains[i:i+chunk_size], stack.displacements[i:i+chunk_size]) 
+            for i in range(0, len(stack), chunk_size))
+    else:
+        # .restart files, streamed one by one
+        geom = Geometry(supercell, species, nats)
+        chunks = ((strains[None,:], disps[None]) 
+            for strains, disps in geom._iter_partials(partials, nthreads))
+
+    pol_hist = [np.zeros((0,3))]
+    for stra, disps in chunks:
+
+        stra = np.asarray(stra, dtype=np.float64)
+        ucell_volume = (cnts[0]*(1+stra[:,0]))*(cnts[1]*(1+stra[:,1]))*(cnts[2]*(1+stra[:,2]))
+        volume = ncells*ucell_volume
+
+        taus = disps[:,:,:,:,labels,:].astype(np.float64)
+        pol = np.einsum("sxyzlj,lij->si", taus, tensors)
+
+        pol = pol/volume[:,None] # in e/bohr2
+        pol_hist.append(unit_conversion(pol)) # in C/m2
+  
+    return np.concatenate(pol_hist)
 
-    pol_hist = []
-    for f in partials:
-        
-        geom.load_restart(f)
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-        stra = geom.strains
+def _parallel_stepped_polarization(supercell, species, nats, lat_cts, partials, born_charges, nprocs):
 
-        ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
-        volume = geom.ncells*ucell_volume
+    """ Process pool version of stepped_polarization(), for .restart files. """
 
-        pol = np.zeros(3)
-        for x in range(geom.supercell[0]):
-            for y in range(geom.supercell[1]):
-                for z in range(geom.supercell[2]):
+    # a few chunks per process, to balance the load
+    nchunks = max(1, min(len(partials), 4*nprocs))
+    bounds = np.linspace(0, len(partials), nchunks + 1).astype(int)
+    chunks = [partials[bounds[i]:bounds[i+1]] for i in range(nchunks)]
 
-                    for l in labels:
-                        tau = geom.displacements[x,y,z,l,:]
-                        charges = born_charges[l]
-                        
-                        for i in range(3):
-                            pol[i] += charges[i]*tau[i]
+    worker = partial(stepped_polarization, supercell, species, nats, lat_cts, 
+        born_charges=born_charges)
 
-        pol = pol/volume # in e/bohr2
-        pol_hist.append(unit_conversion(pol)) # in C/m2
-  
-    return pol_hist
+    pol_hist = [np.zeros((0,3))]
+    with ProcessPoolExecutor(max_workers=nprocs) as pool:
+        pol_hist.extend(pool.map(worker, chunks))
+
+    return np.concatenate(pol_hist)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
-'''
-def layered_polarization(config, born_charges):
+
+def block_polarization(geom, born_charges, block):
 
     """
 
-    Calculates supercell polarization in the current configuration
-    in horizontal (z-axis) layers using the given effective charges.
+    Calculates the polarization of each axis-aligned block of unit cells
+    of the current configuration, using the given Born effective charges.
+    The supercell is split into blocks of the given shape, which must 
+    divide it evenly along every direction.
+
+    For example, block = [1,1,1] gives the polarization of each unit
+    cell, block = [sx,sy,1] the one of each layer normal to z and
+    block = [1,1,sz] the one of each column along z.
 
     Parameters:
     ----------
     - born_charges (dict): dictionary with element labels as keys
-    and effective charge 3D vectors as values. (in elemental charge units)
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
+    - block (array): shape of the blocks, in unit cells (ie. [2,2,2])
 
     Return:
     ----------
-    - a list of 3D vectors with the macroscopic polarization (in C/m2)
+    - a (sx/bx, sy/by, sz/bz, 3) array with the polarization 
+    of each block (in C/m2)
+
+    raises: ValueError if the blocks do not tile the supercell.
     
     """
 
-    if not isinstance(config, MCConfiguration):
-        raise ezSCUP.exceptions.InvalidMCConfiguration
+    if not isinstance(geom, Geometry):
+        raise ezSCUP.exceptions.InvalidGeometryObject
 
-    labels = list(born_charges.keys())
+    labels, tensors = born_tensors(born_charges)
 
     for l in labels:
-        if l not in config.geo.elements:
-            raise ezSCUP.exceptions.InvalidLabel
-
-    
-    cnts = config.geo.lat_constants
-    stra = config.geo.strains
-    ncells_per_layer = config.geo.supercell[0]*config.geo.supercell[1]
+        if l >= geom.nats:
+            raise ezSCUP.exceptions.AtomicIndexOutOfBounds
 
-    ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
-    volume = ucell_volume*ncells_per_layer
+    sc = geom.supercell
+    block = np.array(block, dtype=int)
+    if block.shape != (3,) or np.any(block < 1) or np.any(sc % block != 0):
+        raise ValueError(f"block {block.tolist()} does not tile the supercell {np.asarray(sc).tolist()}")
 
-    pols_by_layer = []
-    for layer in range(config.geo.supercell[2]):
+    cnts = geom.lat_constants
+    stra = geom.strains
 
-        pol = np.zeros(3)
-        for x in range(config.geo.supercell[0]):
-            for y in range(config.geo.supercell[1]):
+    ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
+    volume = ucell_volume*np.prod(block)
 
-                for label in config.geo.elements:
+    # dipole of each unit cell, in double precision
+    taus = geom.displacements[:,:,:,labels,:].astype(np.float64)
+    dipoles = np.einsum("xyzlj,lij->xyzi", taus, tensors)
 
-                    tau = config.geo.cells[x,y,layer].displacements[label]
-                    charges = born_charges[label]
-                    
-                    for i in range(3):
-                        pol[i] += charges[i]*tau[i]
+    # add up the cells of each block
+    nblocks = sc//block
+    dipoles = dipoles.reshape(nblocks[0], block[0], nblocks[1], block[1], nblocks[2], block[2], 3)
+    pols = dipoles.sum(axis=(1,3,5))
 
-        pol = pol/volume # in e/bohr2
-        pols_by_layer.append(unit_conversion(pol))
+    pols = pols/volume # in e/bohr2
 
-    return pols_by_layer
+    return unit_conversion(pols) # in C/m2
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def column_polarization(config, born_charges):
+def layered_polarization(geom, born_charges, axis=2):
 
     """
 
     Calculates supercell polarization in the current configuration
-    in vertical (z-axis) columns using the given effective charges.
+    in layers normal to the given axis (horizontal layers by default),
+    using the given Born effective charges. See block_polarization().
 
     Parameters:
     ----------
     - born_charges (dict): dictionary with element labels as keys
-    and effective charge 3D vectors as values. (in elemental charge units)
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
+    - axis (int): axis normal to the layers (0, 1 or 2 for x, y or z).
 
     Return:
     ----------
-    - a 2D numpy array of 3D vectors with the macroscopic polarization (in C/m2)
+    - a (nlayers, 3) array with the polarization of each layer (in C/m2)
     
     """
 
-    if not isinstance(config, MCConfiguration):
-        raise ezSCUP.exceptions.InvalidMCConfiguration
-
-    labels = list(born_charges.keys())
-
-    for l in labels:
-        if l not in config.geo.elements:
-            raise ezSCUP.exceptions.InvalidLabel
-
-    
-    cnts = config.geo.lat_constants
-    stra = config.geo.strains
-    ncells_per_column = config.geo.supercell[2]
+    block = np.array(geom.supercell)
+    block[axis] = 1
 
-    ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
-    volume = ucell_volume*ncells_per_column
+    return block_polarization(geom, born_charges, block).reshape(-1, 3)
 
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    pols_by_column = np.zeros((config.geo.supercell[0], config.geo.supercell[1]))
-    for x in range(config.geo.supercell[0]):
-            for y in range(config.geo.supercell[1]):
+def column_polarization(geom, born_charges, axis=2):
 
-                pol = np.zeros(3)
-                for z in range(config.geo.supercell[2]):
+    """
 
-                    for label in config.geo.elements:
+    Calculates supercell polarization in the current configuration
+    in columns along the given axis (vertical columns by default),
+    using the given Born effective charges. See block_polarization().
 
-                        tau = config.geo.cells[x,y,z].displacements[label]
-                        charges = born_charges[label]
-                        
-                        for i in range(3):
-                            pol[i] += charges[i]*tau[i]
+    Parameters:
+    ----------
+    - born_charges (dict): dictionary with element labels as keys
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
+    - axis (int): axis along the columns (0, 1 or 2 for x, y or z).
 
+    Return:
+    ----------
+    - a 2D array of 3D vectors with the polarization of each column (in C/m2),
+    ie. (sx, sy, 3) for columns along z.
+    
+    """
 
-                pol = pol/volume # in e/bohr2
-                pols_by_column[x,y] = unit_conversion(pol)
+    block = np.ones(3, dtype=int)
+    block[axis] = geom.supercell[axis]
 
-    return pols_by_column
-'''
\ No newline at end of file
+    return np.squeeze(block_polarization(geom, born_charges, block), axis=axis)
@@ -7,6 +7,7 @@ import numpy as np
 
 # standard library imports
 from copy import deepcopy   # proper array copy
+from functools import lru_cache
 from pathlib import Path
 import os, sys
 
@@ -20,12 +21,97 @@ import ezSCUP.exceptions
 # MODULE STRUCTURE
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 #
-# + func measure(geom, pattern)
+# + func compile_pattern(pattern)
+# + func neighbour_table(supercell, hop)
+# + func measure(geom, pattern, method)
+# + func measure_many(geom, patterns, method)
+# + func measure_stack(stack, patterns, method, chunk_size)
+# + func neighbour_correlation(field)
 #
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
+# numpy type of each entry of a compiled pattern table
+PATTERN_DTYPE = np.dtype([
+    ("label", np.int64), 
+    ("hop", np.int64, (3,)), 
+    ("weight", np.float64), 
+    ("target", np.float64, (3,))
+])
 
-def measure(geom, pattern):
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def compile_pattern(pattern):
+
+    """
+
+    Compiles a pattern (see measure()) into a compact table, so that 
+    it can be projected with whole-array operations. Compiling once 
+    and reusing the table saves some time when the same pattern is 
+    measured on many geometries.
+
+    # TABLE FORMAT # 
+
+    A numpy structured array with one entry per atom in the pattern,
+    and the following fields:
+
+    - label (int): label of the atomic species.
+    - hop (3 ints): cell hopping.
+    - weight (float): weight of the motion.
+    - target (3 floats): target vector.
+
+    Parameters:
+    ----------
+
+    - pattern (list): Pattern to be compiled.
+
+    Return:
+    ----------
+        - the compiled pattern table.
+
+    """
+
+    table = np.zeros(len(pattern), dtype=PATTERN_DTYPE)
+
+    for i, atom in enumerate(pattern):
+        table[i] = (atom[0], atom[1], atom[2], atom[3])
+
+    return table
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+@lru_cache(maxsize=256)
+def neighbour_table(supercell, hop):
+
+    """
+
+    Neighbour index table of a supercell for a given cell hopping: 
+    entry n is the flat index of the cell (x,y,z) + hopping, with 
+    periodic boundary conditions, where (x,y,z) is the cell with
+    flat index n (in C order). Tables are built once for each 
+    supercell shape and hopping, and shared afterwards.
+
+    Parameters:
+    ----------
+
+    - supercell (tuple): supercell shape (ie. (4,4,4))
+    - hop (tuple): cell hopping (ie. (1,0,0))
+
+    Return:
+    ----------
+        - a read-only (ncells,) array of flat cell indices.
+
+    """
+
+    cells = np.indices(supercell).reshape(3, -1)
+    shifted = np.mod(cells + np.array(hop)[:,None], np.array(supercell)[:,None])
+    table = np.ravel_multi_index(tuple(shifted), supercell)
+    table.setflags(write=False)
+
+    return table
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def measure(geom, pattern, method="auto"):
 
     """
     Projects structural modes (patterns) on a given configuration's
@@ -54,29 +140,305 @@ def measure(geom, pattern):
 
     a = sum_over_all_displacements(weigth*dot_product(position, target vector))
 
+    The amplitudes are always accumulated in double precision, 
+    also for geometries stored as float32 (see Geometry).
+
+    # ALGORITHM #
+
+    Two equivalent methods are available:
+
+    - "roll": the projection of every atom in the pattern is computed 
+    for the whole supercell at once, and then rolled by its cell hopping, 
+    so that the amplitude of cell (x,y,z) gets the projection of cell 
+    (x,y,z) + hopping. The roll is a single gather through a precomputed 
+    neighbour table (see neighbour_table()). Terms are added in the same 
+    order and with the same operations as a cell-by-cell loop.
+
+    - "fft": a pattern is a periodic convolution of the displacements
+    with a small stencil, so it is computed as a product in reciprocal
+    space, where a hopping h is just a phase exp(2*pi*i*q*h). Results
+    match the "roll" method up to round-off (~1e-15 relative).
+
+    By default ("auto"), the FFT is used for supercells with more than 
+    ezSCUP.settings.FFT_PROJECTION_THRESHOLD cells (never, if None). 
+    The cost of both methods grows linearly with the number of atoms 
+    in the pattern, so the FFT only pays off for long-ranged patterns.
+
     Parameters:
     ----------
 
-    - pattern (list): Pattern to be projected.
+    - geom (Geometry): geometry to project the pattern on.
+    - pattern (list or array): Pattern to be projected, 
+    either as a list or compiled with compile_pattern().
+    - method (string): "roll", "fft" or "auto".
 
     Return:
     ----------
         - an array the shape of the supercell with the amplitude 
         of the pattern in each unit cell.
 
+    raises: ValueError if the method is unknown.
+
+    """
+
+    return measure_many(geom, [pattern], method=method)[0]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def measure_many(geom, patterns, method="auto"):
+
+    """
+    Projects several structural modes (patterns) on a given geometry
+    in a single pass, see measure().
+
+    The displacements of each distinct atom are gathered from the 
+    supercell (or Fourier transformed) only once, and their projection
+    on each distinct target vector is computed only once too, and then 
+    reused by every pattern containing it, with any hopping. Each 
+    amplitude is computed exactly as in measure().
+
+    Parameters:
+    ----------
+
+    - geom (Geometry): geometry to project the patterns on.
+    - patterns (list): Patterns to be projected, either as lists
+    or compiled with compile_pattern().
+    - method (string): "roll", "fft" or "auto", see measure().
+
+    Return:
+    ----------
+        - a (npatterns, sx, sy, sz) array with the amplitude 
+        of each pattern in each unit cell.
+
     """
 
     if not isinstance(geom, Geometry):
         raise ezSCUP.exceptions.InvalidMCConfiguration()
 
-    values = np.zeros(geom.supercell)
+    patterns = [p if isinstance(p, np.ndarray) else compile_pattern(p) for p in patterns]
+    method = _select_method(method, geom.ncells)
+
+    return _project(geom.displacements, patterns, method)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def measure_stack(stack, patterns, method="auto", chunk_size=64):
+
+    """
+    Projects several structural modes (patterns) on every snapshot of 
+    a trajectory, see measure() and measure_many().
+
+    Snapshots are projected in chunks, all the snapshots of a chunk at
+    once, so that only one chunk of displacements (as float64) is in 
+    memory at any time, besides the result. Memory-mapped stacks, like
+    those in ezSCUP.trajectory, are read one chunk at a time too.
+
+    Parameters:
+    ----------
+
+    - stack: displacements of every snapshot, either a Trajectory, a 
+    (nsteps, sx, sy, sz, nats, 3) array or an iterable yielding chunks
+    of such an array, in order (ie. (n, sx, sy, sz, nats, 3) arrays).
+    - patterns (list): Patterns to be projected, either as lists
+    or compiled with compile_pattern().
+    - method (string): "roll", "fft" or "auto", see measure().
+    - chunk_size (int): number of snapshots per chunk, for array
+    and Trajectory stacks.
+
+    Return:
+    ----------
+        - a (npatterns, nsteps, sx, sy, sz) array with the amplitude 
+        of each pattern in each unit cell of each snapshot.
+
+    raises: ezSCUP.exceptions.NotEnoughPartials if an iterable
+    stack yields no chunks, and ValueError if the method is unknown.
+
+    """
+
+    patterns = [p if isinstance(p, np.ndarray) else compile_pattern(p) for p in patterns]
+
+    if hasattr(stack, "displacements"):
+        stack = stack.displacements
+
+    if isinstance(stack, np.ndarray):
+        if stack.ndim != 6:
+            raise ezSCUP.exceptions.GeometryNotMatching()
+        if stack.shape[0] == 0:
+            return np.zeros((len(patterns),) + stack.shape[:4])
+        chunks = (stack[i:i+chunk_size] for i in range(0, stack.shape[0], chunk_size))
+    else:
+        chunks = stack
+
+    values = []
+    for chunk in chunks:
+        ncells = int(np.prod(chunk.shape[1:4]))
+        values.append(_project(chunk, patterns, _select_method(method, ncells)))
+
+    if not values:
+        raise ezSCUP.exceptions.NotEnoughPartials()
+
+    return np.concatenate(values, axis=1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def neighbour_correlation(field):
+
+    """
+
+    Local correlation of a vector-valued mode map (ie. the output of
+    STO_ROT) with its nearest neighbours. The vector of each cell is
+    normalized, and then dotted with the normalized vectors of the 
+    cells right before and after it along each direction:
+
+        C_i(R) = ( d(R).d(R + e_i) + d(R).d(R - e_i) ) / 2
+
+    with periodic boundary conditions, so that C_i is 1 for vectors 
+    that are in phase with both neighbours along i, and -1 for vectors
+    that alternate their sign (ie. anti-phase AFD rotations) along i.
+
+    Parameters:
+    ----------
+
+    - field (array): (..., sx, sy, sz, n) array with the vector of
+    each cell. Leading dimensions (ie. snapshots) are vectorized.
+
+    Return:
+    ----------
+        - a (..., sx, sy, sz, 3) array with the correlation along
+        the x, y and z directions of each cell.
+
+    raises: ezSCUP.exceptions.GeometryNotMatching if the field does 
+    not have a supercell and a vector dimension.
+
+    """
+
+    field = np.asarray(field)
+
+    if field.ndim < 4:
+        raise ezSCUP.exceptions.GeometryNotMatching()
+
+    dirs = field/np.sqrt(_rowdot(field, field))[...,None]
+
+    corr = []
+    for axis in (-4, -3, -2):
+        up = np.roll(dirs, -1, axis=axis)
+        down = np.roll(dirs, 1, axis=axis)
+        corr.append((_rowdot(dirs, up) + _rowdot(dirs, down))/2.)
+
+    return np.stack(corr, axis=-1)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _rowdot(a, b):
+
+    """ 
+    
+    Dot product of the vectors along the last axis of two arrays, 
+    as a stacked matrix product, so that each entry is computed just
+    like np.dot() of the two vectors.
+    
+    """
+
+    return (a[...,None,:] @ b[...,:,None])[...,0,0]
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _select_method(method, ncells):
+
+    """ Projection method to use for a given supercell size, see measure(). """
+
+    if method == "auto":
+        threshold = cfg.FFT_PROJECTION_THRESHOLD
+        method = "fft" if threshold is not None and ncells > threshold else "roll"
+
+    if method != "roll" and method != "fft":
+        raise ValueError(f"unknown projection method {method!r}; expected 'auto', 'roll' or 'fft'")
+
+    return method
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _project(displacements, patterns, method):
+
+    """ 
+    
+    Projects compiled patterns on a (..., sx, sy, sz, nats, 3) 
+    displacement array, returning (npatterns, ..., sx, sy, sz) 
+    amplitudes. Leading dimensions (ie. snapshots) are vectorized.
+
+    """
+
+    if method == "fft":
+        return _project_fft(displacements, patterns)
+    else:
+        return _project_roll(displacements, patterns)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _project_roll(displacements, patterns):
+
+    """ Real space projection of compiled patterns, see measure(). """
+
+    shape = displacements.shape[:-2]
+    sc = tuple(int(n) for n in shape[-3:])
+    values = np.zeros((len(patterns),) + shape[:-3] + (int(np.prod(sc)),))
+
+    disps = {}          # displacements of each atom
+    projs = {}          # projections of each atom on each target, flattened
+    for i, pattern in enumerate(patterns):
+        for atom in pattern:
+
+            label = int(atom["label"])
+            if label not in disps:
+                disps[label] = displacements[...,label,:].astype(np.float64)
+
+            # (1,3) @ (3,1) products round exactly as np.dot(target, u)
+            key = (label,) + tuple(atom["target"])
+            if key not in projs:
+                proj = (atom["target"][None,:] @ disps[label][...,:,None])[...,0,0]
+                projs[key] = proj.reshape(proj.shape[:-3] + (-1,))
+
+            table = neighbour_table(sc, tuple(int(h) for h in atom["hop"]))
+            values[i] += atom["weight"]*np.take(projs[key], table, axis=-1)
+
+    return values.reshape((len(patterns),) + shape)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _project_fft(displacements, patterns):
+
+    """ Reciprocal space projection of compiled patterns, see measure(). """
+
+    sc = tuple(int(n) for n in displacements.shape[-5:-2])
+
+    # single batched transform over all atoms and components
+    disps = np.fft.rfftn(displacements.astype(np.float64), axes=(-5,-4,-3))
+
+    # phase of a unit hopping along each axis
+    freqs = [np.fft.fftfreq(sc[0]), np.fft.fftfreq(sc[1]), np.fft.rfftfreq(sc[2])]
+
+    values = np.zeros((len(patterns),) + displacements.shape[:-2])
+
+    phases = {}         # phase factor of each hopping
+    projs = {}          # projections of each atom on each target
+    for i, pattern in enumerate(patterns):
+
+        spectrum = np.zeros(disps.shape[:-2], dtype=complex)
+
+        for atom in pattern:
+
+            label = int(atom["label"])
+            key = (label,) + tuple(atom["target"])
+            if key not in projs:
+                projs[key] = disps[...,label,:] @ atom["target"]
+
+            hop = tuple(int(h) for h in atom["hop"])
+            if hop not in phases:
+                ex, ey, ez = [np.exp(2j*np.pi*f*h) for f, h in zip(freqs, hop)]
+                phases[hop] = ex[:,None,None]*ey[None,:,None]*ez[None,None,:]
+
+            spectrum += atom["weight"]*phases[hop]*projs[key]
+
+        values[i] = np.fft.irfftn(spectrum, s=sc, axes=(-3,-2,-1))
 
-    for x in range(geom.supercell[0]):
-        for y in range(geom.supercell[1]):
-            for z in range(geom.supercell[2]):
-                cell = np.array([x,y,z])
-                for atom in pattern:
-                    atom_cell = np.mod(cell + atom[1], geom.supercell)
-                    nx, ny, nz = atom_cell
-                    values[x,y,z] += atom[2]*np.dot(atom[3], geom.displacements[nx,ny,nz,atom[0],:])
     return values
@@ -29,6 +29,57 @@ SIMULATION_SETUP_FILE = "simulation.info"
 # regular expression to use when parsing for lattice data
 LT_SEARCH_WORD = "LT:"
 
+# Words heading the atomic forces and stress blocks of a single 
+# point SCALE-UP output (see ezSCUP.singlepoint.SPRun), on a line 
+# of their own, optionally followed by units and a colon, such as
+# "Forces (eV/Ang):". The force block holds one line per atom ending
+# in its three components, and the stress block one line ending in 
+# its six Voigt components (xx, yy, zz, yz, xz, xy). Blocks that are
+# not found, or do not follow this layout, are skipped: MissingForces
+# is only raised where the forces are needed (ezSCUP.normodes).
+# NOTE: this layout is an assumption, not taken from the SCALE-UP 
+# documentation, and the output format depends on the SCALE-UP 
+# version and its print settings. Check it against an actual 
+# single point .out file (run SPRun with clean=False) and adjust
+# these words and the unit factor below before relying on forces.
+SP_FORCES_SEARCH_WORD = "Forces"
+SP_STRESS_SEARCH_WORD = "Stress"
+
+# Factor converting the printed forces to eV/bohr, assuming they
+# are printed in eV/Angstrom (1 bohr = 0.529177 Angstrom). Also an
+# assumption, see the note above.
+# default: 0.529177
+SP_FORCE_UNIT_FACTOR = 0.529177
+
+# Whether or not to store a binary copy (.npy) of each parsed 
+# .restart/.REF file next to it. Later loads of the same file 
+# memory-map this copy instead of parsing the text again, as 
+# long as the size and modification time of the file match.
+# default: False
+GEOMETRY_CACHE = False
+
+# Compression codec for the partial .restart files of each MC 
+# configuration, applied once its equilibrium geometry has been 
+# computed. Any extension in ezSCUP.geometry.CODECS is valid 
+# ("gz", "bz2", "xz"). Compressed partials are read transparently.
+# default: None (keep plain text)
+COMPRESS_PARTIALS = None
+
+# Number of unit cells above which mode projections (see 
+# ezSCUP.projection.measure) are computed through FFTs 
+# instead of real space rolls, when no method is given.
+# Short stencils such as the SrTiO3 modes are faster with
+# rolls even for 48x48x48 supercells, so this is disabled
+# by default. Set to None to always use rolls.
+# default: None
+FFT_PROJECTION_THRESHOLD = None
+
+# Folder where the scratch directories of parallel single point 
+# runs (see ezSCUP.normodes.run_displaced) are created, one per
+# worker. A fast node-local disk is best. 
+# default: None (system temporary folder)
+SCRATCH_DIR = None
+
 #####################################################################
 ##  MONTE CARLO FDF DEFAULT SETTINGS
 #####################################################################
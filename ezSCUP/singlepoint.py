@@ -7,6 +7,7 @@ import numpy as np          # matrix support
 
 # standard library imports
 import os
+import re
 
 # package imports
 from ezSCUP.handlers import SP_SCUPHandler, FDFSetting
@@ -19,21 +20,27 @@ import ezSCUP.exceptions
 # MODULE STRUCTURE
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 #
-# + func SPRun(parameter_file, geom)
+# + func SPRun(parameter_file, geom, name, clean, folder)
 #
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def SPRun(parameter_file, geom, name="SPDefaultName", clean=True):
+def SPRun(parameter_file, geom, name="SPDefaultName", clean=True, folder=None):
+
+    if folder is None:
+        folder = os.getcwd()
+
+    # the simulation runs within the folder
+    parameter_file = os.path.abspath(parameter_file)
 
     sim = SP_SCUPHandler(name, parameter_file, cfg.SCUP_EXEC)
 
     sim.settings["supercell"] = [list(geom.supercell)]
     sim.settings["geometry_restart"] =  FDFSetting(name + ".restart")
-    geom.write_restart(name + ".restart")
+    geom.write_restart(os.path.join(folder, name + ".restart"))
         
-    sim.launch(output_file=name + ".out")
+    sim.launch(output_file=name + ".out", folder=folder)
         
-    f = open(name + ".out")
+    f = open(os.path.join(folder, name + ".out"))
 
     line = f.readline().strip()
     while (line != "Energy decomposition:"):
@@ -57,13 +64,63 @@ def SPRun(parameter_file, geom, name="SPDefaultName", clean=True):
     energy["elec_electrostatic"] = float(f.readline().strip().split()[2])
 
     energy["total_energy"] = float(f.readline().strip().split()[3])
+
+    # forces (in eV/bohr) and stress, if printed in 
+    # the expected layout (see cfg.SP_FORCES_SEARCH_WORD)
+    rest = f.readlines()
     f.close()
 
+    natoms = int(np.prod(geom.supercell))*geom.nats
+    forces = _read_block(rest, cfg.SP_FORCES_SEARCH_WORD, natoms, 3)
+    if forces is not None:
+        energy["forces"] = forces*cfg.SP_FORCE_UNIT_FACTOR
+
+    stress = _read_block(rest, cfg.SP_STRESS_SEARCH_WORD, 1, 6)
+    if stress is not None:
+        energy["stress"] = stress[0]
+
     # cleanup
     if clean:
-        os.remove(name + ".restart")
-        os.remove(name + ".out")
-        os.remove(name + "_FINAL.REF")
-        os.remove(name + "_FINAL.restart")
+        os.remove(os.path.join(folder, name + ".restart"))
+        os.remove(os.path.join(folder, name + ".out"))
+        os.remove(os.path.join(folder, name + "_FINAL.REF"))
+        os.remove(os.path.join(folder, name + "_FINAL.restart"))
         
-    return energy
\ No newline at end of file
+    return energy
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def _read_block(lines, word, nrows, ncols):
+
+    """ 
+    
+    Reads the last ncols numbers of the nrows lines after a header 
+    line, as a (nrows, ncols) array. Header lines hold just the given 
+    word, optionally followed by units in parentheses and a colon 
+    (ie. "Forces (eV/Ang):"). Headers that are not followed by such a
+    block (too few lines or values, non-numeric values) are passed over, 
+    and None is returned if no header is followed by a valid block.
+    
+    """
+
+    header = re.compile(r"^" + re.escape(word) + r"\s*(\([^)]*\))?\s*:?$")
+
+    for i, line in enumerate(lines):
+
+        if not header.match(line.strip()):
+            continue
+
+        block = lines[i+1:i+1+nrows]
+        if len(block) != nrows:
+            continue
+
+        rows = [l.split() for l in block]
+        if any(len(r) < ncols for r in rows):
+            continue
+
+        try:
+            return np.array([r[-ncols:] for r in rows], dtype=np.float64)
+        except ValueError:
+            continue
+
+    return None
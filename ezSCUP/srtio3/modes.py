@@ -12,12 +12,13 @@ import numpy as np
 
 # standard library imports
 from copy import deepcopy   # proper array copy
+from functools import lru_cache
 from pathlib import Path
 import os, sys
 
 # package imports
-from ezSCUP.polarization import unit_conversion
-from ezSCUP.projection import measure
+from ezSCUP.polarization import unit_conversion, born_tensors
+from ezSCUP.projection import compile_pattern, measure_many, neighbour_correlation
 from ezSCUP.geometry import Geometry
 
 import ezSCUP.settings as cfg
@@ -33,36 +34,36 @@ import ezSCUP.exceptions
 # + func STO_AFE(config)
 # + func STO_OD(config)
 #
-# + func perovskite_polarization(config, labels, born_charges)
+# + func STO_POL(config)
+#
+# Pattern tables are compiled once per model label set (see the
+# _*_patterns() functions), and the neighbour tables they are 
+# gathered with once per supercell shape (see ezSCUP.projection).
 #
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
 # ================================================================= #
-# ~~~~~~~~~~~~~~~~~~~~ Pattern Projection ~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~ Pattern Tables ~~~~~~~~~~~~~~~~~~~~~~~~~ #
 # ================================================================= #
 
-def STO_ROT(geom, model, angles=True):
+def _tables(*patterns):
 
-    """
-    Calculates the perovskite octahedral rotations of each unit cell.
-    
-    Parameters:
-    ----------
+    """ Compiles the given patterns into read-only tables. """
 
-    - config (MCConfiguration): configuration to be loaded.
-    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
-    
-    Return:
-    ----------
-    - three supercell-sized arrays containing the rotation angle in the
-    x, y and z directions of each unit cell (in degrees)
-    
-    """
+    tables = tuple(compile_pattern(p) for p in patterns)
+    for t in tables:
+        t.setflags(write=False)
 
-    if not isinstance(geom, Geometry):
-        raise ezSCUP.exceptions.InvalidGeometryObject
+    return tables
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+@lru_cache(maxsize=None)
+def _rot_patterns(labels):
+
+    """ Octahedral rotation patterns of a label set. """
 
-    _, _, Ox, Oy, Oz = model["labels"]
+    _, _, Ox, Oy, Oz = labels
 
     ROT_X=[
             # atom, hopping, weight, target vector
@@ -88,280 +89,148 @@ def STO_ROT(geom, model, angles=True):
             [Oy, [ 0, 1, 0], -1/2., [ 0.7071067812, 0.0, 0.0]],
     ]
 
-    dist = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-    dist[:,:,:,0] = measure(geom, ROT_X)
-    dist[:,:,:,1] = measure(geom, ROT_Y)
-    dist[:,:,:,2] = measure(geom, ROT_Z)
-
-    if angles:
-        return np.arctan(dist/(np.sqrt(2)*model["BOdist"]))*180/np.pi
-    else:
-        return dist
+    return _tables(ROT_X, ROT_Y, ROT_Z)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def STO_AFD(geom, model, mode="a", angles=True, symmetry=True, algo="sum"):
+@lru_cache(maxsize=None)
+def _afd_patterns(labels, mode):
 
-    """
-
-    Calculates the octahedral antiferrodistortive rotation 
-    of each unit cell.
-    
-    Parameters:
-    ----------
-
-    - config (MCConfiguration): configuration to be loaded.
-    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
-    - mode ("a" or "i"): mode of interest, either in-phase or anti-phase (default).
-    
-    Return:
-    ----------
-    - three supercell-sized arrays containing the rotation angle in the
-    x, y and z directions of each unit cell (in degrees)
-    
-    """
+    """ Antiferrodistortive patterns of a label set, for a given mode. """
 
-    if mode != "a" and mode != "i":
-        raise NotImplementedError
+    _, _, Ox, Oy, Oz = labels
 
-    if algo != "sum" and algo != "sign":
-        raise NotImplementedError
+    AFDa_X=[
+            # atom, hopping, weight, target vector
+            # "lower" cell
+            [Oz, [-1, 0, 0], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [-1, 0, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
+            [Oz, [-1, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [-1, 1, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
+            # "middle" cell
+            [Oz, [ 0, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0, 0], -1/4., [ 0.0, 0.0, 0.7071067812]],
+            [Oz, [ 0, 0, 1], -1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1, 0],  1/4., [ 0.0, 0.0, 0.7071067812]],
+            # "upper" cell
+            [Oz, [ 1, 0, 0], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 1, 0, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
+            [Oz, [ 1, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 1, 1, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
+        ]
 
-    if not isinstance(geom, Geometry):
-        raise ezSCUP.exceptions.InvalidGeometryObject
 
-    if algo == "sum":
+    AFDa_Y=[
+            # atom, hopping, weight, target vector
+            # "lower" cell
+            [Ox, [0,-1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0,-1, 0], 1/8.,[ 0.7071067812, 0.0, 0.0]],
+            [Ox, [1,-1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0,-1, 1],-1/8.,[ 0.7071067812, 0.0, 0.0]],
+            # "middle" cell
+            [Ox, [0, 0, 0], 1/4.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 0, 0],-1/4.,[ 0.7071067812, 0.0, 0.0]],
+            [Ox, [1, 0, 0],-1/4.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 0, 1], 1/4.,[ 0.7071067812, 0.0, 0.0]],
+            # "upper" cell
+            [Ox, [0, 1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 1, 0], 1/8.,[ 0.7071067812, 0.0, 0.0]],
+            [Ox, [1, 1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 1, 1],-1/8.,[ 0.7071067812, 0.0, 0.0]],
+        ]
 
-        _, _, Ox, Oy, Oz = model["labels"]
-
-        AFDa_X=[
-                # atom, hopping, weight, target vector
-                # "lower" cell
-                [Oz, [-1, 0, 0], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [-1, 0, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
-                [Oz, [-1, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [-1, 1, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
-                # "middle" cell
-                [Oz, [ 0, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0, 0], -1/4., [ 0.0, 0.0, 0.7071067812]],
-                [Oz, [ 0, 0, 1], -1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1, 0],  1/4., [ 0.0, 0.0, 0.7071067812]],
-                # "upper" cell
-                [Oz, [ 1, 0, 0], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 1, 0, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
-                [Oz, [ 1, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 1, 1, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
-            ]
-
-
-        AFDa_Y=[
-                # atom, hopping, weight, target vector
-                # "lower" cell
-                [Ox, [0,-1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0,-1, 0], 1/8.,[ 0.7071067812, 0.0, 0.0]],
-                [Ox, [1,-1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0,-1, 1],-1/8.,[ 0.7071067812, 0.0, 0.0]],
-                # "middle" cell
-                [Ox, [0, 0, 0], 1/4.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 0, 0],-1/4.,[ 0.7071067812, 0.0, 0.0]],
-                [Ox, [1, 0, 0],-1/4.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 0, 1], 1/4.,[ 0.7071067812, 0.0, 0.0]],
-                # "upper" cell
-                [Ox, [0, 1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 1, 0], 1/8.,[ 0.7071067812, 0.0, 0.0]],
-                [Ox, [1, 1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 1, 1],-1/8.,[ 0.7071067812, 0.0, 0.0]],
-            ]
-
-
-        AFDa_Z=[
-                # atom, hopping, weight, target vector
-                # "lower" cell
-                [Ox, [ 0, 0,-1],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0,-1], -1/8., [ 0.7071067812, 0.0, 0.0]],
-                [Ox, [ 1, 0,-1], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1,-1],  1/8., [ 0.7071067812, 0.0, 0.0]],
-                # "middle" cell
-                [Ox, [ 0, 0, 0], -1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0, 0],  1/4., [ 0.7071067812, 0.0, 0.0]],
-                [Ox, [ 1, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1, 0], -1/4., [ 0.7071067812, 0.0, 0.0]],
-                # "upper" cell
-                [Ox, [ 0, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0, 1], -1/8., [ 0.7071067812, 0.0, 0.0]],
-                [Ox, [ 1, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1, 1],  1/8., [ 0.7071067812, 0.0, 0.0]]
-            ]
-
-        AFDi_X=[
-                # atom, hopping, weight, target vector
-                # "lower" cell
-                [Oz, [-1, 0, 0],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [-1, 0, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
-                [Oz, [-1, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [-1, 1, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
-                # "middle" cell
-                [Oz, [ 0, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0, 0], -1/4., [ 0.0, 0.0, 0.7071067812]],
-                [Oz, [ 0, 0, 1], -1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1, 0],  1/4., [ 0.0, 0.0, 0.7071067812]],
-                # "upper" cell
-                [Oz, [ 1, 0, 0],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 1, 0, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
-                [Oz, [ 1, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 1, 1, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
-            ]
-
-
-        AFDi_Y=[
-                # atom, hopping, weight, target vector
-                # "lower" cell
-                [Ox, [0,-1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0,-1, 0],-1/8.,[ 0.7071067812, 0.0, 0.0]],
-                [Ox, [1,-1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0,-1, 1], 1/8.,[ 0.7071067812, 0.0, 0.0]],
-                # "middle" cell
-                [Ox, [0, 0, 0], 1/4.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 0, 0],-1/4.,[ 0.7071067812, 0.0, 0.0]],
-                [Ox, [1, 0, 0],-1/4.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 0, 1], 1/4.,[ 0.7071067812, 0.0, 0.0]],
-                # "upper" cell
-                [Ox, [0, 1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 1, 0],-1/8.,[ 0.7071067812, 0.0, 0.0]],
-                [Ox, [1, 1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
-                [Oz, [0, 1, 1], 1/8.,[ 0.7071067812, 0.0, 0.0]],
-            ]
-
-
-        AFDi_Z=[
-                # atom, hopping, weight, target vector
-                # "lower" cell
-                [Ox, [ 0, 0,-1], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0,-1],  1/8., [ 0.7071067812, 0.0, 0.0]],
-                [Ox, [ 1, 0,-1],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1,-1], -1/8., [ 0.7071067812, 0.0, 0.0]],
-                # "middle" cell
-                [Ox, [ 0, 0, 0], -1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0, 0],  1/4., [ 0.7071067812, 0.0, 0.0]],
-                [Ox, [ 1, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1, 0], -1/4., [ 0.7071067812, 0.0, 0.0]],
-                # "upper" cell
-                [Ox, [ 0, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 0, 1],  1/8., [ 0.7071067812, 0.0, 0.0]],
-                [Ox, [ 1, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
-                [Oy, [ 0, 1, 1], -1/8., [ 0.7071067812, 0.0, 0.0]]
-            ]
-
-
-
-        if mode == "a":
-
-            # distortion
-            dist = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-            dist[:,:,:,0] = measure(geom, AFDa_X)
-            dist[:,:,:,1] = measure(geom, AFDa_Y)
-            dist[:,:,:,2] = measure(geom, AFDa_Z)
-            
-            # symmetry corrections -> R-point instability
-            if symmetry:
-                for x in range(geom.supercell[0]):
-                    for y in range(geom.supercell[1]):
-                        for z in range(geom.supercell[2]):
-                            dist[x,y,z,:] = (-1)**x * (-1)**y * (-1)**z * dist[x,y,z,:]
-
-            if angles:
-                return np.arctan(dist/(np.sqrt(2)*model["BOdist"]))*180/np.pi
-            else:
-                return dist
 
-        else:
+    AFDa_Z=[
+            # atom, hopping, weight, target vector
+            # "lower" cell
+            [Ox, [ 0, 0,-1],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0,-1], -1/8., [ 0.7071067812, 0.0, 0.0]],
+            [Ox, [ 1, 0,-1], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1,-1],  1/8., [ 0.7071067812, 0.0, 0.0]],
+            # "middle" cell
+            [Ox, [ 0, 0, 0], -1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0, 0],  1/4., [ 0.7071067812, 0.0, 0.0]],
+            [Ox, [ 1, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1, 0], -1/4., [ 0.7071067812, 0.0, 0.0]],
+            # "upper" cell
+            [Ox, [ 0, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0, 1], -1/8., [ 0.7071067812, 0.0, 0.0]],
+            [Ox, [ 1, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1, 1],  1/8., [ 0.7071067812, 0.0, 0.0]]
+        ]
 
-            # distortion
-            dist = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-            dist[:,:,:,0] = measure(geom, AFDi_X)
-            dist[:,:,:,1] = measure(geom, AFDi_Y)
-            dist[:,:,:,2] = measure(geom, AFDi_Z)
-            
-            # symmetry corrections -> M-point instability
-            if symmetry:
-                for x in range(geom.supercell[0]):
-                    for y in range(geom.supercell[1]):
-                        for z in range(geom.supercell[2]):
-                            dist[x,y,z,0] = (-1)**y * (-1)**z * dist[x,y,z,0]
-                            dist[x,y,z,1] = (-1)**x * (-1)**z * dist[x,y,z,1]
-                            dist[x,y,z,2] = (-1)**x * (-1)**y * dist[x,y,z,2]
-
-            if angles:
-                return np.arctan(dist/(np.sqrt(2)*model["BOdist"]))*180/np.pi
-            else:
-                return dist
+    AFDi_X=[
+            # atom, hopping, weight, target vector
+            # "lower" cell
+            [Oz, [-1, 0, 0],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [-1, 0, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
+            [Oz, [-1, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [-1, 1, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
+            # "middle" cell
+            [Oz, [ 0, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0, 0], -1/4., [ 0.0, 0.0, 0.7071067812]],
+            [Oz, [ 0, 0, 1], -1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1, 0],  1/4., [ 0.0, 0.0, 0.7071067812]],
+            # "upper" cell
+            [Oz, [ 1, 0, 0],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 1, 0, 0], -1/8., [ 0.0, 0.0, 0.7071067812]],
+            [Oz, [ 1, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 1, 1, 0],  1/8., [ 0.0, 0.0, 0.7071067812]],
+        ]
 
-    if algo == "sign":
 
-        rots = STO_ROT(geom, model, angles=angles)
-        dirs = np.copy(rots)
-        proj = np.zeros_like(rots)
-        
-        # normalize the rotations
-        for x in range(geom.supercell[0]):
-            for y in range(geom.supercell[1]):
-                for z in range(geom.supercell[2]):
-                    dirs[x,y,z,:] = dirs[x,y,z,:]/np.linalg.norm(dirs[x,y,z,:])
-
-        # calculate the projection
-        for x in range(geom.supercell[0]):
-            for y in range(geom.supercell[1]):
-                for z in range(geom.supercell[2]):
-
-                    cell = np.array([x,y,z])
-
-                    ux, uy, uz = np.mod(cell + [1,0,0], geom.supercell)
-                    dx, dy, dz = np.mod(cell - [1,0,0], geom.supercell)
-                    proj[x,y,z,0] = np.mean([
-                                    np.dot(dirs[x,y,z,:], dirs[ux,uy,uz,:]),
-                                    np.dot(dirs[x,y,z,:], dirs[dx,dy,dz,:])
-                                    ])
-
-                    ux, uy, uz = np.mod(cell + [0,1,0], geom.supercell)
-                    dx, dy, dz = np.mod(cell - [0,1,0], geom.supercell)
-                    proj[x,y,z,1] = np.mean([
-                                    np.dot(dirs[x,y,z,:], dirs[ux,uy,uz,:]),
-                                    np.dot(dirs[x,y,z,:], dirs[dx,dy,dz,:])
-                                    ])
-
-                    ux, uy, uz = np.mod(cell + [0,0,1], geom.supercell)
-                    dx, dy, dz = np.mod(cell - [0,0,1], geom.supercell)
-                    proj[x,y,z,2] = np.mean([
-                                    np.dot(dirs[x,y,z,:], dirs[ux,uy,uz,:]),
-                                    np.dot(dirs[x,y,z,:], dirs[dx,dy,dz,:])
-                                    ])
-
-        return proj
+    AFDi_Y=[
+            # atom, hopping, weight, target vector
+            # "lower" cell
+            [Ox, [0,-1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0,-1, 0],-1/8.,[ 0.7071067812, 0.0, 0.0]],
+            [Ox, [1,-1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0,-1, 1], 1/8.,[ 0.7071067812, 0.0, 0.0]],
+            # "middle" cell
+            [Ox, [0, 0, 0], 1/4.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 0, 0],-1/4.,[ 0.7071067812, 0.0, 0.0]],
+            [Ox, [1, 0, 0],-1/4.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 0, 1], 1/4.,[ 0.7071067812, 0.0, 0.0]],
+            # "upper" cell
+            [Ox, [0, 1, 0], 1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 1, 0],-1/8.,[ 0.7071067812, 0.0, 0.0]],
+            [Ox, [1, 1, 0],-1/8.,[ 0.0, 0.0, 0.7071067812]],
+            [Oz, [0, 1, 1], 1/8.,[ 0.7071067812, 0.0, 0.0]],
+        ]
 
-# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def STO_FE(geom, model):
+    AFDi_Z=[
+            # atom, hopping, weight, target vector
+            # "lower" cell
+            [Ox, [ 0, 0,-1], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0,-1],  1/8., [ 0.7071067812, 0.0, 0.0]],
+            [Ox, [ 1, 0,-1],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1,-1], -1/8., [ 0.7071067812, 0.0, 0.0]],
+            # "middle" cell
+            [Ox, [ 0, 0, 0], -1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0, 0],  1/4., [ 0.7071067812, 0.0, 0.0]],
+            [Ox, [ 1, 0, 0],  1/4., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1, 0], -1/4., [ 0.7071067812, 0.0, 0.0]],
+            # "upper" cell
+            [Ox, [ 0, 0, 1], -1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 0, 1],  1/8., [ 0.7071067812, 0.0, 0.0]],
+            [Ox, [ 1, 0, 1],  1/8., [ 0.0, 0.7071067812, 0.0]],
+            [Oy, [ 0, 1, 1], -1/8., [ 0.7071067812, 0.0, 0.0]]
+        ]
 
-    """
+    if mode == "a":
+        return _tables(AFDa_X, AFDa_Y, AFDa_Z)
+    else:
+        return _tables(AFDi_X, AFDi_Y, AFDi_Z)
 
-    Calculates the ferroelectric displacements of each unit cell.
-    
-    Parameters:
-    ----------
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-    - config (MCConfiguration): configuration to be loaded.
-    
-    Return:
-    ----------
-    - three supercell-sized arrays containing the ferroelectric dispalcements 
-    in the x, y and z directions of each unit cell (in bohr)
-    
-    """
+@lru_cache(maxsize=None)
+def _fe_patterns(labels):
 
-    if not isinstance(geom, Geometry):
-        raise ezSCUP.exceptions.InvalidGeometryObject
+    """ Ferroelectric patterns of a label set. """
 
-    A, B, Ox, Oy, Oz = model["labels"]
+    A, B, Ox, Oy, Oz = labels
 
     FE_X=[  # atom, hopping, weight, target vector
             # "frame"
@@ -423,38 +292,16 @@ def STO_FE(geom, model):
             [Oz, [0, 0, 1], 0.3737995525/2., [0.0, 0.0,-1.0]]
         ]
 
-    dist = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-    dist[:,:,:,0] = measure(geom, FE_X)
-    dist[:,:,:,1] = measure(geom, FE_Y)
-    dist[:,:,:,2] = measure(geom, FE_Z)
-
-    return dist
+    return _tables(FE_X, FE_Y, FE_Z)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def STO_AFE(geom, model):
-
-    """
-
-    Calculates the antiferroelectric displacements of each unit cell.
-    
-    Parameters:
-    ----------
-
-    - config (MCConfiguration): configuration to be loaded.
-    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
-    
-    Return:
-    ----------
-    - three supercell-sized arrays containing the ferroelectric dispalcements 
-    in the x, y and z directions of each unit cell (in bohr)
-    
-    """
+@lru_cache(maxsize=None)
+def _afe_patterns(labels):
 
-    if not isinstance(geom, Geometry):
-        raise ezSCUP.exceptions.InvalidGeometryObject
+    """ Antiferroelectric patterns of a label set. """
 
-    A, B, Ox, Oy, Oz = model["labels"]
+    A, B, Ox, Oy, Oz = labels
 
     AFE_X=[  # atom, hopping, weight, target vector
             # "frame"
@@ -516,39 +363,16 @@ def STO_AFE(geom, model):
             [Oz, [0, 0, 1], 0.0073879524/2., [0.0, 0.0, 1.0]]
         ]
 
-
-    dist = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-    dist[:,:,:,0] = measure(geom, AFE_X)
-    dist[:,:,:,1] = measure(geom, AFE_Y)
-    dist[:,:,:,2] = measure(geom, AFE_Z)
-
-    return dist
+    return _tables(AFE_X, AFE_Y, AFE_Z)
 
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 
-def STO_OD(geom, model):
+@lru_cache(maxsize=None)
+def _od_patterns(labels):
 
-    """
+    """ Octahedral distortion patterns of a label set. """
 
-    Calculates the octahedral distortions of each unit cell.
-    
-    Parameters:
-    ----------
-
-    - config (MCConfiguration): configuration to be loaded.
-    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
-    
-    Return:
-    ----------
-    - three supercell-sized arrays containing the ferroelectric dispalcements 
-    in the x, y and z directions of each unit cell (in bohr)
-    
-    """
-
-    if not isinstance(geom, Geometry):
-        raise ezSCUP.exceptions.InvalidGeometryObject
-
-    A, B, Ox, Oy, Oz = model["labels"]
+    A, B, Ox, Oy, Oz = labels
 
     OD_X=[  # atom, hopping, weight, target vector
             # "frame"
@@ -610,11 +434,257 @@ def STO_OD(geom, model):
             [Oz, [0, 0, 1], 0.8723213685/2., [0.0, 0.0, 1.0]]
         ]
 
+    return _tables(OD_X, OD_Y, OD_Z)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+@lru_cache(maxsize=None)
+def _pol_patterns(labels, charges):
+
+    """ 
     
-    dist = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-    dist[:,:,:,0] = measure(geom, OD_X)
-    dist[:,:,:,1] = measure(geom, OD_Y)
-    dist[:,:,:,2] = measure(geom, OD_Z)
+    Born-charge-weighted patterns of a label set: the projection of 
+    each atom on component i is its weight times the dipole of its 
+    displacement u along i, sum_j Z[i,j]*u[j], with Z its Born charge 
+    tensor (see ezSCUP.polarization.born_tensors()).
+    
+    """
+
+    A, B, Ox, Oy, Oz = labels
+
+    FE_mode=[  # atom, hopping, weight
+        # "frame"
+        [A, [0, 0, 0], 1./8.],
+        [A, [1, 0, 0], 1./8.],
+        [A, [1, 1, 0], 1./8.],
+        [A, [0, 1, 0], 1./8.],
+        [A, [0, 0, 1], 1./8.],
+        [A, [1, 0, 1], 1./8.],
+        [A, [1, 1, 1], 1./8.],
+        [A, [0, 1, 1], 1./8.],
+        # "octahedra"
+        [B, [0, 0, 0], 1.], # b site
+        [Ox, [0, 0, 0], 1./2.], 
+        [Ox, [1, 0, 0], 1./2.],
+        [Oy, [0, 0, 0], 1./2.],
+        [Oy, [0, 1, 0], 1./2.],
+        [Oz, [0, 0, 0], 1./2.],
+        [Oz, [0, 0, 1], 1./2.]
+    ]
+
+    charges = {label: np.reshape(z, (3,3)) for label, z in charges}
+
+    patterns = []
+    for i in range(3):
+        pattern = []
+        for atom in FE_mode:
+            target = atom[2]*charges[atom[0]][i,:]
+            pattern.append([atom[0], atom[1], 1., target])
+        patterns.append(pattern)
+
+    return _tables(*patterns)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+@lru_cache(maxsize=None)
+def _afd_signs(supercell, mode):
+
+    """ 
+    
+    Sign of each cell and component in the symmetry corrections of
+    the antiferrodistortive modes, ie. (-1)**(x+y+z) for the R-point
+    ("a") and (-1)**(y+z), (-1)**(x+z), (-1)**(x+y) for the M-point ("i").
+    
+    """
+
+    x, y, z = np.indices(supercell)
+
+    if mode == "a":
+        signs = np.stack([(-1)**(x+y+z)]*3, axis=-1)
+    else:
+        signs = np.stack([(-1)**(y+z), (-1)**(x+z), (-1)**(x+y)], axis=-1)
+
+    signs.setflags(write=False)
+
+    return signs
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~ Pattern Projection ~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+def STO_ROT(geom, model, angles=True, method="auto"):
+
+    """
+    Calculates the perovskite octahedral rotations of each unit cell.
+    
+    Parameters:
+    ----------
+
+    - config (MCConfiguration): configuration to be loaded.
+    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
+    - method (string): projection method, see ezSCUP.projection.measure().
+    
+    Return:
+    ----------
+    - three supercell-sized arrays containing the rotation angle in the
+    x, y and z directions of each unit cell (in degrees)
+    
+    """
+
+    if not isinstance(geom, Geometry):
+        raise ezSCUP.exceptions.InvalidGeometryObject
+
+    patterns = _rot_patterns(tuple(model["labels"]))
+    dist = np.stack(measure_many(geom, patterns, method=method), axis=-1)
+
+    if angles:
+        return np.arctan(dist/(np.sqrt(2)*model["BOdist"]))*180/np.pi
+    else:
+        return dist
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def STO_AFD(geom, model, mode="a", angles=True, symmetry=True, algo="sum", method="auto"):
+
+    """
+
+    Calculates the octahedral antiferrodistortive rotation 
+    of each unit cell.
+    
+    Parameters:
+    ----------
+
+    - config (MCConfiguration): configuration to be loaded.
+    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
+    - mode ("a" or "i"): mode of interest, either in-phase or anti-phase (default).
+    - algo ("sum" or "sign"): either project the AFD patterns (default), or 
+    correlate the rotations of each cell with its neighbours, see 
+    ezSCUP.projection.neighbour_correlation().
+    - method (string): projection method, see ezSCUP.projection.measure().
+    
+    Return:
+    ----------
+    - three supercell-sized arrays containing the rotation angle in the
+    x, y and z directions of each unit cell (in degrees)
+    
+    """
+
+    if mode != "a" and mode != "i":
+        raise NotImplementedError
+
+    if algo != "sum" and algo != "sign":
+        raise NotImplementedError
+
+    if not isinstance(geom, Geometry):
+        raise ezSCUP.exceptions.InvalidGeometryObject
+
+    if algo == "sum":
+
+        # distortion
+        patterns = _afd_patterns(tuple(model["labels"]), mode)
+        dist = np.stack(measure_many(geom, patterns, method=method), axis=-1)
+        
+        # symmetry corrections -> R-point (AFDa) or M-point (AFDi) instability
+        if symmetry:
+            dist = _afd_signs(tuple(geom.supercell), mode)*dist
+
+        if angles:
+            return np.arctan(dist/(np.sqrt(2)*model["BOdist"]))*180/np.pi
+        else:
+            return dist
+
+    if algo == "sign":
+
+        rots = STO_ROT(geom, model, angles=angles, method=method)
+
+        return neighbour_correlation(rots)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def STO_FE(geom, model, method="auto"):
+
+    """
+
+    Calculates the ferroelectric displacements of each unit cell.
+    
+    Parameters:
+    ----------
+
+    - config (MCConfiguration): configuration to be loaded.
+    - method (string): projection method, see ezSCUP.projection.measure().
+    
+    Return:
+    ----------
+    - three supercell-sized arrays containing the ferroelectric dispalcements 
+    in the x, y and z directions of each unit cell (in bohr)
+    
+    """
+
+    if not isinstance(geom, Geometry):
+        raise ezSCUP.exceptions.InvalidGeometryObject
+
+    patterns = _fe_patterns(tuple(model["labels"]))
+    dist = np.stack(measure_many(geom, patterns, method=method), axis=-1)
+
+    return dist
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def STO_AFE(geom, model, method="auto"):
+
+    """
+
+    Calculates the antiferroelectric displacements of each unit cell.
+    
+    Parameters:
+    ----------
+
+    - config (MCConfiguration): configuration to be loaded.
+    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
+    - method (string): projection method, see ezSCUP.projection.measure().
+    
+    Return:
+    ----------
+    - three supercell-sized arrays containing the ferroelectric dispalcements 
+    in the x, y and z directions of each unit cell (in bohr)
+    
+    """
+
+    if not isinstance(geom, Geometry):
+        raise ezSCUP.exceptions.InvalidGeometryObject
+
+    patterns = _afe_patterns(tuple(model["labels"]))
+    dist = np.stack(measure_many(geom, patterns, method=method), axis=-1)
+
+    return dist
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def STO_OD(geom, model, method="auto"):
+
+    """
+
+    Calculates the octahedral distortions of each unit cell.
+    
+    Parameters:
+    ----------
+
+    - config (MCConfiguration): configuration to be loaded.
+    - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
+    - method (string): projection method, see ezSCUP.projection.measure().
+    
+    Return:
+    ----------
+    - three supercell-sized arrays containing the ferroelectric dispalcements 
+    in the x, y and z directions of each unit cell (in bohr)
+    
+    """
+
+    if not isinstance(geom, Geometry):
+        raise ezSCUP.exceptions.InvalidGeometryObject
+
+    patterns = _od_patterns(tuple(model["labels"]))
+    dist = np.stack(measure_many(geom, patterns, method=method), axis=-1)
 
     return dist
 
@@ -622,7 +692,7 @@ def STO_OD(geom, model):
 # ~~~~~~~~~~~~~~~~~~~~~~~ Polarization ~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
 # ================================================================= #
 
-def STO_POL(geom, model):
+def STO_POL(geom, model, method="auto"):
 
     """
 
@@ -633,8 +703,10 @@ def STO_POL(geom, model):
     ----------
 
     - born_charges (dict): dictionary with element labels as keys
-    and effective charge 3D vectors as values. (in elemental charge units)
+    and effective charge 3D vectors or 3x3 tensors as values. 
+    (in elemental charge units)
     - labels (list): identifiers of the five perovskite atoms [A, B, 0x, Oy, Oz]
+    - method (string): projection method, see ezSCUP.projection.measure().
 
     Return:
     ----------
@@ -647,56 +719,16 @@ def STO_POL(geom, model):
     if not isinstance(geom, Geometry):
         raise ezSCUP.exceptions.InvalidGeometryObject
 
-    A, B, Ox, Oy, Oz = model["labels"]
-
-    FE_mode=[  # atom, hopping, weight
-        # "frame"
-        [A, [0, 0, 0], 1./8.],
-        [A, [1, 0, 0], 1./8.],
-        [A, [1, 1, 0], 1./8.],
-        [A, [0, 1, 0], 1./8.],
-        [A, [0, 0, 1], 1./8.],
-        [A, [1, 0, 1], 1./8.],
-        [A, [1, 1, 1], 1./8.],
-        [A, [0, 1, 1], 1./8.],
-        # "octahedra"
-        [B, [0, 0, 0], 1.], # b site
-        [Ox, [0, 0, 0], 1./2.], 
-        [Ox, [1, 0, 0], 1./2.],
-        [Oy, [0, 0, 0], 1./2.],
-        [Oy, [0, 1, 0], 1./2.],
-        [Oz, [0, 0, 0], 1./2.],
-        [Oz, [0, 0, 1], 1./2.]
-    ]
-
     cnts = geom.lat_constants
     stra = geom.strains
 
     ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
 
-    pols = np.zeros((geom.supercell[0], geom.supercell[1], geom.supercell[2], 3))
-
-    for x in range(geom.supercell[0]):
-        for y in range(geom.supercell[1]):
-            for z in range(geom.supercell[2]):
-
-                pol = np.zeros(3)
-                cell = np.array([x,y,z])
-
-                for atom in FE_mode:
-
-                    atom_cell = np.mod(cell + atom[1], geom.supercell)
-                    nx, ny, nz = atom_cell
-
-                    tau = geom.displacements[nx,ny,nz,atom[0],:]
-                    charges = np.array(model["born_charges"][atom[0]])
-                    
-                    for i in range(3):
-                        pol[i] += atom[2]*charges[i]*tau[i]
-
-                pol = pol/ucell_volume # in e/bohr2
-                pol = unit_conversion(pol)
+    labels, tensors = born_tensors(model["born_charges"])
+    charges = tuple((label, tuple(np.ravel(z))) for label, z in zip(labels, tensors))
+    patterns = _pol_patterns(tuple(model["labels"]), charges)
 
-                pols[x,y,z,:] = pol
+    pols = np.stack(measure_many(geom, patterns, method=method), axis=-1)
+    pols = pols/ucell_volume # in e/bohr2
 
-    return pols
\ No newline at end of file
+    return unit_conversion(pols)
@@ -0,0 +1,204 @@
+"""
+Functions to analyze displacement fields in reciprocal space,
+through their structure factor.
+"""
+
+# third party imports
+import numpy as np
+
+# package imports
+from ezSCUP.geometry import Geometry
+
+import ezSCUP.settings as cfg
+import ezSCUP.exceptions
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# MODULE STRUCTURE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+#
+# + func structure_factor(field, chunk_size)
+# + func high_symmetry_points(supercell)
+# + func intensity_at(sf, points)
+# + func correlation_length(sf, point)
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def structure_factor(field, chunk_size=64):
+
+    """
+
+    Calculates the displacement structure factor of a geometry, or its
+    time average over the snapshots of a trajectory:
+
+        S(q) = < |u(q)|^2 > / ncells,   u(q) = sum_R u(R) exp(-i q R)
+
+    for each atom and displacement component separately, where R runs
+    over the unit cells of the supercell. Indices of the result are
+    the usual FFT ones, so S[h,k,l] corresponds to the wavevector
+    q = 2pi (h/sx, k/sy, l/sz), in units of the inverse lattice constant.
+
+    A distortion that condenses at a given q (ie. the AFDa rotations at
+    the R point) shows up as a peak of the corresponding atoms and
+    components at that point, see high_symmetry_points().
+
+    Parameters:
+    ----------
+
+    - field: displacements to analyze, either a Geometry, a Trajectory,
+    a (sx, sy, sz, nats, 3) array, or a (nsteps, sx, sy, sz, nats, 3)
+    array of snapshots.
+    - chunk_size (int): number of snapshots transformed at once.
+
+    Return:
+    ----------
+        - a (sx, sy, sz, nats, 3) array with the structure factor,
+        in Bohrs squared.
+
+    raises: ezSCUP.exceptions.NotEnoughPartials if a trajectory
+    without snapshots is given.
+
+    """
+
+    if isinstance(field, Geometry):
+        field = field.displacements
+    elif hasattr(field, "displacements"):
+        field = field.displacements
+
+    if field.ndim == 5:
+        field = field[None]
+
+    if field.ndim != 6:
+        raise ezSCUP.exceptions.GeometryNotMatching()
+
+    nsteps = field.shape[0]
+    if nsteps == 0:
+        raise ezSCUP.exceptions.NotEnoughPartials()
+
+    ncells = int(np.prod(field.shape[1:4]))
+
+    sf = np.zeros(field.shape[1:])
+    for i in range(0, nsteps, chunk_size):
+        chunk = np.fft.fftn(field[i:i+chunk_size].astype(np.float64), axes=(1,2,3))
+        sf += np.sum(chunk.real**2 + chunk.imag**2, axis=0)
+
+    return sf/(nsteps*ncells)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def high_symmetry_points(supercell):
+
+    """
+
+    Indices of the high-symmetry points of the simple cubic Brillouin
+    zone within the structure factor of a given supercell:
+
+    - "G": q = (0, 0, 0), ie. ferroelectric modes
+    - "X": q = (1/2, 0, 0) and equivalents
+    - "M": q = (1/2, 1/2, 0) and equivalents, ie. in-phase AFD modes
+    - "R": q = (1/2, 1/2, 1/2), ie. anti-phase AFD modes
+
+    in units of 2pi over the lattice constant. Zone-boundary points only
+    exist along the directions in which the supercell is even, points
+    which are not commensurate with the supercell are left out.
+
+    Parameters:
+    ----------
+
+    - supercell (array): supercell shape (ie. [4,4,4])
+
+    Return:
+    ----------
+        - a dictionary with the point labels as keys and a list
+        of (h,k,l) indices of each equivalent point as values.
+
+    """
+
+    sc = np.array(supercell)
+    half = [n//2 if n % 2 == 0 else None for n in sc]
+
+    points = {"G": [(0,0,0)], "X": [], "M": [], "R": []}
+    labels = {1: "X", 2: "M", 3: "R"}
+
+    # every combination of zone-boundary directions
+    for mask in [(1,0,0), (0,1,0), (0,0,1), (1,1,0), (1,0,1), (0,1,1), (1,1,1)]:
+        if any(m and h is None for m, h in zip(mask, half)):
+            continue
+        point = tuple(int(h) if m else 0 for m, h in zip(mask, half))
+        points[labels[sum(mask)]].append(point)
+
+    return points
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def intensity_at(sf, points):
+
+    """
+
+    Structure factor at the given reciprocal space points.
+
+    Parameters:
+    ----------
+
+    - sf (array): structure factor, see structure_factor().
+    - points (list): (h,k,l) indices of the points,
+    see high_symmetry_points().
+
+    Return:
+    ----------
+        - a (npoints, ...) array with the structure factor at each point,
+        ie. (npoints, nats, 3) for the output of structure_factor().
+
+    """
+
+    return np.array([sf[tuple(p)] for p in points])
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def correlation_length(sf, point=(0,0,0)):
+
+    """
+
+    Second-moment estimate of the correlation length around a peak
+    of the structure factor, along each direction:
+
+        xi = sqrt(S(q0)/S(q0 + dq) - 1) / (2 sin(|dq|/2))
+
+    where dq is the smallest wavevector of the supercell in that
+    direction (2pi/L). S(q0 + dq) is averaged over +dq and -dq.
+    Directions with a single cell give no estimate (NaN).
+
+    Parameters:
+    ----------
+
+    - sf (array): structure factor, see structure_factor(). Any
+    trailing dimensions (ie. atoms and components) are kept.
+    - point (tuple): (h,k,l) indices of the peak, see high_symmetry_points().
+
+    Return:
+    ----------
+        - a (3, ...) array with the correlation length in each
+        direction, in lattice constants.
+
+    """
+
+    sf = np.asarray(sf)
+    sc = sf.shape[:3]
+    peak = sf[tuple(point)]
+
+    xi = np.full((3,) + peak.shape, np.nan)
+    for axis in range(3):
+
+        if sc[axis] < 2:
+            continue
+
+        up = np.array(point)
+        up[axis] = (up[axis] + 1) % sc[axis]
+        down = np.array(point)
+        down[axis] = (down[axis] - 1) % sc[axis]
+
+        neighbour = (sf[tuple(up)] + sf[tuple(down)])/2.
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = peak/neighbour - 1.
+        xi[axis] = np.sqrt(np.maximum(ratio, 0.))/(2.*np.sin(np.pi/sc[axis]))
+
+    return xi
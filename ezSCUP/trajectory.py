@@ -0,0 +1,445 @@
+"""
+Class and functions to store the partial .restart files of
+a Monte Carlo configuration as a single memory-mapped trajectory,
+or as a compact (lossy) archive.
+"""
+
+# third party imports
+import numpy as np
+
+# standard library imports
+import os
+
+# package imports
+from ezSCUP.geometry import Geometry, _file_stamp
+
+import ezSCUP.settings as cfg
+import ezSCUP.exceptions
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# MODULE STRUCTURE
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+#
+# + class Trajectory()
+#   - __init__(supercell, species, nats, steps, strains, displacements)
+#   - __len__()
+#   - window(min_step, max_step)
+#   - geometry(index)
+#
+# + func pack_trajectory(partials, steps, trajectory_file, supercell, species, nats)
+# + func load_trajectory(trajectory_file)
+# + func trajectory_is_current(trajectory_file, partials, steps)
+# + func export_archive(partials, steps, archive_file, supercell, species, nats)
+# + func load_archive(archive_file)
+#
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+class Trajectory():
+
+    """
+
+    Time series of geometries, i.e. the partial .restart files
+    of a given MC configuration.
+
+    # BASIC USAGE #
+
+    Trajectories are usually obtained through the method
+    MCSimulationParser.access_trajectory(), which packs all the
+    partials of a configuration the first time it is called:
+
+        traj = parser.access_trajectory(t)              # whole trajectory
+        traj.displacements[i,x,y,z,j,:]                 # atom j in cell (x,y,z), snapshot i
+        traj.strains[i,:]                               # strains of snapshot i
+        late = traj.window(min_step=2000)               # snapshots after step 2000
+        geo = traj.geometry(-1)                         # last snapshot as a Geometry
+
+    The displacement array of packed trajectories is memory-mapped,
+    so only the slices actually accessed are read from disk.
+
+    Attributes:
+    ----------
+
+     - supercell (array): supercell shape
+     - ncells (int): number of unit cells
+     - species (list): atomic species within the supercell
+     - nats (int): number of atoms per unit cell
+     - nsteps (int): number of snapshots
+     - steps (array): MC step of each snapshot
+     - strains (array): (nsteps, 6) strains of each snapshot, in Voigt notation
+     - displacements (array): (nsteps, sx, sy, sz, nats, 3) atomic
+     displacements of each snapshot, in Bohrs
+
+    """
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def __init__(self, supercell, species, nats, steps, strains, displacements):
+
+        """
+
+        Trajectory class constructor.
+
+        Parameters:
+        ----------
+
+        - supercell (array): supercell shape (ie. [4,4,4])
+        - species (list): atomic species within the supercell in order
+        - nats (int): number of atoms per unit cell (ie. 5)
+        - steps (array): MC step of each snapshot
+        - strains (array): (nsteps, 6) strains of each snapshot
+        - displacements (array): (nsteps, sx, sy, sz, nats, 3) displacements
+
+        """
+
+        self.supercell = np.array(supercell)
+        self.ncells = int(self.supercell[0]*self.supercell[1]*self.supercell[2])
+        self.species = list(species)
+        self.nats = int(nats)
+
+        self.steps = np.array(steps, dtype=np.int64)
+        self.strains = strains
+        self.displacements = displacements
+        self.nsteps = self.steps.size
+
+        sc = self.supercell
+        shape = (self.nsteps, sc[0], sc[1], sc[2], self.nats, 3)
+        if self.displacements.shape != shape or self.strains.shape != (self.nsteps, 6):
+            raise ezSCUP.exceptions.GeometryNotMatching()
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def __len__(self):
+
+        """ Number of snapshots in the trajectory. """
+
+        return self.nsteps
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def window(self, min_step=0, max_step=np.inf):
+
+        """
+
+        Snapshots within a given MC step window, following the same
+        (exclusive) criteria as MCSimulationParser.find_partials().
+        No data is copied, the arrays of the result are views of these.
+
+        Parameters:
+        ----------
+
+        - min_step (int): minimum step of the requested snapshots.
+        - max_step (int): maximum step of the requested snapshots.
+
+        Return:
+        ----------
+            - a Trajectory with the requested snapshots.
+
+        """
+
+        # steps are sorted, so the window is always a contiguous slice
+        start = np.searchsorted(self.steps, min_step, side="right")
+        stop = np.searchsorted(self.steps, max_step, side="left")
+        stop = max(start, stop)
+
+        return Trajectory(self.supercell, self.species, self.nats,
+            self.steps[start:stop], self.strains[start:stop],
+            self.displacements[start:stop])
+
+    # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+    def geometry(self, index):
+
+        """
+
+        Geometry of a single snapshot.
+
+        Parameters:
+        ----------
+
+        - index (int): position of the snapshot within the trajectory.
+
+        Return:
+        ----------
+            - a Geometry object with the strains and displacements
+            of the requested snapshot.
+
+        """
+
+        geom = Geometry(self.supercell, self.species, self.nats, dtype=self.displacements.dtype)
+        geom.strains = np.array(self.strains[index])
+        geom.displacements = np.array(self.displacements[index])
+
+        return geom
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+def pack_trajectory(partials, steps, trajectory_file, supercell, species, nats):
+
+    """
+
+    Packs several .restart files into a single trajectory.
+
+    Two files are created: "[trajectory_file].npy", holding the
+    displacements of every snapshot as a (nsteps, sx, sy, sz, nats, 3)
+    array, and "[trajectory_file].npz", holding the MC steps, strains,
+    basic geometry information and the size and modification time of
+    each partial (see trajectory_is_current()). The displacements are written
+    one partial at a time, so the whole trajectory never needs to fit
+    in memory.
+
+    Parameters:
+    ----------
+
+    - partials (list): names of the .restart files, in order.
+    - steps (list): MC step of each of the .restart files.
+    - trajectory_file (string): base name of the trajectory files.
+    - supercell (array): supercell shape (ie. [4,4,4])
+    - species (list): atomic species within the supercell in order
+    - nats (int): number of atoms per unit cell (ie. 5)
+
+    Return:
+    ----------
+        - the packed Trajectory, memory-mapped.
+
+    raises: ezSCUP.exceptions.NotEnoughPartials if no partials are given,
+    and ezSCUP.exceptions.GeometryNotMatching if any partial does not
+    match the given geometry.
+
+    """
+
+    npartials = len(partials)
+    if npartials == 0:
+        raise ezSCUP.exceptions.NotEnoughPartials()
+
+    # keep snapshots sorted by MC step
+    order = np.argsort(steps, kind="stable")
+    partials = [partials[i] for i in order]
+    steps = np.array(steps, dtype=np.int64)[order]
+
+    sc = np.array(supercell)
+    shape = (npartials, int(sc[0]), int(sc[1]), int(sc[2]), int(nats), 3)
+
+    # write everything under temporary names first,
+    # so that an interrupted run never leaves a valid-looking store
+    temp_disp = trajectory_file + ".{:d}.tmp.npy".format(os.getpid())
+    temp_info = trajectory_file + ".{:d}.tmp.npz".format(os.getpid())
+
+    disps = np.lib.format.open_memmap(temp_disp, mode="w+", dtype=np.float64, shape=shape)
+    strains = np.zeros((npartials, 6))
+    stamps = np.array([_file_stamp(p) for p in partials])
+
+    geom = Geometry(supercell, species, nats)
+    for i, p in enumerate(partials):
+        geom.load_restart(p, cache=False)
+        strains[i,:] = geom.strains
+        disps[i] = geom.displacements
+
+    disps.flush()
+    del disps
+
+    np.savez(temp_info, steps=steps, strains=strains, supercell=sc,
+        species=np.array(species), nats=np.array(nats), stamps=stamps)
+
+    os.replace(temp_disp, trajectory_file + ".npy")
+    os.replace(temp_info, trajectory_file + ".npz")
+
+    return load_trajectory(trajectory_file)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def load_trajectory(trajectory_file):
+
+    """
+
+    Loads a trajectory previously stored with pack_trajectory().
+    Displacements are memory-mapped (copy-on-write), everything
+    else is loaded into memory.
+
+    Parameters:
+    ----------
+
+    - trajectory_file (string): base name of the trajectory files.
+
+    Return:
+    ----------
+        - the stored Trajectory.
+
+    """
+
+    with np.load(trajectory_file + ".npz") as info:
+        steps = info["steps"]
+        strains = info["strains"]
+        supercell = info["supercell"]
+        species = [str(s) for s in info["species"]]
+        nats = int(info["nats"])
+
+    disps = np.load(trajectory_file + ".npy", mmap_mode="c")
+
+    return Trajectory(supercell, species, nats, steps, strains, disps)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def trajectory_is_current(trajectory_file, partials, steps):
+
+    """
+
+    Checks whether a trajectory stored with pack_trajectory() still
+    matches the given partials, i.e. the same MC steps and the same
+    size and modification time of every partial file, so that partials
+    rewritten in place are detected as well.
+
+    Parameters:
+    ----------
+
+    - trajectory_file (string): base name of the trajectory files.
+    - partials (list): names of the .restart files.
+    - steps (list): MC step of each of the .restart files.
+
+    Return:
+    ----------
+        - True if the stored trajectory is up to date, False otherwise
+        (including missing, unreadable or old-style trajectory files).
+
+    """
+
+    order = np.argsort(steps, kind="stable")
+    steps = np.array(steps, dtype=np.int64)[order]
+
+    try:
+        with np.load(trajectory_file + ".npz") as info:
+            stored_steps = info["steps"]
+            stored_stamps = info["stamps"]
+        stamps = np.array([_file_stamp(partials[i]) for i in order])
+    except (OSError, ValueError, KeyError):
+        return False
+
+    return np.array_equal(stored_steps, steps) and np.array_equal(stored_stamps, stamps)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# largest magnitude of the quantized displacements
+QUANTIZATION_LEVELS = np.iinfo(np.int16).max
+
+def export_archive(partials, steps, archive_file, supercell, species, nats):
+
+    """
+
+    Stores several .restart files as a compact, lossy archive.
+
+    # ARCHIVE FORMAT #
+
+    A single "[archive_file].npz" file, where the displacements of 
+    each snapshot are quantized into int16 values "q", so that
+    
+        displacements ~= offset + scale*q
+
+    with a different scale and offset for each snapshot, chosen so that
+    the whole int16 range covers its displacements. Strains are stored
+    as float32. This takes 2 bytes per displacement component, and the 
+    maximum error of each snapshot is stored along with the data.
+
+    Parameters:
+    ----------
+
+    - partials (list): names of the .restart files, in order.
+    - steps (list): MC step of each of the .restart files.
+    - archive_file (string): base name of the archive file.
+    - supercell (array): supercell shape (ie. [4,4,4])
+    - species (list): atomic species within the supercell in order
+    - nats (int): number of atoms per unit cell (ie. 5)
+
+    Return:
+    ----------
+        - the maximum quantization error of the archive, in Bohrs.
+
+    raises: ezSCUP.exceptions.NotEnoughPartials if no partials are given,
+    and ezSCUP.exceptions.GeometryNotMatching if any partial does not
+    match the given geometry.
+
+    """
+
+    npartials = len(partials)
+    if npartials == 0:
+        raise ezSCUP.exceptions.NotEnoughPartials()
+
+    # keep snapshots sorted by MC step
+    order = np.argsort(steps, kind="stable")
+    partials = [partials[i] for i in order]
+    steps = np.array(steps, dtype=np.int64)[order]
+
+    sc = np.array(supercell)
+    shape = (npartials, int(sc[0]), int(sc[1]), int(sc[2]), int(nats), 3)
+
+    quanta = np.zeros(shape, dtype=np.int16)
+    strains = np.zeros((npartials, 6), dtype=np.float32)
+    scales = np.ones(npartials)
+    offsets = np.zeros(npartials)
+    errors = np.zeros(npartials)
+
+    geom = Geometry(supercell, species, nats)
+    for i, p in enumerate(partials):
+
+        geom.load_restart(p, cache=False)
+        disps = geom.displacements
+        strains[i,:] = geom.strains
+
+        low, high = disps.min(), disps.max()
+        offsets[i] = (high + low)/2.
+        if high > low:
+            scales[i] = (high - low)/(2.*QUANTIZATION_LEVELS)
+
+        q = np.rint((disps - offsets[i])/scales[i])
+        quanta[i] = np.clip(q, -QUANTIZATION_LEVELS, QUANTIZATION_LEVELS)
+        errors[i] = np.abs(offsets[i] + scales[i]*quanta[i] - disps).max()
+
+    # write under a temporary name first, as in pack_trajectory()
+    temp = archive_file + ".{:d}.tmp.npz".format(os.getpid())
+    np.savez(temp, steps=steps, strains=strains, quanta=quanta, 
+        scales=scales, offsets=offsets, errors=errors, supercell=sc,
+        species=np.array(species), nats=np.array(nats))
+    os.replace(temp, archive_file + ".npz")
+
+    return errors.max()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def load_archive(archive_file):
+
+    """
+
+    Loads an archive previously stored with export_archive(),
+    restoring its displacements and strains as float64 arrays.
+
+    Parameters:
+    ----------
+
+    - archive_file (string): base name of the archive file.
+
+    Return:
+    ----------
+        - the stored Trajectory.
+        - the maximum quantization error of the displacements, in Bohrs.
+
+    """
+
+    with np.load(archive_file + ".npz") as info:
+        steps = info["steps"]
+        strains = info["strains"].astype(np.float64)
+        quanta = info["quanta"]
+        scales = info["scales"]
+        offsets = info["offsets"]
+        errors = info["errors"]
+        supercell = info["supercell"]
+        species = [str(s) for s in info["species"]]
+        nats = int(info["nats"])
+
+    # broadcast the scale and offset of each snapshot
+    bcast = (-1,) + (1,)*(quanta.ndim - 1)
+    disps = offsets.reshape(bcast) + scales.reshape(bcast)*quanta
+
+    traj = Trajectory(supercell, species, nats, steps, strains, disps)
+    max_error = errors.max() if errors.size > 0 else 0.
+
+    return traj, max_error
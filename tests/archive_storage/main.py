@@ -0,0 +1,116 @@
+"""
+
+Test script for the compact (int16) archives of ezSCUP.trajectory:
+
+- write synthetic .restart files for a small supercell, in shuffled 
+MC step order and including a snapshot with constant displacements
+- store them with export_archive() and read them back with load_archive()
+- check the steps, strains and geometry information of the round trip
+- check the error of every snapshot stays within half its quantization
+step, |err| <= scale/2, and matches the errors stored in the archive
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.trajectory import export_archive, load_archive
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [4,3,5]                             # supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+STEPS = [300, 100, 500, 200, 400]               # MC step of each partial
+
+ROUNDOFF = 1e-12                                # slack on the error bound
+
+RESTART_FILE = "archive_{:d}.restart"           # temporary restart files
+ARCHIVE_FILE = "archive_test"                   # temporary archive file
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, passed):
+
+    """ Reports a check, raising an error if it failed. """
+
+    print("{:>30}{:>10}".format(name, "OK" if passed else "FAILED"))
+    if not passed:
+        raise AssertionError(name + " failed")
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    species, nats = MODEL["species"], MODEL["nats"]
+    rng = np.random.default_rng(0)
+
+    # synthetic partials, the second one with constant displacements
+    geom = Geometry(SUPERCELL, species, nats)
+    partials = []
+    for i, step in enumerate(STEPS):
+        geom.strains = rng.normal(scale=1e-2, size=6)
+        if i == 1:
+            geom.displacements = np.full(geom.displacements.shape, 0.25)
+        else:
+            geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+        geom.write_restart(RESTART_FILE.format(i))
+        partials.append(RESTART_FILE.format(i))
+
+    max_error = export_archive(partials, STEPS, ARCHIVE_FILE, SUPERCELL, species, nats)
+    traj, loaded_error = load_archive(ARCHIVE_FILE)
+
+    with np.load(ARCHIVE_FILE + ".npz") as info:
+        scales = info["scales"]
+        errors = info["errors"]
+        quanta_dtype = info["quanta"].dtype
+
+    print("\n{:>30}{:>10}".format("Check", "result"))
+
+    check("int16 storage", quanta_dtype == np.int16)
+    check("geometry information", np.array_equal(traj.supercell, SUPERCELL)
+        and list(traj.species) == list(species) and traj.nats == nats)
+    check("sorted steps", np.array_equal(traj.steps, np.sort(STEPS)))
+    check("float64 displacements", traj.displacements.dtype == np.float64)
+
+    # reference snapshots, in MC step order
+    order = list(np.argsort(STEPS, kind="stable"))
+    deviations = []
+    for i, k in enumerate(order):
+        geom.load_restart(partials[k], cache=False)
+        check("strains of step {:d}".format(STEPS[k]), 
+            np.allclose(traj.strains[i], geom.strains, rtol=1e-6, atol=0.))
+        deviations.append(np.abs(traj.displacements[i] - geom.displacements).max())
+
+    deviations = np.array(deviations)
+    print("\n{:>10}{:>15}{:>15}".format("snapshot", "|err|", "scale/2"))
+    for i in range(len(deviations)):
+        print("{:>10d}{:15.3E}{:15.3E}".format(i, deviations[i], scales[i]/2.))
+
+    print("\n{:>30}{:>10}".format("Check", "result"))
+    check("error within scale/2", np.all(deviations <= scales/2. + ROUNDOFF))
+    check("stored errors", np.allclose(errors, deviations, rtol=0., atol=ROUNDOFF))
+    check("reported maximum error", np.isclose(max_error, deviations.max(), rtol=0., atol=ROUNDOFF)
+        and max_error == loaded_error)
+    check("constant snapshot is exact", deviations[order.index(1)] == 0.)
+
+    for p in partials:
+        os.remove(p)
+    os.remove(ARCHIVE_FILE + ".npz")
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,114 @@
+"""
+
+Test script for the local polarization functions of ezSCUP.polarization:
+
+- block_polarization() with [1,1,1] blocks (per-cell polarization),
+checking its average matches polarization()
+- layered_polarization() and column_polarization() along every axis of
+a non-cubic supercell, checking they are the means of the per-cell 
+polarization over the right axes
+- block_polarization() with larger blocks, checked the same way
+- blocks that do not tile the supercell, which must raise ValueError
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.polarization import polarization, block_polarization
+from ezSCUP.polarization import layered_polarization, column_polarization
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [4,3,2]                             # non-cubic supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+
+BLOCKS = [[2,3,1], [4,1,2], [2,1,1]]            # blocks that tile the supercell
+BAD_BLOCKS = [[3,3,2], [4,2,2], [0,1,1]]        # blocks that do not
+
+RTOL = 1e-12                                    # relative tolerance
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, result, reference):
+
+    """ Checks the relative deviation of a result. """
+
+    result = np.asarray(result)
+    reference = np.asarray(reference)
+
+    if result.shape != reference.shape:
+        raise AssertionError(name + " has the wrong shape")
+
+    deviation = np.abs(result - reference).max()/np.abs(reference).max()
+
+    print("{:>30}{:15.3E}".format(name, deviation))
+    if not deviation < RTOL:
+        raise AssertionError(name + " does not match its reference")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def block_means(cells, block):
+
+    """ Mean of the per-cell polarization over each block. """
+
+    sc = np.array(cells.shape[:3])
+    nblocks = sc//np.array(block)
+    shaped = cells.reshape(nblocks[0], block[0], nblocks[1], block[1], nblocks[2], block[2], 3)
+
+    return shaped.mean(axis=(1,3,5))
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+    charges = MODEL["born_charges"]
+
+    geom = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    geom.lat_constants = np.array([7.30, 7.35, 7.40])
+    geom.strains = rng.normal(scale=1e-2, size=6)
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+
+    print("\n{:>30}{:>15}".format("Quantity", "deviation"))
+
+    cells = block_polarization(geom, charges, [1,1,1])
+    check("cell average", np.mean(cells, axis=(0,1,2)), polarization(geom, charges))
+
+    for axis, name in enumerate("xyz"):
+        others = tuple(a for a in range(3) if a != axis)
+        check("layers normal to " + name, layered_polarization(geom, charges, axis=axis),
+            np.mean(cells, axis=others))
+        check("columns along " + name, column_polarization(geom, charges, axis=axis),
+            np.mean(cells, axis=axis))
+
+    for block in BLOCKS:
+        check("blocks " + str(block), block_polarization(geom, charges, block),
+            block_means(cells, block))
+
+    print("\n{:>30}{:>15}".format("Block", "result"))
+    for block in BAD_BLOCKS:
+        try:
+            block_polarization(geom, charges, block)
+        except ValueError:
+            print("{:>30}{:>15}".format(str(block), "rejected"))
+            continue
+        raise AssertionError("block " + str(block) + " was not rejected")
+
+    print("\nEVERYTHING DONE!")
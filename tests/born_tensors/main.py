@@ -0,0 +1,122 @@
+"""
+
+Test script for Born charge tensors in the polarization functions:
+
+- give every atom an anisotropic, non-symmetric 3x3 Born tensor
+- compare the per-cell polarization (STO_POL) with a cell-by-cell
+reference loop contracting the full tensors, P_i = sum_j Z_ij u_j
+- check its supercell average against polarization()
+- check that charges given as vectors match their diagonal tensors
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.polarization import polarization, unit_conversion
+from ezSCUP.srtio3.modes import STO_POL
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [4,3,5]                             # supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+
+RTOL = 1e-12                                    # relative tolerance
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, result, reference):
+
+    """ Checks the relative deviation of a result. """
+
+    result = np.asarray(result)
+    reference = np.asarray(reference)
+
+    if result.shape != reference.shape:
+        raise AssertionError(name + " has the wrong shape")
+
+    deviation = np.abs(result - reference).max()/np.abs(reference).max()
+
+    print("{:>25}{:15.3E}".format(name, deviation))
+    if not deviation < RTOL:
+        raise AssertionError(name + " does not match its reference")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def reference_pol(geom, model):
+
+    """ Cell-by-cell polarization with the full Born tensors. """
+
+    A, B, Ox, Oy, Oz = model["labels"]
+
+    FE_mode=[  # atom, hopping, weight
+        [A, [0, 0, 0], 1./8.], [A, [1, 0, 0], 1./8.],
+        [A, [1, 1, 0], 1./8.], [A, [0, 1, 0], 1./8.],
+        [A, [0, 0, 1], 1./8.], [A, [1, 0, 1], 1./8.],
+        [A, [1, 1, 1], 1./8.], [A, [0, 1, 1], 1./8.],
+        [B, [0, 0, 0], 1.],
+        [Ox, [0, 0, 0], 1./2.], [Ox, [1, 0, 0], 1./2.],
+        [Oy, [0, 0, 0], 1./2.], [Oy, [0, 1, 0], 1./2.],
+        [Oz, [0, 0, 0], 1./2.], [Oz, [0, 0, 1], 1./2.]
+    ]
+
+    cnts = geom.lat_constants
+    stra = geom.strains
+    ucell_volume = (cnts[0]*(1+stra[0]))*(cnts[1]*(1+stra[1]))*(cnts[2]*(1+stra[2]))
+
+    pols = np.zeros(tuple(geom.supercell) + (3,))
+    for cell in np.ndindex(*geom.supercell):
+        for label, hop, weight in FE_mode:
+            n = tuple(np.mod(np.array(cell) + hop, geom.supercell))
+            Z = np.array(model["born_charges"][label], dtype=np.float64)
+            pols[cell] += weight*(Z @ geom.displacements[n + (label,)])
+
+    return unit_conversion(pols/ucell_volume)
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+
+    # anisotropic, non-symmetric Born tensors
+    tensors = dict(MODEL)
+    tensors["born_charges"] = {l: np.diag(c) + rng.normal(scale=0.5, size=(3,3))
+        for l, c in MODEL["born_charges"].items()}
+
+    geom = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    geom.lat_constants = np.array([7.30, 7.35, 7.40])
+    geom.strains = rng.normal(scale=1e-2, size=6)
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+
+    print("\n{:>25}{:>15}".format("Quantity", "deviation"))
+
+    local = STO_POL(geom, tensors)
+    check("tensor local pol.", local, reference_pol(geom, tensors))
+
+    check("tensor average pol.", np.mean(local, axis=(0,1,2)),
+        polarization(geom, tensors["born_charges"]))
+
+    # vectors are the diagonal of the tensor
+    diagonal = dict(MODEL)
+    diagonal["born_charges"] = {l: np.diag(c) for l, c in MODEL["born_charges"].items()}
+    if not np.array_equal(STO_POL(geom, MODEL), STO_POL(geom, diagonal)):
+        raise AssertionError("vector charges do not match their diagonal tensors")
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,112 @@
+"""
+
+Test script for the compact (float32) storage mode of Geometry:
+
+- write synthetic .restart/.REF files for a small supercell
+- load them both as float64 and float32 geometries
+- compare displacements, equilibrium averages, mode projections
+and polarizations of both, checking the deviation stays bounded
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.polarization import polarization
+from ezSCUP.srtio3.modes import STO_ROT, STO_AFD, STO_FE, STO_POL
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [6,6,6]                             # supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+NPARTIALS = 10                                  # partials to average
+
+RTOL = 1e-6                                     # relative tolerance
+
+RESTART_FILE = "float32_{:d}.restart"           # temporary restart files
+REFERENCE_FILE = "float32.REF"                  # temporary reference file
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, single, double):
+
+    """ Checks the relative deviation of a float32 result. """
+
+    single = np.asarray(single)
+    double = np.asarray(double)
+
+    scale = np.abs(double).max()
+    deviation = np.abs(single - double).max()/scale
+
+    print("{:>25}{:15.3E}".format(name, deviation))
+    if not deviation < RTOL:
+        raise AssertionError(name + " deviates too much in float32 mode")
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    species, nats = MODEL["species"], MODEL["nats"]
+    rng = np.random.default_rng(0)
+
+    # synthetic geometries
+    geom = Geometry(SUPERCELL, species, nats)
+    geom.lat_vectors = np.ravel(np.array(MODEL["lat_vectors"])*np.array(SUPERCELL)[:,None])
+    geom.positions = rng.uniform(0., 50., size=geom.displacements.shape)
+    geom.write_reference(REFERENCE_FILE)
+
+    partials = []
+    for i in range(NPARTIALS):
+        geom.strains = rng.normal(scale=1e-2, size=6)
+        geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+        geom.write_restart(RESTART_FILE.format(i))
+        partials.append(RESTART_FILE.format(i))
+
+    double = Geometry(SUPERCELL, species, nats)
+    single = Geometry(SUPERCELL, species, nats, dtype=np.float32)
+
+    for g in [double, single]:
+        g.load_reference(REFERENCE_FILE)
+        g.load_restart(partials[0])
+
+    if single.displacements.dtype != np.float32 or single.positions.dtype != np.float32:
+        raise AssertionError("float32 geometry arrays are not float32")
+
+    print("\n{:>25}{:>15}".format("Quantity", "deviation"))
+
+    check("displacements", single.displacements, double.displacements)
+    check("positions", single.positions, double.positions)
+    check("polarization", polarization(single, MODEL["born_charges"]),
+        polarization(double, MODEL["born_charges"]))
+    check("rotations", STO_ROT(single, MODEL), STO_ROT(double, MODEL))
+    check("AFD", STO_AFD(single, MODEL), STO_AFD(double, MODEL))
+    check("FE", STO_FE(single, MODEL), STO_FE(double, MODEL))
+    check("local polarization", STO_POL(single, MODEL), STO_POL(double, MODEL))
+
+    for g in [double, single]:
+        g.load_equilibrium_displacements(partials)
+
+    check("equilibrium", single.displacements, double.displacements)
+    check("variance", single.disp_variance, double.disp_variance)
+
+    for p in partials:
+        os.remove(p)
+    os.remove(REFERENCE_FILE)
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,116 @@
+"""
+
+Test script for the fluctuation analysis of ezSCUP.fluctuations:
+
+- generate (seeded) AR(1) time series, x_t = phi x_{t-1} + e_t with unit 
+Gaussian noise e_t, with one column per value of phi, whose exact 
+autocorrelation function, autocorrelation time and variance are 
+
+    rho(k) = phi^k,    tau = (1+phi)/(2(1-phi)),    var = 1/(1-phi^2)
+
+- compare autocorrelation() with phi^k over the first lags
+- compare autocorrelation_time() with tau, within the statistical
+error of Sokal's estimate, tau*sqrt(2(2M+1)/N) with M = window*tau
+- compare susceptibility() with the variance, within a few of its
+own error bars, and check the volume and temperature factor
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.fluctuations import autocorrelation, autocorrelation_time, susceptibility
+from ezSCUP.fluctuations import EPS0, KB, BOHR
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+PHIS = np.array([0., 0.5, 0.9])                 # AR(1) coefficient of each column
+NSTEPS = 2**18                                  # length of the series
+WINDOW = 5.                                     # autocorrelation window factor
+
+NLAGS = 5                                       # lags of the ACF to compare
+NSIGMA = 4.                                     # error bars allowed
+
+VOLUME = 1000.                                  # supercell volume (bohr^3)
+TEMPERATURE = 300.                              # temperature (K)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, result, reference, error):
+
+    """ Checks a result is within NSIGMA error bars of its reference. """
+
+    deviation = np.abs(result - reference)/error
+
+    for i, phi in enumerate(PHIS):
+        print("{:>25}{:10.2f}{:15.5f}{:15.5f}{:10.2f}".format(
+            name, phi, result[i], reference[i], deviation[i]))
+
+    if not np.all(deviation < NSIGMA):
+        raise AssertionError(name + " does not match its reference")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def ar1_series(rng):
+
+    """ Stationary AR(1) series, one column per value of phi. """
+
+    noise = rng.normal(size=(NSTEPS, len(PHIS)))
+
+    series = np.empty_like(noise)
+    series[0] = noise[0]/np.sqrt(1. - PHIS**2)
+    for t in range(1, NSTEPS):
+        series[t] = PHIS*series[t-1] + noise[t]
+
+    return series
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+    series = ar1_series(rng)
+
+    print("\n{:>25}{:>10}{:>15}{:>15}{:>10}".format("Quantity", "phi", "result", "exact", "sigmas"))
+
+    # autocorrelation function, error ~ sqrt((1+phi^2)/(1-phi^2)/N)
+    acf = autocorrelation(series)
+    if not np.allclose(acf[0], 1.):
+        raise AssertionError("autocorrelation at lag zero is not one")
+    acf_error = np.sqrt((1. + PHIS**2)/(1. - PHIS**2)/NSTEPS)
+    for k in range(1, NLAGS + 1):
+        check("ACF at lag {:d}".format(k), acf[k], PHIS**k, acf_error)
+
+    # integrated autocorrelation time
+    exact_tau = (1. + PHIS)/(2.*(1. - PHIS))
+    tau = autocorrelation_time(series, window=WINDOW)
+    tau_error = exact_tau*np.sqrt(2.*(2.*WINDOW*exact_tau + 1.)/NSTEPS)
+    check("autocorrelation time", tau, exact_tau, tau_error)
+
+    # variance and its error bar
+    exact_var = 1./(1. - PHIS**2)
+    variance, error = susceptibility(series, window=WINDOW)
+    check("variance", variance, exact_var, error)
+
+    # susceptibility factor
+    chi, chi_error = susceptibility(series, volume=VOLUME, temperature=TEMPERATURE, window=WINDOW)
+    factor = VOLUME*BOHR**3/(EPS0*KB*TEMPERATURE)
+    if not np.allclose(chi, factor*variance, rtol=1e-12) or not np.allclose(chi_error, factor*error, rtol=1e-12):
+        raise AssertionError("susceptibility factor is wrong")
+    print("{:>25}{:>10}".format("susceptibility factor", "OK"))
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,104 @@
+"""
+
+Test script for the parsing of forces and stress in single point
+SCALE-UP outputs (see ezSCUP.singlepoint.SPRun):
+
+- sample.out is a synthetic excerpt laid out as assumed by the 
+SP_FORCES_SEARCH_WORD and SP_STRESS_SEARCH_WORD settings, it is 
+not the verbatim output of a SCALE-UP run.
+- read its force and stress blocks
+- check that lines merely starting with the search words (ie. a 3x3 
+"Stress tensor (GPa):" block) and truncated, blank or non-numeric blocks
+are skipped, so that energy-only single points still work
+- check that the forces are only required where they are used 
+(ezSCUP.normodes), which raises MissingForces if they were skipped
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.singlepoint import _read_block
+from ezSCUP.normodes import _forces
+import ezSCUP.settings as cfg
+import ezSCUP.exceptions
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample.out")
+NATS = 5                                        # atoms in the sample
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def skips(name, lines, word, nrows, ncols):
+
+    """ Checks that a malformed block is skipped. """
+
+    if _read_block(lines, word, nrows, ncols) is not None:
+        raise AssertionError(name + " was not skipped")
+
+    print("{:>30}{:>10}".format(name, "skipped"))
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    with open(SAMPLE_FILE) as f:
+        lines = f.readlines()
+
+    forces = _read_block(lines, cfg.SP_FORCES_SEARCH_WORD, NATS, 3)
+    expected = np.array([
+        [ 0.01, -0.02,  0.03],
+        [-0.04,  0.05, -0.06],
+        [ 0.07, -0.08,  0.09],
+        [-0.10,  0.11, -0.12],
+        [ 0.13, -0.14,  0.15]
+    ])
+    if forces.shape != (NATS, 3) or not np.allclose(forces, expected):
+        raise AssertionError("forces not read properly")
+    print("{:>30}{:>10}".format("forces", "ok"))
+
+    stress = _read_block(lines, cfg.SP_STRESS_SEARCH_WORD, 1, 6)
+    if stress.shape != (1, 6) or not np.allclose(stress[0], 0.1*np.arange(1, 7)):
+        raise AssertionError("stress not read properly")
+    print("{:>30}{:>10}".format("stress", "ok"))
+
+    if _read_block(lines, "Magnetization", 1, 3) is not None:
+        raise AssertionError("missing block not skipped")
+    print("{:>30}{:>10}".format("missing block", "skipped"))
+
+    start = [i for i, l in enumerate(lines) if l.strip().startswith("Forces (")][0]
+    block = lines[start:start + NATS + 1]
+
+    word = cfg.SP_FORCES_SEARCH_WORD
+    skips("truncated block", block[:-2], word, NATS, 3)
+    skips("blank separator", block[:3] + ["\n"] + block[3:], word, NATS, 3)
+    skips("non-numeric block", [block[0]] + [l.replace("E-0", "X-0") for l in block[1:]], word, NATS, 3)
+    skips("header only", ["Forces (eV/Ang):\n", "\n"], word, NATS, 3)
+    skips("other header", ["Forces will be printed\n"] + block[1:], word, NATS, 3)
+
+    tensor = ["Stress tensor (GPa):\n", "  0.1  0.6  0.5\n", "  0.6  0.2  0.4\n", "  0.5  0.4  0.3\n"]
+    skips("stress tensor", tensor, cfg.SP_STRESS_SEARCH_WORD, 1, 6)
+
+    try:
+        _forces({"total_delta": 0.})
+    except ezSCUP.exceptions.MissingForces:
+        print("{:>30}{:>10}".format("forces needed", "raised"))
+    else:
+        raise AssertionError("missing forces were not reported")
+
+    print("\nEVERYTHING DONE!")
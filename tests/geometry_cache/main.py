@@ -0,0 +1,189 @@
+"""
+
+Test script for the binary (.npy) copies of geometry files kept by
+Geometry when caching is enabled (see ezSCUP.geometry.cache_file()),
+and for the lazy loading and probe() paths:
+
+- a first load (cache miss) writes the binary copy, holding the size
+and modification time stamp of the text file
+- a second load (cache hit) reads the copy instead of the text
+- changing the loaded arrays leaves the copy untouched (copy-on-write)
+- rewriting the text file makes the copy stale, so it is parsed again
+and the copy is rewritten
+- lazy loads read the header now and the atomic block on first access
+- probe() reads the header of .restart and .REF files
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry, cache_file, probe
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [4,3,2]                             # supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+
+RESTART_FILE = "cache.restart"                  # temporary restart file
+REFERENCE_FILE = "cache.REF"                    # temporary reference file
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, passed):
+
+    """ Reports a check, raising an error if it failed. """
+
+    print("{:>40}{:>10}".format(name, "OK" if passed else "FAILED"))
+    if not passed:
+        raise AssertionError(name + " failed")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def new_geometry(dtype=np.float64):
+
+    """ Empty geometry of the tested supercell. """
+
+    return Geometry(SUPERCELL, MODEL["species"], MODEL["nats"], dtype=dtype)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def file_bytes(fname):
+
+    """ Whole content of a file. """
+
+    with open(fname, "rb") as f:
+        return f.read()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def stamp(fname):
+
+    """ Size and modification time row expected in the binary copy. """
+
+    stat = os.stat(fname)
+    return np.array([stat.st_size, stat.st_mtime, 0.])
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+    cached = cache_file(RESTART_FILE)
+
+    geom = new_geometry()
+    geom.strains = rng.normal(scale=1e-2, size=6)
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+    geom.write_restart(RESTART_FILE)
+
+    text = new_geometry()
+    text.load_restart(RESTART_FILE, cache=False)
+
+    print("\n{:>40}{:>10}".format("Check", "result"))
+
+    # cache miss
+    check("no copy without caching", not os.path.exists(cached))
+    miss = new_geometry()
+    miss.load_restart(RESTART_FILE, cache=True)
+    check("miss writes the copy", os.path.exists(cached))
+    check("miss matches the text", np.array_equal(miss.displacements, text.displacements))
+
+    copy = np.load(cached)
+    check("copy stamp row", np.array_equal(copy[0], stamp(RESTART_FILE)))
+    check("copy coordinates", np.array_equal(copy[1:], np.reshape(text.displacements, (-1, 3))))
+
+    # cache hit: a marked copy with a valid stamp is served as is
+    marked = copy.copy()
+    marked[1:] += 1.
+    np.save(cached, marked)
+    hit = new_geometry()
+    hit.load_restart(RESTART_FILE, cache=True)
+    check("hit reads the copy", np.array_equal(hit.displacements, text.displacements + 1.))
+    check("hit keeps the text strains", np.array_equal(hit.strains, text.strains))
+    np.save(cached, copy)
+
+    single = new_geometry(np.float32)
+    single.load_restart(RESTART_FILE, cache=True)
+    check("float32 hit", single.displacements.dtype == np.float32 
+        and np.array_equal(single.displacements, text.displacements.astype(np.float32)))
+
+    # copy-on-write
+    before = file_bytes(cached)
+    hit = new_geometry()
+    hit.load_restart(RESTART_FILE, cache=True)
+    hit.displacements[...] = 0.
+    del hit
+    check("copy-on-write", file_bytes(cached) == before)
+    hit = new_geometry()
+    hit.load_restart(RESTART_FILE, cache=True)
+    check("copy-on-write reload", np.array_equal(hit.displacements, text.displacements))
+    del hit
+
+    # stale copy, after rewriting the text file
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+    geom.write_restart(RESTART_FILE)
+    mtime = os.stat(cached).st_mtime_ns
+    os.utime(RESTART_FILE, ns=(mtime + 10**9, mtime + 10**9))
+
+    text.load_restart(RESTART_FILE, cache=False)
+    stale = new_geometry()
+    stale.load_restart(RESTART_FILE, cache=True)
+    check("stale copy is not served", np.array_equal(stale.displacements, text.displacements)
+        and not np.array_equal(stale.displacements, miss.displacements))
+    check("stale copy is rewritten", np.array_equal(np.load(cached)[0], stamp(RESTART_FILE)))
+
+    # lazy loads
+    lazy = new_geometry()
+    lazy.load_restart(RESTART_FILE, cache=True, lazy=True)
+    check("lazy reads the strains now", np.array_equal(lazy.strains, text.strains))
+    check("lazy defers the atoms", "displacements" in lazy._pending)
+    check("lazy atoms on access", np.array_equal(lazy.displacements, text.displacements)
+        and not lazy._pending)
+
+    lazy.load_restart(RESTART_FILE, cache=False, lazy=True)
+    lazy.displacements = np.zeros_like(text.displacements)
+    check("assignment drops the pending load", not lazy._pending
+        and not np.any(lazy.displacements))
+
+    # probe
+    geom.lat_vectors = np.ravel(np.array(MODEL["lat_vectors"])*np.array(SUPERCELL)[:,None])
+    geom.positions = rng.uniform(0., 20., size=geom.displacements.shape)
+    geom.write_reference(REFERENCE_FILE)
+
+    header = probe(RESTART_FILE)
+    check("probe .restart", np.array_equal(header["supercell"], SUPERCELL)
+        and header["nats"] == MODEL["nats"] and header["species"] == list(MODEL["species"])
+        and np.array_equal(header["strains"], text.strains) and "lat_vectors" not in header)
+
+    header = probe(REFERENCE_FILE)
+    reference = new_geometry()
+    reference.load_reference(REFERENCE_FILE, cache=False)
+    check("probe .REF", np.array_equal(header["lat_vectors"], reference.lat_vectors)
+        and "strains" not in header)
+
+    lazy = new_geometry()
+    lazy.load_reference(REFERENCE_FILE, cache=True, lazy=True)
+    check("lazy reference", "positions" in lazy._pending 
+        and np.array_equal(lazy.positions, reference.positions)
+        and os.path.exists(cache_file(REFERENCE_FILE)))
+
+    for fname in [RESTART_FILE, REFERENCE_FILE]:
+        os.remove(fname)
+        os.remove(cache_file(fname))
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,199 @@
+"""
+
+Test script for the finite difference Hessian planner of ezSCUP.normodes:
+
+- build a synthetic energy, a pair potential over the periodic images of
+the unit cell of a model, which keeps the point group of the cell
+- fill the single point memo of finite_hessian() with that energy, so 
+that no SCALE-UP runs are needed
+- compare the Hessian with the upper-triangle, memo and symmetry
+reductions of hessian_plan() with the one of a full run, evaluating
+every entry (p1, p2) with its own second difference
+- check the point group operators are not duplicated, and that the 
+reductions actually save runs
+- check an unknown method raises a ValueError naming the accepted ones
+
+The comparison is done around the cubic reference structure and around
+a polar (tetragonal) geometry.
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys, itertools
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.normodes import finite_hessian, hessian_plan, point_group, displacement_key, _operators
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+MODEL = STO_JPCM2013                            # model to test with
+DISP = 1e-3                                     # finite difference step (bohr)
+
+CUTOFF = 12.                                    # pair potential cutoff (bohr)
+DECAY = 4.                                      # pair potential decay (bohr)
+POLAR = 0.05                                    # polar displacement (bohr)
+
+RTOL = 1e-6                                     # relative tolerance
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, result, reference):
+
+    """ Checks the relative deviation of a result. """
+
+    deviation = np.abs(result - reference).max()/np.abs(reference).max()
+
+    print("{:>35}{:15.3E}".format(name, deviation))
+    if not deviation < RTOL:
+        raise AssertionError(name + " does not match its reference")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def pair_energy(model):
+
+    """ 
+    
+    Synthetic energy of the displacements of the unit cell: an 
+    exponential pair potential between every atom and the periodic 
+    images of the others, within a spherical cutoff around the reference 
+    structure, so that it keeps the point group of the cell.
+    
+    """
+
+    nats = len(model["ref_struct"])
+    lat = np.array(model["lat_vectors"], dtype=np.float64)
+    positions = np.array([model["ref_struct"][a] for a in range(nats)], dtype=np.float64)
+    masses = np.array(model["masses"], dtype=np.float64)
+
+    pairs = []
+    for a, b in itertools.combinations_with_replacement(range(nats), 2):
+        for n in itertools.product(range(-3, 4), repeat=3):
+            shift = np.array(n) @ lat
+            r = positions[b] + shift - positions[a]
+            if a != b and np.linalg.norm(r) < CUTOFF:
+                # strength depends on the species only
+                pairs.append((a, b, r, np.sqrt(masses[a]*masses[b])/50.))
+
+    def energy(u):
+        u = u.reshape(nats, 3)
+        return sum(k*np.exp(-np.linalg.norm(r + u[b] - u[a])/DECAY) for a, b, r, k in pairs)
+
+    return energy
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def fill_memo(memo, geom, energy, displacements):
+
+    """ Single point memo (see finite_hessian()) with the synthetic energy. """
+
+    base = np.array(geom.displacements[0,0,0], dtype=np.float64).ravel()
+    for d in displacements:
+        key = displacement_key(d)
+        if key not in memo:
+            u = base.copy()
+            for p, delta in key:
+                u[p] += delta
+            memo[key] = {"total_delta": energy(u)}
+
+    return memo
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def full_hessian(geom, energy):
+
+    """ Every entry of the Hessian with its own second difference. """
+
+    ndim = 3*geom.nats
+    E = lambda d: fill_memo({}, geom, energy, [d])[displacement_key(d)]["total_delta"]
+
+    hessian = np.zeros((ndim, ndim))
+    for p1, p2 in itertools.product(range(ndim), repeat=2):
+        if p1 == p2:
+            hessian[p1,p2] = (E(((p1, DISP),)) + E(((p1, -DISP),)) - 2*E(()))/DISP**2
+        else:
+            hessian[p1,p2] = (E(((p1, DISP), (p2, DISP))) - E(((p1, DISP), (p2, -DISP)))
+                - E(((p1, -DISP), (p2, DISP))) + E(((p1, -DISP), (p2, -DISP))))/(4*DISP**2)
+
+    return hessian
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def planned(geom, ops):
+
+    """ Displaced geometries planned by hessian_plan(). """
+
+    plan = hessian_plan(geom.nats, DISP, ops=ops)
+    return [d for _, _, ds, _ in plan for d in ds]
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    energy = pair_energy(MODEL)
+    ndim = 3*MODEL["nats"]
+
+    polar = np.zeros((MODEL["nats"], 3))
+    polar[:,2] = POLAR*np.array([1., 1., -1., -1., -1.])
+
+    # runs of a full Hessian, without any reduction
+    full_runs = 3*ndim + 4*ndim*(ndim - 1)
+
+    print("\n{:>35}{:>15}".format("Quantity", "deviation"))
+
+    for label, disps in [("cubic", np.zeros_like(polar)), ("polar", polar)]:
+
+        geom = Geometry([1,1,1], MODEL["species"], MODEL["nats"])
+        geom.displacements = disps.reshape(geom.displacements.shape)
+
+        ops = point_group(MODEL, geom)
+        if len(_operators(geom.nats, ops)) != len(ops):
+            raise AssertionError("duplicated " + label + " point group operators")
+
+        full = full_hessian(geom, energy)
+
+        # upper triangle and memo
+        memo = fill_memo({}, geom, energy, planned(geom, None))
+        runs = len(memo)
+        hessian = finite_hessian(geom, None, disp=DISP, cache=memo)
+        if len(memo) != runs:
+            raise AssertionError("planned runs missing from the memo")
+        check(label + " upper triangle", hessian, full)
+
+        # symmetry reduction
+        memo = fill_memo({}, geom, energy, planned(geom, ops))
+        sym_runs = len(memo)
+        hessian = finite_hessian(geom, None, disp=DISP, model=MODEL, cache=memo)
+        if len(memo) != sym_runs:
+            raise AssertionError("planned runs missing from the memo")
+        check(label + " symmetry ({:d} ops)".format(len(ops)), hessian, full)
+
+        print("{:>35}{:>15}".format(label + " runs (full/plan/sym)", 
+            "{:d}/{:d}/{:d}".format(full_runs, runs, sym_runs)))
+        if not sym_runs < runs < full_runs:
+            raise AssertionError("the " + label + " plan does not save runs")
+
+    try:
+        finite_hessian(geom, None, disp=DISP, cache={}, method="energies")
+    except ValueError as error:
+        if "'energy'" not in str(error) or "'forces'" not in str(error):
+            raise AssertionError("the error does not name the accepted methods")
+    else:
+        raise AssertionError("an unknown method does not raise a ValueError")
+    print("{:>35}{:>15}".format("unknown method", "ValueError"))
+
+    print("\nEVERYTHING DONE!")
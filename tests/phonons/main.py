@@ -0,0 +1,213 @@
+"""
+
+Test script for the supercell force constants and phonons of ezSCUP.normodes:
+
+- build a synthetic crystal, a pair potential between the atoms of the 
+reference structure of a model and all their periodic images, with 
+analytic forces
+- fill the single point memo of supercell_force_constants() and 
+finite_hessian() with those forces, so that no SCALE-UP runs are needed
+- check the phonons at the q-points commensurate with a 2x2x2 supercell
+match the normal modes of the whole 2x2x2 supercell Hessian
+- check the dynamical matrix at Gamma matches the unit cell Hessian
+- check the acoustic modes vanish at Gamma
+- check q-points related by the cubic symmetry have the same phonons
+- check get_normal_modes() returns orthonormal, mass-weighted eigenvectors
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys, itertools
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.normodes import supercell_force_constants, dynamical_matrices, phonons
+from ezSCUP.normodes import finite_hessian, get_normal_modes, displacement_key
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+MODEL = STO_JPCM2013                            # model to test with
+SUPERCELL = (2,2,2)                             # supercell of the force constants
+DISP = 1e-3                                     # finite difference step (bohr)
+
+CUTOFF = 12.                                    # pair potential cutoff (bohr)
+DECAY = 4.                                      # pair potential decay (bohr)
+
+QPOINT = np.array([0.1, 0.2, 0.3])              # generic q-point
+RTOL = 1e-8                                     # relative tolerance
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, result, reference):
+
+    """ Checks the relative deviation of a result. """
+
+    result = np.asarray(result)
+    reference = np.asarray(reference)
+
+    if result.shape != reference.shape:
+        raise AssertionError(name + " has the wrong shape")
+
+    deviation = np.abs(result - reference).max()/np.abs(reference).max()
+
+    print("{:>35}{:15.3E}".format(name, deviation))
+    if not deviation < RTOL:
+        raise AssertionError(name + " does not match its reference")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def pair_forces(model, supercell):
+
+    """ 
+    
+    Analytic forces of the synthetic crystal, periodic over the given
+    supercell: an exponential pair potential between every atom and
+    all the other atoms of the crystal within a spherical cutoff around
+    the reference structure, whose strength depends on the species only.
+    Returns a function of the (sx, sy, sz, nats, 3) displacements.
+    
+    """
+
+    nats = len(model["ref_struct"])
+    lat = np.array(model["lat_vectors"], dtype=np.float64)
+    positions = np.array([model["ref_struct"][a] for a in range(nats)], dtype=np.float64)
+    masses = np.array(model["masses"], dtype=np.float64)
+
+    sc = np.array(supercell)
+    cells = np.indices(supercell).reshape(3, -1).T
+    reach = int(np.ceil(2*CUTOFF/np.linalg.norm(lat, axis=1).min()))
+
+    first, second, vectors, strengths = [], [], [], []
+    for a, b in itertools.product(range(nats), repeat=2):
+        for n in itertools.product(range(-reach, reach + 1), repeat=3):
+            r = positions[b] + np.array(n) @ lat - positions[a]
+            if not 0. < np.linalg.norm(r) < CUTOFF:
+                continue
+            neighbours = np.ravel_multi_index(tuple(np.mod(cells + n, sc).T), supercell)
+            first.append(np.arange(len(cells))*nats + a)
+            second.append(neighbours*nats + b)
+            vectors.append(np.tile(r, (len(cells), 1)))
+            strengths.append(np.full(len(cells), np.sqrt(masses[a]*masses[b])/50.))
+
+    first, second = np.concatenate(first), np.concatenate(second)
+    vectors, strengths = np.concatenate(vectors), np.concatenate(strengths)
+
+    def forces(displacements):
+
+        u = np.reshape(displacements, (-1, 3))
+        d = vectors + u[second] - u[first]
+        dist = np.linalg.norm(d, axis=1)
+
+        # every pair is counted twice, hence the 1/2
+        grad = 0.5*(-strengths/DECAY*np.exp(-dist/DECAY)/dist)[:,None]*d
+
+        F = np.zeros_like(u)
+        np.add.at(F, second, -grad)
+        np.add.at(F, first, grad)
+
+        return F
+
+    return forces
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def fill_memo(geom, forces):
+
+    """ Single point memo of the first cell displacements, see finite_hessian(). """
+
+    memo = {}
+    for p, delta in itertools.product(range(3*geom.nats), [DISP, -DISP]):
+        u = np.array(geom.displacements, dtype=np.float64)
+        u[0,0,0,p//3,p%3] += delta
+        memo[displacement_key(((p, delta),))] = {"forces": forces(u)}
+
+    return memo
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def supercell_hessian(geom, forces):
+
+    """ Hessian of the whole supercell, displacing every atom. """
+
+    u0 = np.array(geom.displacements, dtype=np.float64).ravel()
+    ndim = u0.size
+
+    hessian = np.zeros((ndim, ndim))
+    for k in range(ndim):
+        up, down = u0.copy(), u0.copy()
+        up[k] += DISP
+        down[k] -= DISP
+        hessian[:,k] = -(forces(up) - forces(down)).ravel()/(2*DISP)
+
+    return (hessian + hessian.T)/2.
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    nats = MODEL["nats"]
+    masses = np.array(MODEL["masses"], dtype=np.float64)
+    lat = np.array(MODEL["lat_vectors"], dtype=np.float64)
+    positions = np.array([MODEL["ref_struct"][a] for a in range(nats)])
+
+    print("\n{:>35}{:>15}".format("Quantity", "deviation"))
+
+    # supercell force constants
+    sgeom = Geometry(SUPERCELL, MODEL["species"], nats)
+    forces = pair_forces(MODEL, SUPERCELL)
+    fc = supercell_force_constants(sgeom, None, supercell=SUPERCELL, disp=DISP,
+        cache=fill_memo(sgeom, forces))
+
+    # commensurate q-points against the whole supercell
+    commensurate = np.array(list(itertools.product(*[np.arange(n)/n for n in SUPERCELL])))
+    freqs, _ = phonons(fc, masses, commensurate, lat_vectors=lat, positions=positions)
+
+    sc_masses = np.tile(masses, int(np.prod(SUPERCELL)))
+    sc_freqs, _ = get_normal_modes(sc_masses, supercell_hessian(sgeom, forces))
+    check("commensurate q vs supercell", np.sort(freqs.ravel()), sc_freqs)
+
+    # Gamma against the unit cell Hessian
+    ugeom = Geometry([1,1,1], MODEL["species"], nats)
+    hessian = finite_hessian(ugeom, None, disp=DISP, method="forces",
+        cache=fill_memo(ugeom, pair_forces(MODEL, (1,1,1))))
+
+    weight = 1./np.sqrt(np.repeat(masses, 3))
+    gamma = dynamical_matrices(fc, masses, [[0.,0.,0.]], lat_vectors=lat, positions=positions)[0]
+    check("Gamma vs unit cell", gamma, hessian*weight[:,None]*weight[None,:])
+
+    # acoustic sum rule
+    gamma_freqs = np.linalg.eigvalsh(gamma)
+    acoustic = np.sort(np.abs(gamma_freqs))[:3]
+    print("{:>35}{:15.3E}".format("acoustic modes at Gamma", acoustic.max()/np.abs(gamma_freqs).max()))
+    if not acoustic.max() < RTOL*np.abs(gamma_freqs).max():
+        raise AssertionError("acoustic modes do not vanish at Gamma")
+
+    # cubic-equivalent q-points
+    reference, _ = phonons(fc, masses, QPOINT, lat_vectors=lat, positions=positions)
+    for axes, signs in [((1,2,0), (1,1,1)), ((2,0,1), (-1,1,-1)), ((0,1,2), (-1,-1,-1))]:
+        q = np.array(signs)*QPOINT[list(axes)]
+        freqs, _ = phonons(fc, masses, q, lat_vectors=lat, positions=positions)
+        check("q = " + np.array2string(q, precision=1), freqs, reference)
+
+    # mass-weighted normal modes: H x = w2 M x, with x = e/sqrt(m)
+    values, vectors = get_normal_modes(masses, hessian)
+    check("orthonormal eigenvectors", vectors.T @ vectors, np.identity(3*nats))
+    modes = vectors*weight[:,None]
+    check("mass-weighted eigenvectors", hessian @ modes,
+        np.repeat(masses, 3)[:,None]*modes*values[None,:])
+
+    print("\nEVERYTHING DONE!")
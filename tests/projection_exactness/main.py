@@ -0,0 +1,196 @@
+"""
+
+Test script guarding the exactness of the vectorized mode projections
+(see ezSCUP.projection) against the original cell-by-cell loops:
+
+- project random patterns (with negative and wrapping hoppings) and
+every pattern table of the SrTiO3 modes (see ezSCUP.srtio3.modes) on
+random geometries of odd and even supercells
+- check the "roll" method matches the original measure() loop exactly
+(np.array_equal), for measure(), measure_many() and measure_stack()
+- check the "fft" method matches it up to round-off
+- check neighbour_correlation() matches the original loop of the
+STO_AFD(algo="sign") correlation exactly
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.projection import measure, measure_many, measure_stack, neighbour_correlation
+from ezSCUP.srtio3.modes import _rot_patterns, _afd_patterns, _fe_patterns
+from ezSCUP.srtio3.modes import _afe_patterns, _od_patterns, _pol_patterns
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELLS = [(3,5,2), (4,4,4)]                 # supercells to test
+MODEL = STO_JPCM2013                            # model to test with
+NPATTERNS = 5                                   # random patterns
+NSNAPSHOTS = 3                                  # snapshots of the stack
+
+RTOL = 1e-12                                    # tolerance of the "fft" method
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def loop_measure(geom, pattern):
+
+    """ Original cell-by-cell projection loop, kept as reference. """
+
+    values = np.zeros(geom.supercell)
+
+    for x in range(geom.supercell[0]):
+        for y in range(geom.supercell[1]):
+            for z in range(geom.supercell[2]):
+                cell = np.array([x,y,z])
+                for atom in pattern:
+                    atom_cell = np.mod(cell + atom[1], geom.supercell)
+                    nx, ny, nz = atom_cell
+                    values[x,y,z] += atom[2]*np.dot(atom[3], geom.displacements[nx,ny,nz,atom[0],:])
+    return values
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def loop_correlation(rots):
+
+    """ Original neighbour correlation loop of STO_AFD(algo="sign"), kept as reference. """
+
+    supercell = rots.shape[:3]
+    dirs = np.copy(rots)
+    proj = np.zeros_like(rots)
+
+    for x in range(supercell[0]):
+        for y in range(supercell[1]):
+            for z in range(supercell[2]):
+                dirs[x,y,z,:] = dirs[x,y,z,:]/np.linalg.norm(dirs[x,y,z,:])
+
+    for x in range(supercell[0]):
+        for y in range(supercell[1]):
+            for z in range(supercell[2]):
+                cell = np.array([x,y,z])
+                for i, hop in enumerate(np.identity(3, dtype=int)):
+                    ux, uy, uz = np.mod(cell + hop, supercell)
+                    dx, dy, dz = np.mod(cell - hop, supercell)
+                    proj[x,y,z,i] = np.mean([
+                                    np.dot(dirs[x,y,z,:], dirs[ux,uy,uz,:]),
+                                    np.dot(dirs[x,y,z,:], dirs[dx,dy,dz,:])
+                                    ])
+
+    return proj
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def random_pattern(rng, nats):
+
+    """ Random pattern, with hoppings beyond the nearest cells. """
+
+    pattern = []
+    for _ in range(rng.integers(1, 12)):
+        target = rng.normal(size=3)
+        pattern.append([int(rng.integers(nats)), list(rng.integers(-5, 6, size=3)), 
+            float(rng.normal()), list(target/np.linalg.norm(target))])
+
+    return pattern
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def model_patterns(model):
+
+    """ Every pattern table of the SrTiO3 modes. """
+
+    labels = tuple(model["labels"])
+    charges = tuple((label, tuple(np.ravel(np.diag(z) if np.ndim(z) == 1 else z))) 
+        for label, z in model["born_charges"].items())
+
+    return (list(_rot_patterns(labels)) + list(_afd_patterns(labels, "a")) 
+        + list(_afd_patterns(labels, "i")) + list(_fe_patterns(labels))
+        + list(_afe_patterns(labels)) + list(_od_patterns(labels)) 
+        + list(_pol_patterns(labels, charges)))
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check_exact(name, result, reference):
+
+    """ Checks a "roll" result is bitwise equal to its reference. """
+
+    print("{:>40}{:>15}".format(name, "exact"))
+    if not np.array_equal(result, reference):
+        raise AssertionError(name + " does not match the original loop exactly")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check_close(name, result, reference):
+
+    """ Checks an "fft" result matches its reference up to round-off. """
+
+    deviation = np.abs(result - reference).max()/np.abs(reference).max()
+
+    print("{:>40}{:15.3E}".format(name, deviation))
+    if not deviation < RTOL:
+        raise AssertionError(name + " does not match the original loop")
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+    nats = MODEL["nats"]
+
+    print("\n{:>40}{:>15}".format("Projection", "deviation"))
+
+    for supercell in SUPERCELLS:
+
+        label = "x".join(map(str, supercell))
+
+        geom = Geometry(list(supercell), MODEL["species"], nats)
+        geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+
+        # random patterns, one at a time
+        patterns = [random_pattern(rng, nats) for _ in range(NPATTERNS)]
+        reference = np.array([loop_measure(geom, p) for p in patterns])
+
+        check_exact(label + " measure, roll", 
+            np.array([measure(geom, p, method="roll") for p in patterns]), reference)
+        check_close(label + " measure, fft", 
+            np.array([measure(geom, p, method="fft") for p in patterns]), reference)
+
+        # mode pattern tables, all at once
+        tables = model_patterns(MODEL)
+        reference = np.array([loop_measure(geom, t) for t in tables])
+
+        check_exact(label + " STO patterns, roll", measure_many(geom, tables, method="roll"), reference)
+        check_close(label + " STO patterns, fft", measure_many(geom, tables, method="fft"), reference)
+
+        # snapshot stacks
+        stack = rng.normal(scale=1e-1, size=(NSNAPSHOTS,) + geom.displacements.shape)
+        reference = []
+        for snapshot in stack:
+            geom.displacements = snapshot
+            reference.append([loop_measure(geom, t) for t in tables])
+        reference = np.swapaxes(np.array(reference), 0, 1)
+
+        check_exact(label + " stack, roll", 
+            measure_stack(stack, tables, method="roll", chunk_size=2), reference)
+        check_close(label + " stack, fft", 
+            measure_stack(stack, tables, method="fft", chunk_size=2), reference)
+
+        # neighbour correlation of the rotations
+        rots = np.stack(measure_many(geom, list(_rot_patterns(tuple(MODEL["labels"])))), axis=-1)
+        check_exact(label + " neighbour correlation", neighbour_correlation(rots), loop_correlation(rots))
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,110 @@
+"""
+
+Benchmark script for the bulk geometry file parser:
+
+- write a synthetic .restart file for a large supercell
+- load it with the original line-by-line loop
+- load it with Geometry.load_restart()
+- check both results match and print the speedup
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys
+import time
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELLS = [[8,8,8], [16,16,16], [24,24,24]]  # supercells to benchmark
+SPECIES = ["Sr", "Ti", "O"]                     # elements in the lattice
+NATS = 5                                        # number of atoms per cell
+REPEATS = 3                                     # timing repetitions
+
+RESTART_FILE = "benchmark.restart"              # temporary restart file
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def loop_load_restart(geom, restart_file):
+
+    """ Original line-by-line .restart parser, kept as reference. """
+
+    geom.reset_geom()
+
+    f = open(restart_file)
+
+    rsupercell = np.array(list(map(int, f.readline().split())))
+    rnats, rnels = list(map(int, f.readline().split()))
+    rspecies = f.readline().split()
+
+    geom.strains = np.array(list(map(float, f.readline().split())))
+
+    for x in range(geom.supercell[0]):
+        for y in range(geom.supercell[1]):
+            for z in range(geom.supercell[2]):
+                for j in range(geom.nats):
+                    line = f.readline().split()
+                    geom.displacements[x,y,z,j,:] = np.array(list(map(float, line[5:])))
+
+    f.close()
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def best_time(func, *args):
+
+    """ Best wall time out of several repetitions. """
+
+    times = []
+    for _ in range(REPEATS):
+        start = time.time()
+        func(*args)
+        times.append(time.time() - start)
+
+    return min(times)
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    print("\n{:>15}{:>15}{:>15}{:>15}".format("Supercell", "loop (s)", "bulk (s)", "speedup"))
+
+    for sc in SUPERCELLS:
+
+        # synthetic geometry
+        geom = Geometry(sc, SPECIES, NATS)
+        geom.strains = np.random.normal(scale=1e-2, size=6)
+        geom.displacements = np.random.normal(scale=1e-1, size=geom.displacements.shape)
+        geom.write_restart(RESTART_FILE)
+
+        loop_geom = Geometry(sc, SPECIES, NATS)
+        bulk_geom = Geometry(sc, SPECIES, NATS)
+
+        loop_time = best_time(loop_load_restart, loop_geom, RESTART_FILE)
+        bulk_time = best_time(bulk_geom.load_restart, RESTART_FILE)
+
+        if not np.array_equal(loop_geom.displacements, bulk_geom.displacements):
+            raise AssertionError("bulk parser does not match the original loop")
+        if not np.array_equal(loop_geom.strains, bulk_geom.strains):
+            raise AssertionError("bulk parser does not match the original loop")
+
+        label = "x".join(str(n) for n in sc)
+        print("{:>15}{:15.4f}{:15.4f}{:15.1f}".format(label, loop_time, bulk_time, loop_time/bulk_time))
+
+    os.remove(RESTART_FILE)
+
+    print("\nEVERYTHING DONE!")
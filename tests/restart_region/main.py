@@ -0,0 +1,141 @@
+"""
+
+Test script for the region loader of Geometry:
+
+- write a synthetic .restart file for a small supercell, and a 
+gzip-compressed copy of it
+- load several regions of both through Geometry.load_restart_region(), 
+with single-cell (int) and (start, stop) selections along each axis
+- compare them with the whole file loaded through Geometry.load_restart(),
+checking that cells outside the region are left at zero
+- check the byte-offset index (see ezSCUP.geometry.index_file()) is stored
+next to each file and rebuilt once the file is rewritten
+- check compress_file() removes the binary copy and index of the original
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys, shutil
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry, compress_file, cache_file, index_file
+from ezSCUP.srtio3.models import STO_JPCM2013
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [4,3,5]                             # supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+
+REGIONS = [                                     # (x, y, z) selections
+    (None, None, None),                         # whole supercell
+    (1, 2, 3),                                  # single cell
+    (0, 0, 4),                                  # single cell, last in z
+    ((1, 3), (0, 2), (2, 5)),                   # block
+    ((0, 4), (1, 2), (0, 5)),                   # slab normal to y
+    (2, None, (1, 4)),                          # mixed selections
+    ((3, 4), 1, 0),                             # range of a single cell
+]
+
+RESTART_FILE = "region.restart"                 # temporary restart file
+COMPRESSED_FILE = "region_gz.restart"           # temporary file to compress
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, passed):
+
+    """ Reports a check, raising an error if it failed. """
+
+    print("{:>45}{:>10}".format(name, "OK" if passed else "FAILED"))
+    if not passed:
+        raise AssertionError(name + " failed")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def as_slice(cells):
+
+    """ Slice of the cells selected along one direction. """
+
+    if cells is None:
+        return slice(None)
+    if np.isscalar(cells):
+        return slice(cells, cells + 1)
+    return slice(*cells)
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check_regions(fname, label):
+
+    """ Compares every region of a file with the whole file. """
+
+    whole = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    whole.load_restart(fname, cache=False)
+
+    region = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    for x, y, z in REGIONS:
+
+        region.load_restart_region(fname, x, y, z)
+
+        mask = np.zeros(SUPERCELL, dtype=bool)
+        mask[as_slice(x), as_slice(y), as_slice(z)] = True
+
+        name = "{} {} {} {}".format(label, x, y, z)
+        check(name, np.array_equal(region.strains, whole.strains)
+            and np.array_equal(region.displacements[mask], whole.displacements[mask])
+            and not np.any(region.displacements[~mask]))
+
+    return whole
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+
+    geom = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    geom.strains = rng.normal(scale=1e-2, size=6)
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+    geom.write_restart(RESTART_FILE)
+
+    # side files of the copy, which must not outlive its compression
+    shutil.copy(RESTART_FILE, COMPRESSED_FILE)
+    side = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    side.load_restart(COMPRESSED_FILE, cache=True)
+    side.load_restart_region(COMPRESSED_FILE, 0, 0, 0)
+    sides = [cache_file(COMPRESSED_FILE), index_file(COMPRESSED_FILE)]
+    if not all(os.path.exists(f) for f in sides):
+        raise AssertionError("side files of the copy were not stored")
+    compressed = compress_file(COMPRESSED_FILE, "gz")
+
+    print("\n{:>45}{:>10}".format("Region (x y z)", "result"))
+    check("side files removed on compression", 
+        not any(os.path.exists(f) for f in sides))
+
+    for fname, label in [(RESTART_FILE, "plain"), (compressed, "gzip")]:
+        check_regions(fname, label)
+        check(label + " index stored", os.path.exists(index_file(fname)))
+
+    # the index must follow the file when it is rewritten
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+    geom.write_restart(RESTART_FILE)
+    whole = check_regions(RESTART_FILE, "rewritten")
+    check("rewritten file reloaded", np.allclose(whole.displacements, 
+        geom.displacements, rtol=1e-6, atol=1e-8))
+
+    for fname in [RESTART_FILE, compressed]:
+        os.remove(fname)
+        os.remove(index_file(fname))
+
+    print("\nEVERYTHING DONE!")
@@ -0,0 +1,191 @@
+"""
+
+Test script for the packed trajectories of MCSimulationParser
+(see MCSimulationParser.access_trajectory() and ezSCUP.trajectory):
+
+- build a minimal simulation output folder with synthetic partials
+- check the first access packs them, in MC step order, and that later
+accesses map the stored trajectory without repacking it
+- check rewriting one partial in place, adding one or removing one
+triggers a repack, and that the trajectory follows the partials
+- check trajectories without size/mtime stamps are repacked
+- check window() bounds are exclusive, matching find_partials()
+
+"""
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~ REQUIRED MODULE IMPORTS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+# standard library imports
+import os, sys, shutil, pickle
+
+# third party imports
+import numpy as np
+
+# ezSCUP imports
+from ezSCUP.geometry import Geometry
+from ezSCUP.montecarlo import MCSimulationParser
+from ezSCUP.trajectory import trajectory_is_current
+from ezSCUP.srtio3.models import STO_JPCM2013
+import ezSCUP.settings as cfg
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~ USER DEFINED SETTINGS ~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+SUPERCELL = [3,2,2]                             # supercell to test
+MODEL = STO_JPCM2013                            # model to test with
+NAME = "traj"                                   # simulation name
+TEMPERATURE = 100.                              # simulated temperature
+STEPS = [300, 100, 200, 500, 400]               # MC steps of the partials
+
+OUTPUT_FOLDER = "trajectory_output"             # temporary output folder
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~ code starts here ~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def check(name, passed):
+
+    """ Reports a check, raising an error if it failed. """
+
+    print("{:>40}{:>10}".format(name, "OK" if passed else "FAILED"))
+    if not passed:
+        raise AssertionError(name + " failed")
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def make_output():
+
+    """ Minimal output folder of a single configuration, see MCSimulationParser. """
+
+    setup = {
+        "name": NAME, "supercell": SUPERCELL, "model": MODEL,
+        "mc_steps": max(STEPS), "mc_step_interval": 100, "mc_equilibration_steps": 0,
+        "mc_max_jump": 0.1, "lat_output_interval": 100, 
+        "fixed_strain_components": [False]*6, "temp": np.array([TEMPERATURE]),
+        "stress": [np.zeros(6)], "strain": [np.zeros(6)], "field": [np.zeros(3)]
+    }
+
+    os.makedirs(OUTPUT_FOLDER)
+    with open(os.path.join(OUTPUT_FOLDER, cfg.SIMULATION_SETUP_FILE), "wb") as f:
+        pickle.dump(setup, f)
+
+    parser = MCSimulationParser(output_folder=OUTPUT_FOLDER)
+    folder, sim_name = parser.get_location(TEMPERATURE)
+    os.makedirs(folder)
+
+    return parser, folder, sim_name
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def write_partial(folder, sim_name, step, rng):
+
+    """ Writes a random partial .restart file, returning its displacements. """
+
+    geom = Geometry(SUPERCELL, MODEL["species"], MODEL["nats"])
+    geom.strains = rng.normal(scale=1e-2, size=6)
+    geom.displacements = rng.normal(scale=1e-1, size=geom.displacements.shape)
+
+    # named so that the step follows the 10 characters after the simulation name
+    fname = os.path.join(folder, "{}_partial_{:010d}.restart".format(sim_name, step))
+    geom.write_restart(fname)
+
+    # distinct modification times, whatever the file system resolution
+    write_partial.count = getattr(write_partial, "count", 0) + 1
+    os.utime(fname, (1e9 + write_partial.count, 1e9 + write_partial.count))
+
+    return fname, geom.displacements
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def packed_id(folder, sim_name):
+
+    """ Identity of the packed displacement file, which changes when repacked. """
+
+    stat = os.stat(os.path.join(folder, sim_name + "_TRAJECTORY.npy"))
+    return stat.st_ino, stat.st_mtime_ns
+
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+
+def matches(traj, partials):
+
+    """ Whether a trajectory holds the given {step: displacements} partials. """
+
+    steps = sorted(partials)
+    return (np.array_equal(traj.steps, steps) and 
+        all(np.allclose(traj.displacements[i], partials[s], rtol=1e-6, atol=1e-8) 
+        for i, s in enumerate(steps)))
+
+# ================================================================= #
+# ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~ #
+# ================================================================= #
+
+if __name__ == "__main__":
+
+    rng = np.random.default_rng(0)
+
+    if os.path.exists(OUTPUT_FOLDER):
+        shutil.rmtree(OUTPUT_FOLDER)
+    parser, folder, sim_name = make_output()
+
+    partials, files = {}, {}
+    for step in STEPS:
+        files[step], partials[step] = write_partial(folder, sim_name, step, rng)
+
+    print("\n{:>40}{:>10}".format("Check", "result"))
+
+    # first access packs, later ones map the store
+    traj = parser.access_trajectory(TEMPERATURE)
+    check("first access packs the partials", matches(traj, partials))
+    packed = packed_id(folder, sim_name)
+
+    traj = parser.access_trajectory(TEMPERATURE)
+    check("second access is not repacked", packed_id(folder, sim_name) == packed
+        and matches(traj, partials))
+
+    # partial rewritten in place
+    _, partials[200] = write_partial(folder, sim_name, 200, rng)
+    traj = parser.access_trajectory(TEMPERATURE)
+    check("rewritten partial repacks", packed_id(folder, sim_name) != packed
+        and matches(traj, partials))
+    packed = packed_id(folder, sim_name)
+
+    # partial added
+    files[600], partials[600] = write_partial(folder, sim_name, 600, rng)
+    traj = parser.access_trajectory(TEMPERATURE)
+    check("added partial repacks", packed_id(folder, sim_name) != packed
+        and matches(traj, partials))
+    packed = packed_id(folder, sim_name)
+
+    # partial removed
+    os.remove(files.pop(100))
+    partials.pop(100)
+    traj = parser.access_trajectory(TEMPERATURE)
+    check("removed partial repacks", packed_id(folder, sim_name) != packed
+        and matches(traj, partials))
+
+    # trajectories stored without stamps
+    trajectory_file = os.path.join(folder, sim_name + "_TRAJECTORY")
+    with np.load(trajectory_file + ".npz") as info:
+        old_style = {k: info[k] for k in info.files if k != "stamps"}
+    np.savez(trajectory_file + ".npz", **old_style)
+    steps = [parser._partial_step(sim_name, p) for p in parser.find_partials(TEMPERATURE)]
+    check("no stamps is not current", not trajectory_is_current(trajectory_file, 
+        parser.find_partials(TEMPERATURE), steps))
+    traj = parser.access_trajectory(TEMPERATURE)
+    check("no stamps repacks", matches(traj, partials) and trajectory_is_current(
+        trajectory_file, parser.find_partials(TEMPERATURE), steps))
+
+    # exclusive window bounds, as in find_partials()
+    for low, high in [(200, 500), (199, 501), (0, np.inf), (300, 400)]:
+        window = parser.access_trajectory(TEMPERATURE, min_step=low, max_step=high)
+        found = parser.find_partials(TEMPERATURE, min_step=low, max_step=high)
+        expected = sorted(parser._partial_step(sim_name, p) for p in found)
+        check("window ({}, {})".format(low, high), np.array_equal(window.steps, expected)
+            and all(low < s < high for s in window.steps))
+
+    shutil.rmtree(OUTPUT_FOLDER)
+
+    print("\nEVERYTHING DONE!")